@@ -0,0 +1,126 @@
+"""
+Benchmark do log de acesso.
+
+Compara a pilha CORS + Log + Auth de src.main com os middlewares que davam print() de
+três linhas por pedido (cópias da versão anterior) e com o log de acesso JSON em fila
+(src/logger.py), com ACCESS_LOG_SAMPLE_RATE 1 e 0,1. As chamadas vão direto na
+aplicação ASGI em GET / e o stdout vira um pipe com buffer de linha (como num container
+com PYTHONUNBUFFERED) lido por outro processo:
+- "pipe": o leitor consome tudo na hora;
+- "leitor lento": o leitor consome 4 KB a cada 50 ms (coletor de logs atrasado), e o
+  pipe enche.
+Mostra pedidos/s e as latências p50/p99/máx por pedido (medianas de ROUNDS rodadas
+intercaladas).
+
+Uso (a partir de backend/):
+    python -m benchmarks.access_log
+"""
+import asyncio
+import io
+import statistics
+import subprocess
+import sys
+import time
+
+from starlette.datastructures import URL
+from starlette.middleware import Middleware
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from benchmarks.middleware_stack import call, make_app
+import src.api.middleware as middleware
+from src.logger import LogMiddleware, access_log
+
+REQUESTS = 3000
+ROUNDS = 5
+
+SINKS = {
+    "pipe": "import sys\nwhile sys.stdin.buffer.read1(65536): pass",
+    "leitor lento": "import sys, time\nwhile sys.stdin.buffer.read1(4096): time.sleep(0.05)",
+}
+
+
+class PrintAuthMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        print(f"🔍 Verificando autenticação para: {scope['path']}")
+        await self.app(scope, receive, send)
+
+
+class PrintLogMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        print(f"📥 Request recebido: {scope['method']} {URL(scope=scope)}")
+
+        async def send_logged(message: Message):
+            if message["type"] == "http.response.start":
+                print(f"✅ Resposta enviada: {message['status']}")
+            await send(message)
+
+        await self.app(scope, receive, send_logged)
+
+
+def print_app():
+    app = make_app(legacy=False)
+    replacements = {middleware.AuthMiddleware: PrintAuthMiddleware, LogMiddleware: PrintLogMiddleware}
+    app.user_middleware = [Middleware(replacements.get(item.cls, item.cls), *item.args, **item.kwargs) for item in app.user_middleware]
+    return app
+
+
+async def measure(asgi) -> tuple:
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(REQUESTS):
+        request_started = time.perf_counter()
+        await call(asgi, "/")
+        latencies.append((time.perf_counter() - request_started) * 1000)
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return REQUESTS / elapsed, statistics.median(latencies), latencies[int(len(latencies) * 0.99)], latencies[-1]
+
+
+async def run_once(reader: str, factory, sample_rate) -> tuple:
+    sink = subprocess.Popen([sys.executable, "-c", reader], stdin=subprocess.PIPE)
+    sys.stdout = io.TextIOWrapper(sink.stdin, encoding="utf-8", line_buffering=True)
+    if sample_rate is not None:
+        access_log.sample_rate = sample_rate
+        access_log.dropped = 0
+        access_log.start()
+    try:
+        asgi = factory()
+        await call(asgi, "/")
+        return await measure(asgi), access_log.dropped
+    finally:
+        access_log.stop()
+        sys.stdout.close()
+        sink.wait()
+        sys.stdout = sys.__stdout__
+
+
+async def main():
+    variants = [
+        ("print (3 linhas)", print_app, None),
+        ("JSON em fila, 100%", lambda: make_app(legacy=False), 1.0),
+        ("JSON em fila, 10%", lambda: make_app(legacy=False), 0.1),
+    ]
+    runs = {}
+    for _ in range(ROUNDS):
+        for sink_label, reader in SINKS.items():
+            for label, factory, sample_rate in variants:
+                runs.setdefault((sink_label, label), []).append(await run_once(reader, factory, sample_rate))
+
+    print(f"{REQUESTS} pedidos GET / com a pilha completa, mediana de {ROUNDS} rodadas\n")
+    for (sink_label, label), results in runs.items():
+        rps, p50, p99, worst = (statistics.median(values) for values in zip(*(result for result, _ in results)))
+        dropped = sum(dropped for _, dropped in results)
+        print(
+            f"{sink_label:<13} {label:<19} {rps:6.0f} pedidos/s | p50 {p50:6.2f} ms | p99 {p99:6.2f} ms | "
+            f"máx {worst:7.2f} ms | descartados {dropped}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
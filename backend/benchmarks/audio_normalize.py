@@ -0,0 +1,101 @@
+"""
+Benchmark do caminho rápido de normalização do /api/voice-to-text.
+
+Para clipes de 10 s em formatos que o navegador/app costumam enviar, compara o custo por
+clipe de `prepare_upload_for_recognition` (cabeçalho lido; WAV convertido com NumPy, FLAC
+mono enviado como está) com o caminho antigo de sempre chamar o ffmpeg
+(`transcode_upload_to_flac`). Para os WAV, compara o PCM do NumPy com o do ffmpeg
+(correlação) para conferir que o reamostrador não degrada o áudio.
+
+Precisa do binário `ffmpeg` no PATH.
+
+Uso (a partir de backend/):
+    python -m benchmarks.audio_normalize
+"""
+import asyncio
+import io
+import os
+import statistics
+import subprocess
+import time
+
+import numpy as np
+from starlette.datastructures import UploadFile
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from src.api.services.audio_service import (  # noqa: E402
+    prepare_upload_for_recognition,
+    transcode_upload_to_flac,
+)
+
+SECONDS = 10
+RUNS = 9
+
+CASES = [
+    ("WAV s16 mono 16 kHz", ["-ac", "1", "-ar", "16000", "-c:a", "pcm_s16le", "-f", "wav"]),
+    ("WAV s16 mono 48 kHz", ["-ac", "1", "-ar", "48000", "-c:a", "pcm_s16le", "-f", "wav"]),
+    ("WAV s16 stereo 44.1 kHz", ["-ac", "2", "-ar", "44100", "-c:a", "pcm_s16le", "-f", "wav"]),
+    ("WAV f32 mono 48 kHz", ["-ac", "1", "-ar", "48000", "-c:a", "pcm_f32le", "-f", "wav"]),
+    ("FLAC mono 16 kHz", ["-ac", "1", "-ar", "16000", "-f", "flac"]),
+    ("FLAC mono 48 kHz", ["-ac", "1", "-ar", "48000", "-f", "flac"]),
+    ("Ogg/Opus (ffmpeg)", ["-ac", "1", "-c:a", "libopus", "-b:a", "32k", "-f", "ogg"]),
+]
+
+
+def make_clip(output_args: list, seconds: int = SECONDS) -> bytes:
+    # Voz sintética aproximada: tom modulado + ruído
+    source = f"sine=frequency=220:duration={seconds}:sample_rate=48000"
+    noise = f"anoisesrc=duration={seconds}:sample_rate=48000:amplitude=0.05"
+    return subprocess.run(
+        ["ffmpeg", "-hide_banner", "-loglevel", "error", "-f", "lavfi", "-i", source, "-f", "lavfi", "-i", noise,
+         "-filter_complex", "amix=inputs=2,tremolo=f=4", *output_args, "pipe:1"],
+        check=True, capture_output=True,
+    ).stdout
+
+
+def ffmpeg_pcm(data: bytes) -> np.ndarray:
+    pcm = subprocess.run(
+        ["ffmpeg", "-hide_banner", "-loglevel", "error", "-i", "pipe:0", "-ac", "1", "-ar", "16000",
+         "-f", "s16le", "pipe:1"],
+        input=data, check=True, capture_output=True,
+    ).stdout
+    return np.frombuffer(pcm, dtype="<i2").astype(np.float64)
+
+
+def upload(data: bytes) -> UploadFile:
+    return UploadFile(io.BytesIO(data), size=len(data))
+
+
+async def timed(make_coroutine) -> tuple:
+    times, result = [], None
+    for _ in range(RUNS):
+        started = time.perf_counter()
+        result = await make_coroutine()
+        times.append((time.perf_counter() - started) * 1000)
+    return statistics.median(times), result
+
+
+async def main():
+    print(f"clipes de {SECONDS} s, mediana de {RUNS} execuções\n")
+    for label, output_args in CASES:
+        clip = make_clip(output_args)
+        ffmpeg_ms, _ = await timed(lambda: transcode_upload_to_flac(upload(clip), max_bytes=len(clip) + 1))
+        fast_ms, prepared = await timed(lambda: prepare_upload_for_recognition(upload(clip), max_bytes=len(clip) + 1))
+
+        fidelity = ""
+        if prepared.encoding == "LINEAR16":
+            ours = np.frombuffer(prepared.content, dtype="<i2").astype(np.float64)
+            reference = ffmpeg_pcm(clip)
+            size = min(len(ours), len(reference))
+            correlation = np.corrcoef(ours[:size], reference[:size])[0, 1]
+            fidelity = f"  correlação com ffmpeg {correlation:.4f}"
+        print(
+            f"{label:<24} {len(clip) / 1024:6.0f} KB | ffmpeg {ffmpeg_ms:6.1f} ms | "
+            f"{prepared.path:<11} {fast_ms:6.1f} ms ({ffmpeg_ms / fast_ms:5.1f}x) -> "
+            f"{prepared.encoding} {prepared.sample_rate} Hz, {len(prepared.content) / 1024:.0f} KB{fidelity}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
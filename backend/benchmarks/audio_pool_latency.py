@@ -0,0 +1,111 @@
+"""
+Benchmark do impacto de uploads de voz simultâneos na latência de outros endpoints.
+
+Sobe um app com o /api/voice-to-text antigo (ffmpeg com arquivos temporários e
+reconhecimento bloqueante dentro do handler) e o novo (pool limitado de trabalhos de
+áudio), e mede a latência de um GET não relacionado enquanto UPLOADS áudios de 5 s são
+enviados ao mesmo tempo. O reconhecimento do Google é simulado com RECOGNIZE_SECONDS de
+espera bloqueante.
+
+Precisa do binário `ffmpeg` no PATH.
+
+Uso (a partir de backend/):
+    python -m benchmarks.audio_pool_latency
+"""
+import asyncio
+import os
+import statistics
+import time
+
+import httpx
+from fastapi import FastAPI, File, UploadFile
+from fastapi.responses import JSONResponse
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from benchmarks.audio_transcode import legacy_transcode, make_clip  # noqa: E402
+from src.api.services.audio_jobs import AudioJobPool, AudioBusyError  # noqa: E402
+from src.api.services.audio_service import transcode_upload_to_flac  # noqa: E402
+
+UPLOADS = 20
+RECOGNIZE_SECONDS = 0.3
+
+app = FastAPI()
+pool = AudioJobPool()
+
+
+def fake_recognize(audio: bytes) -> str:
+    time.sleep(RECOGNIZE_SECONDS)
+    return "transcrição"
+
+
+@app.get("/ping")
+async def ping():
+    return {"ok": True}
+
+
+@app.post("/legacy")
+async def legacy(file: UploadFile = File(...)):
+    flac, _ = legacy_transcode(await file.read())
+    return {"transcription": fake_recognize(flac)}
+
+
+@app.post("/pooled")
+async def pooled(file: UploadFile = File(...)):
+    try:
+        flac = await pool.run_async("transcode", lambda: transcode_upload_to_flac(file))
+        return {"transcription": await pool.run_blocking("recognize", fake_recognize, flac)}
+    except AudioBusyError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=429)
+
+
+async def scenario(path: str, clip: bytes, uploads: int):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        latencies = []
+        stop = asyncio.Event()
+
+        async def pinger():
+            # Latência contada a partir do horário agendado: inclui o tempo que o
+            # event loop ficou travado antes de conseguir enviar o GET
+            scheduled = time.perf_counter()
+            while not stop.is_set():
+                await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+                await client.get("/ping")
+                latencies.append((time.perf_counter() - scheduled) * 1000)
+                scheduled = max(scheduled + 0.02, time.perf_counter())
+
+        task = asyncio.ensure_future(pinger())
+        await asyncio.sleep(0.2)
+        started = time.perf_counter()
+        responses = await asyncio.gather(*(
+            client.post(path, files={"file": ("audio.ogg", clip, "audio/ogg")}) for _ in range(uploads)
+        ))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await task
+
+    statuses = {}
+    for response in responses:
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+    latencies.sort()
+    print(
+        f"{path:>8} x{uploads}: uploads em {elapsed:5.2f}s {statuses} | GET /ping durante: "
+        f"p50 {statistics.median(latencies):6.1f} ms  p99 {latencies[int(len(latencies) * 0.99)]:7.1f} ms  "
+        f"máx {latencies[-1]:7.1f} ms"
+    )
+
+
+async def main():
+    global pool
+    clip = make_clip(5)
+    await scenario("/legacy", clip, UPLOADS)
+    await scenario("/pooled", clip, UPLOADS)
+    print(f"pool: {pool.stats()}")
+    # Rajada maior que vagas + fila: o excesso recebe 429 em vez de acumular
+    pool = AudioJobPool(limits={"transcode": 2, "recognize": 2}, max_queue=8)
+    await scenario("/pooled", clip, 40)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
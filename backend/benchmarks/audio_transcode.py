@@ -0,0 +1,86 @@
+"""
+Benchmark da conversão para FLAC do /api/voice-to-text: caminho antigo (upload gravado em
+arquivo temporário, ffmpeg arquivo -> arquivo, leitura de volta) contra os pipes em memória
+de `transcode_upload_to_flac`, para clipes de 5 s, 60 s e 5 min em Ogg/Opus (o que o
+MediaRecorder do navegador envia).
+
+Precisa do binário `ffmpeg` no PATH.
+
+Uso (a partir de backend/):
+    python -m benchmarks.audio_transcode
+"""
+import asyncio
+import io
+import os
+import statistics
+import subprocess
+import tempfile
+import time
+
+import ffmpeg
+from starlette.datastructures import UploadFile
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from src.api.services.audio_service import transcode_upload_to_flac  # noqa: E402
+
+DURATIONS = (5, 60, 300)
+RUNS = 7
+
+
+def make_clip(seconds: int) -> bytes:
+    # Voz sintética aproximada: tom modulado + ruído, 48 kHz mono, Opus 32 kbps
+    source = f"sine=frequency=220:duration={seconds}:sample_rate=48000"
+    noise = f"anoisesrc=duration={seconds}:sample_rate=48000:amplitude=0.05"
+    return subprocess.run(
+        ["ffmpeg", "-hide_banner", "-loglevel", "error", "-f", "lavfi", "-i", source, "-f", "lavfi", "-i", noise,
+         "-filter_complex", "amix=inputs=2,tremolo=f=4", "-ac", "1", "-c:a", "libopus", "-b:a", "32k",
+         "-f", "ogg", "pipe:1"],
+        check=True, capture_output=True,
+    ).stdout
+
+
+def legacy_transcode(data: bytes):
+    """
+    Reprodução do fluxo antigo; retorna (flac, bytes escritos + lidos no disco).
+    """
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".ogg") as temp_audio:
+        temp_audio.write(data)
+        temp_audio_path = temp_audio.name
+    temp_flac_path = temp_audio_path.replace(".ogg", ".flac")
+    ffmpeg.input(temp_audio_path).output(temp_flac_path, ar=16000, ac=1, format="flac").run(
+        overwrite_output=True, quiet=True
+    )
+    with open(temp_flac_path, "rb") as flac_audio:
+        flac = flac_audio.read()
+    os.remove(temp_audio_path)
+    os.remove(temp_flac_path)
+    # Upload escrito, lido pelo ffmpeg; FLAC escrito pelo ffmpeg, lido de volta
+    return flac, 2 * len(data) + 2 * len(flac)
+
+
+async def pipe_transcode(data: bytes) -> bytes:
+    return await transcode_upload_to_flac(UploadFile(io.BytesIO(data), size=len(data)), max_bytes=len(data) + 1)
+
+
+async def main():
+    for seconds in DURATIONS:
+        clip = make_clip(seconds)
+        legacy, piped, disk_bytes = [], [], 0
+        for _ in range(RUNS):
+            started = time.perf_counter()
+            flac_legacy, disk_bytes = legacy_transcode(clip)
+            legacy.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            flac_piped = await pipe_transcode(clip)
+            piped.append(time.perf_counter() - started)
+        print(
+            f"{seconds:>4} s ({len(clip) / 1024:6.0f} KB ogg -> {len(flac_piped) / 1024:6.0f} KB flac): "
+            f"arquivos temp {statistics.median(legacy) * 1000:7.1f} ms, {disk_bytes / 1024:6.0f} KB de disco | "
+            f"pipes {statistics.median(piped) * 1000:7.1f} ms, 0 KB de disco | "
+            f"mesmo tamanho de FLAC: {abs(len(flac_legacy) - len(flac_piped)) < 4096}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,163 @@
+"""
+Benchmark da resolução do usuário autenticado (AuthMiddleware + get_current_user).
+
+Roda GET /auth/me pela pilha ASGI (httpx + ASGITransport) com um token válido, em duas
+montagens com o mesmo router de autenticação:
+- antes: cópia do middleware e da dependência antigos (JWT decodificado e usuário
+  consultado nos dois, sessão do middleware aberta com next(get_db()));
+- depois: AuthMiddleware e get_current_user atuais (src/api/principal.py).
+O banco é um SQLite em arquivo com DB_RTT_MS de espera por consulta para simular a ida e
+volta a um Postgres na rede. Mede pedidos/s, consultas ao banco por pedido e o pico de
+conexões do pool em uso, com um pedido por vez e com CONCURRENCY simultâneos. Na
+montagem antiga as sessões abertas no middleware só devolvem a conexão quando o coletor
+de lixo passa: o pool (5 + 10 de overflow, timeout reduzido para POOL_TIMEOUT s) se
+esgota e a medição para no primeiro pedido que falhar. "/" sai de PUBLIC_ROUTES só neste benchmark, para o
+middleware de fato autenticar.
+
+Uso (a partir de backend/):
+    python -m benchmarks.auth_principal
+"""
+import asyncio
+import gc
+import os
+import tempfile
+import time
+
+DB_RTT_MS = 1.0
+REQUESTS = 400
+CONCURRENCY = 20
+POOL_TIMEOUT = 2
+
+_db_path = os.path.join(tempfile.mkdtemp(prefix="auth-bench-"), "auth.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_path}"
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+
+import httpx  # noqa: E402
+from fastapi import Depends, FastAPI, HTTPException, Request  # noqa: E402
+from fastapi.security import OAuth2PasswordBearer  # noqa: E402
+from jose import JWTError, jwt  # noqa: E402
+from sqlalchemy import create_engine, event  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+from starlette.middleware.base import BaseHTTPMiddleware  # noqa: E402
+
+import src.api.middleware as middleware  # noqa: E402
+from src.api.db.database import SessionLocal, get_db  # noqa: E402
+from src.api.db.models import User  # noqa: E402
+from src.api.dependencies import get_current_user  # noqa: E402
+from src.api.principal import principals  # noqa: E402
+from src.api.routes.auth import router as auth_router  # noqa: E402
+from src.api.security import ALGORITHM, SECRET_KEY, create_access_token  # noqa: E402
+
+engine = create_engine(os.environ["DATABASE_URL"], pool_timeout=POOL_TIMEOUT)
+SessionLocal.configure(bind=engine)
+
+legacy_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
+
+
+class LegacyAuthMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        if any(request.url.path.startswith(route) for route in middleware.PUBLIC_ROUTES):
+            return await call_next(request)
+        token = request.headers["Authorization"].split("Bearer ")[1]
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            db: Session = next(get_db())
+            user = db.query(User).filter(User.email == payload.get("sub")).first()
+            if user is None:
+                raise HTTPException(status_code=401, detail="Usuário não encontrado")
+        except JWTError:
+            raise HTTPException(status_code=401, detail="Token inválido ou expirado")
+        return await call_next(request)
+
+
+def legacy_get_current_user(token: str = Depends(legacy_oauth2_scheme), db: Session = Depends(get_db)):
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    user = db.query(User).filter(User.email == payload.get("sub")).first()
+    if user is None:
+        raise HTTPException(status_code=401, detail="Usuário não encontrado")
+    return user
+
+
+def make_app(legacy: bool) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(LegacyAuthMiddleware if legacy else middleware.AuthMiddleware)
+    app.include_router(auth_router, prefix="/auth")
+    if legacy:
+        app.dependency_overrides[get_current_user] = legacy_get_current_user
+    return app
+
+
+class DbProbe:
+    def __init__(self):
+        self.queries = 0
+        self.peak_connections = 0
+        event.listen(engine, "before_cursor_execute", self.on_query)
+
+    def on_query(self, *args):
+        self.queries += 1
+        self.peak_connections = max(self.peak_connections, engine.pool.checkedout())
+        time.sleep(DB_RTT_MS / 1000)
+
+    def reset(self):
+        self.queries = 0
+        self.peak_connections = 0
+
+
+def seed() -> str:
+    User.__table__.create(engine, checkfirst=True)
+    with SessionLocal() as db:
+        db.add(User(name="Gestor", user_name="gestor", email="gestor@example.com", password="x"))
+        db.commit()
+    return create_access_token({"sub": "gestor@example.com"})
+
+
+async def run(app: FastAPI, token: str, concurrency: int) -> tuple:
+    """
+    (pedidos concluídos, segundos, erro que interrompeu a medição ou None).
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    done, finished = 0, None
+    headers = {"Authorization": f"Bearer {token}"}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one():
+            nonlocal done, finished
+            async with semaphore:
+                response = await client.get("/auth/me", headers=headers)
+                assert response.status_code == 200, response.text
+                done += 1
+                finished = time.perf_counter()
+
+        await client.get("/auth/me", headers=headers)
+        started = time.perf_counter()
+        try:
+            await asyncio.gather(*(one() for _ in range(REQUESTS)))
+        except Exception as e:
+            return done, (finished or started) - started, e
+        return done, finished - started, None
+
+
+async def main():
+    token = seed()
+    probe = DbProbe()
+    middleware.PUBLIC_ROUTES.discard("/")
+    print(f"{REQUESTS} pedidos GET /auth/me, {DB_RTT_MS:.0f} ms por consulta ao banco\n")
+    for label, legacy, concurrency in (("antes", True, 1), ("depois", False, 1), ("depois", False, CONCURRENCY)):
+        # Devolve ao pool as conexões que a fase anterior deixou presas
+        gc.collect()
+        principals.invalidate()
+        app = make_app(legacy)
+        probe.reset()
+        done, elapsed, error = await run(app, token, concurrency)
+        print(
+            f"{label:<7} {concurrency:3d} simultâneos {done / max(elapsed, 1e-9):7.0f} pedidos/s | "
+            f"{probe.queries / max(done, 1):5.2f} consultas/pedido | pico de {probe.peak_connections} conexões do pool em uso"
+        )
+        if error is not None:
+            print(f"        interrompido após {done} pedidos: {type(error).__name__}")
+    print(f"\ncache de principal: {principals.stats()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
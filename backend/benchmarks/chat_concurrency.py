@@ -0,0 +1,108 @@
+"""
+Benchmark de vazão do /api/chat com 50 sessões simultâneas contra o servidor fake.
+
+Compara o caminho antigo (cliente síncrono chamado de dentro do event loop, cópia da
+função `chat_with_openai` que o endpoint usava) com `chat_with_openai_async`. Cada
+completion do servidor fake demora LATENCY segundos.
+
+Uso (a partir de backend/):
+    python -m benchmarks.chat_concurrency
+"""
+import asyncio
+import os
+import time
+
+from benchmarks.fake_openai_server import start_server
+
+CONCURRENCY = 50
+LATENCY = 0.5
+
+server = start_server(latency=LATENCY)
+os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_port}/v1"
+os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from src.api.services.history_manager import history_manager, CHAT_SUMMARY_MODEL  # noqa: E402
+from src.api.services.openai_service import (  # noqa: E402
+    OPENAI_CHAT_MODEL, _build_messages, _error_response, _finish_turn, chat_with_openai_async
+)
+from src.api.services.response_cache import response_cache  # noqa: E402
+from src.api.services.session_backends import session_backend  # noqa: E402
+
+_sync_client = None
+
+
+def sync_client():
+    # Cliente síncrono da OpenAI (a API não tem mais um): aponta para o servidor fake via
+    # OPENAI_BASE_URL
+    global _sync_client
+    if _sync_client is None:
+        import openai
+
+        _sync_client = openai.OpenAI()
+    return _sync_client
+
+
+def chat_with_openai(user_message: str, db, session_id=None) -> dict:
+    """
+    Caminho síncrono antigo do /api/chat (cliente síncrono da OpenAI, sem as travas por
+    sessão, a idempotência e a fila justa do caminho assíncrono).
+    """
+    session = session_backend.get_or_create(session_id)
+    upto = history_manager.plan_fold(session)
+    if upto is not None:
+        try:
+            response = sync_client().chat.completions.create(
+                model=CHAT_SUMMARY_MODEL,
+                messages=history_manager.summary_messages(session, upto),
+                temperature=0.3,
+                max_tokens=300
+            )
+            history_manager.apply_fold(session, upto, response.choices[0].message.content)
+        except Exception:
+            pass
+    messages_for_openai = _build_messages(session, user_message)
+    cache_key = response_cache.key_for(session, user_message)
+    try:
+        ai_full_response = response_cache.get(cache_key)
+        if ai_full_response is None:
+            response = sync_client().chat.completions.create(
+                model=OPENAI_CHAT_MODEL,
+                messages=messages_for_openai,
+                temperature=0.7,
+                max_tokens=1000
+            )
+            ai_full_response = response.choices[0].message.content
+            response_cache.put(cache_key, ai_full_response)
+        return _finish_turn(session, user_message, ai_full_response, db)
+    except Exception as e:
+        return _error_response(session.session_id, e)
+
+
+async def run_sync_in_loop():
+    async def one(i):
+        # Igual ao endpoint antigo: `async def` chamando a função bloqueante
+        return chat_with_openai(f"Olá, sessão {i}", db=None, session_id=None)
+    await asyncio.gather(*(one(i) for i in range(CONCURRENCY)))
+
+
+async def run_async():
+    await asyncio.gather(*(
+        chat_with_openai_async(f"Olá, sessão {i}", db=None, session_id=None)
+        for i in range(CONCURRENCY)
+    ))
+
+
+async def main():
+    for name, scenario in (("síncrono no loop", run_sync_in_loop), ("assíncrono", run_async)):
+        # As mesmas mensagens de abertura nos dois cenários: sem o cache de respostas,
+        # todas as completions vão ao servidor
+        response_cache.clear()
+        start = time.perf_counter()
+        await scenario()
+        elapsed = time.perf_counter() - start
+        print(f"{name:>18}: {CONCURRENCY} chats em {elapsed:.2f}s -> {CONCURRENCY / elapsed:.1f} chats/s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
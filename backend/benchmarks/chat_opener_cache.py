@@ -0,0 +1,50 @@
+"""
+Benchmark do cache de respostas para mensagens de abertura.
+
+Abre 60 sessões novas com saudações quase idênticas ("Olá!", "olá", "Bom dia"...)
+contra o servidor fake (0,5 s por completion) e mostra a latência p50 do primeiro
+turno com o cache desligado e ligado, além da taxa de acerto.
+
+Uso (a partir de backend/):
+    python -m benchmarks.chat_opener_cache
+"""
+import asyncio
+import os
+import statistics
+import time
+
+from benchmarks.fake_openai_server import start_server
+
+server = start_server(latency=0.5)
+os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_port}/v1"
+os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from src.api.services.openai_service import chat_with_openai_async  # noqa: E402
+from src.api.services.response_cache import response_cache  # noqa: E402
+
+OPENERS = ["Olá!", "olá", "Ola", "Bom dia", "bom dia!!", "Quero saber mais", "quero saber mais."]
+SESSIONS = 60
+
+
+async def first_turn_latencies() -> list:
+    latencies = []
+    for i in range(SESSIONS):
+        start = time.perf_counter()
+        await chat_with_openai_async(OPENERS[i % len(OPENERS)], db=None)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+async def main():
+    for enabled in (False, True):
+        response_cache.enabled = enabled
+        response_cache.clear()
+        latencies = await first_turn_latencies()
+        label = "ligado" if enabled else "desligado"
+        print(f"cache {label:>9}: p50 do primeiro turno = {statistics.median(latencies):7.1f} ms")
+    print(f"estatísticas: {response_cache.stats()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
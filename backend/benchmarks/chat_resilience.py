@@ -0,0 +1,107 @@
+"""
+Benchmark da camada de resiliência das completions contra o servidor fake com falhas
+injetadas (ERROR_RATE de respostas 429/500/503 e SLOW_RATE de respostas de SLOW_LATENCY s).
+
+Compara: sem proteção (só o cliente), prazo + retries com jitter, prazo + retries + hedge,
+e mede o custo de uma chamada com o provedor fora do ar com e sem circuit breaker.
+
+Uso (a partir de backend/):
+    python -m benchmarks.chat_resilience
+"""
+import asyncio
+import os
+import random
+import statistics
+import time
+
+from benchmarks.fake_openai_server import start_server
+
+LATENCY = 0.2
+ERROR_RATE = 0.1
+SLOW_RATE = 0.05
+SLOW_LATENCY = 3.0
+REQUESTS = 300
+CONCURRENCY = 30
+
+server = start_server(latency=LATENCY, error_rate=ERROR_RATE, slow_rate=SLOW_RATE, slow_latency=SLOW_LATENCY)
+os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_port}/v1"
+os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from src.api.services.chat_concurrency import FairLimiter  # noqa: E402
+from src.api.services.llm_resilience import CircuitBreaker, ResilientCompletions  # noqa: E402
+from src.api.services.providers import providers  # noqa: E402
+import src.api.services.openai_service  # noqa: E402,F401  (registra os clientes da OpenAI)
+
+MESSAGES = [{"role": "user", "content": "Olá"}]
+
+
+def make(**options) -> ResilientCompletions:
+    return ResilientCompletions(
+        providers.get("openai_async").chat.completions, FairLimiter(limit=CONCURRENCY * 2),
+        breaker=options.pop("breaker", CircuitBreaker(failure_threshold=1000)), **options
+    )
+
+
+async def run(completions: ResilientCompletions, requests: int = REQUESTS):
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    latencies, failures = [], 0
+
+    async def one():
+        nonlocal failures
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await completions.create(model="gpt-4", messages=MESSAGES)
+            except Exception:
+                failures += 1
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return sorted(latencies), failures
+
+
+def report(name: str, latencies: list, failures: int, completions: ResilientCompletions) -> None:
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))] * 1000
+
+    stats = completions.stats()
+    print(
+        f"{name:>28}: sucesso {100 * (1 - failures / len(latencies)):5.1f}%  "
+        f"p50 {statistics.median(latencies) * 1000:5.0f} ms  p95 {pct(95):5.0f} ms  p99 {pct(99):5.0f} ms  "
+        f"(tentativas {stats['attempts']}, retries {stats['retries']}, timeouts {stats['timeouts']}, "
+        f"hedges {stats['hedges']}/{stats['hedge_wins']} venceram)"
+    )
+
+
+async def main():
+    print(f"provedor: {LATENCY * 1000:.0f} ms, {ERROR_RATE:.0%} erros, {SLOW_RATE:.0%} lentas ({SLOW_LATENCY:.0f} s)")
+    scenarios = (
+        ("sem prazo nem retries", dict(timeout=60, max_retries=0)),
+        ("prazo 1 s + 2 retries", dict(timeout=1.0, max_retries=2, retry_base_ms=100)),
+        ("prazo + retries + hedge p95", dict(timeout=1.0, max_retries=2, retry_base_ms=100,
+                                             hedge_enabled=True, hedge_min_ms=250)),
+    )
+    for name, options in scenarios:
+        random.seed(7)
+        completions = make(**options)
+        if options.get("hedge_enabled"):
+            # Aquece a janela de latências usada para decidir o hedge
+            await run(completions, 60)
+            completions.attempts = completions.retries = completions.timeouts = 0
+            completions.hedges = completions.hedge_wins = 0
+        latencies, failures = await run(completions)
+        report(name, latencies, failures, completions)
+
+    # Provedor fora do ar: quanto custa cada chamada depois que as falhas se acumulam
+    server.RequestHandlerClass.error_rate = 1.0
+    server.RequestHandlerClass.slow_rate = 0.0
+    for name, breaker in (("fora do ar, sem breaker", CircuitBreaker(failure_threshold=10 ** 6)),
+                          ("fora do ar, com breaker", CircuitBreaker(failure_threshold=5, reset_seconds=30))):
+        completions = make(timeout=1.0, max_retries=2, retry_base_ms=100, breaker=breaker)
+        latencies, failures = await run(completions, 100)
+        report(name, latencies, failures, completions)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,42 @@
+"""
+Benchmark do tempo até o primeiro token (TTFT) do chat em streaming.
+
+Compara o tempo até o usuário ver algum texto no caminho sem streaming
+(`chat_with_openai_async`, resposta inteira) e no caminho com SSE
+(`stream_chat_with_openai`, primeiro evento `delta`), contra o servidor fake.
+
+Uso (a partir de backend/):
+    python -m benchmarks.chat_stream_ttft
+"""
+import asyncio
+import os
+import time
+
+from benchmarks.fake_openai_server import start_server
+
+TOKEN_DELAY = 0.05
+
+server = start_server(latency=0.0, token_delay=TOKEN_DELAY)
+os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_port}/v1"
+os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from src.api.services.openai_service import stream_chat_with_openai  # noqa: E402
+
+
+async def main():
+    start = time.perf_counter()
+    first_token = None
+    leaked = False
+    async for event in stream_chat_with_openai("Olá!", db=None):
+        if event["type"] == "delta":
+            first_token = first_token or time.perf_counter() - start
+            leaked = leaked or "{" in event["text"] or "```" in event["text"]
+    total = time.perf_counter() - start
+    print(f"resposta completa (sem streaming): {total * 1000:.0f} ms")
+    print(f"primeiro token (SSE):              {first_token * 1000:.0f} ms")
+    print(f"JSON do lead vazou para o cliente: {'sim' if leaked else 'não'}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,89 @@
+"""
+Benchmark da serialização de turnos, idempotência e limite global de chamadas à OpenAI.
+
+Cenários (servidor fake com LATENCY segundos por completion):
+  1. Duplo envio: duas mensagens simultâneas na mesma sessão -> histórico em ordem.
+  2. Reenvio: 5 pedidos com a mesma Idempotency-Key -> quantas completions pagas.
+  3. Rajada: BURST sessões novas ao mesmo tempo -> máximo de chamadas simultâneas
+     no provedor e latência p50/p95 com o limite OPENAI_MAX_IN_FLIGHT.
+
+Uso (a partir de backend/):
+    python -m benchmarks.chat_turn_control
+"""
+import asyncio
+import os
+import statistics
+import time
+
+from benchmarks.fake_openai_server import start_server
+
+LATENCY = 0.2
+BURST = 200
+
+server = start_server(latency=LATENCY)
+os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_port}/v1"
+os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("CHAT_RESPONSE_CACHE_ENABLED", "0")
+os.environ.setdefault("LEAD_WRITE_BEHIND", "0")
+
+from src.api.services import openai_service  # noqa: E402
+from src.api.services.chat_concurrency import llm_limiter  # noqa: E402
+from src.api.services.openai_service import chat_with_openai_async  # noqa: E402
+
+# O banco não interessa aqui: grava o turno só na sessão
+openai_service._persist_turn = lambda db, session, user_message, reply: None
+
+
+async def double_submit():
+    first = await chat_with_openai_async("Olá", db=None)
+    session_id = first["session_id"]
+    await asyncio.gather(
+        chat_with_openai_async("Tenho uma clínica", db=None, session_id=session_id),
+        chat_with_openai_async("Quero automatizar a agenda", db=None, session_id=session_id),
+    )
+    session = openai_service.session_backend.get(session_id)
+    roles = [message.role for message in session.history]
+    alternating = all(roles[i] == ("user" if i % 2 == 0 else "assistant") for i in range(len(roles)))
+    print(f"duplo envio: {len(roles)} mensagens, papéis alternados: {alternating}")
+
+
+async def retries():
+    first = await chat_with_openai_async("Olá", db=None)
+    server.reset_counters()
+    results = await asyncio.gather(*(
+        chat_with_openai_async("Quero um orçamento", db=None, session_id=first["session_id"], idempotency_key="abc-123")
+        for _ in range(5)
+    ))
+    same = len({result["response"] for result in results}) == 1
+    print(f"reenvio: 5 pedidos com a mesma chave -> {server.requests} completion(s), respostas iguais: {same}")
+
+
+async def burst():
+    server.reset_counters()
+
+    async def one(i):
+        started = time.perf_counter()
+        await chat_with_openai_async(f"Olá, sessão {i}", db=None)
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    latencies = sorted(await asyncio.gather(*(one(i) for i in range(BURST))))
+    elapsed = time.perf_counter() - started
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(
+        f"rajada: {BURST} chats em {elapsed:.2f}s, limite {llm_limiter.limit} -> "
+        f"máx. {server.max_in_flight} simultâneas no provedor, "
+        f"p50 {statistics.median(latencies) * 1000:.0f} ms, p95 {p95 * 1000:.0f} ms, "
+        f"espera máx. na fila {llm_limiter.stats()['max_wait_ms']:.0f} ms"
+    )
+
+
+async def main():
+    await double_submit()
+    await retries()
+    await burst()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
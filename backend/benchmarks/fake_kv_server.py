@@ -0,0 +1,113 @@
+"""
+Servidor chave-valor local que fala RESP (subconjunto do Redis: PING, AUTH, SELECT,
+GET, SET [EX|PX] [NX], DEL e o EVAL de liberação do turno), usado como substituto do
+servidor externo em benchmarks e testes manuais do KeyValueSessionBackend.
+
+Uso (a partir de backend/):
+    python -m benchmarks.fake_kv_server --port 6390
+    SESSION_BACKEND=kv SESSION_KV_URL=redis://127.0.0.1:6390/0 uvicorn src.main:app --workers 4
+"""
+import argparse
+import asyncio
+import threading
+import time
+
+from src.api.services.session_backends import _RELEASE_TURN_SCRIPT
+
+
+class FakeKeyValueServer:
+    def __init__(self):
+        self.data = {}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                args = await self._read_command(reader)
+                if args is None:
+                    break
+                writer.write(self._execute(args))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_command(self, reader):
+        line = await reader.readline()
+        if not line:
+            return None
+        count = int(line[1:-2])
+        args = []
+        for _ in range(count):
+            size = int((await reader.readline())[1:-2])
+            args.append((await reader.readexactly(size + 2))[:-2])
+        return args
+
+    def _execute(self, args) -> bytes:
+        command = args[0].upper()
+        if command in (b"PING", b"AUTH", b"SELECT"):
+            return b"+OK\r\n" if command != b"PING" else b"+PONG\r\n"
+        if command == b"GET":
+            if not self._alive(args[1]):
+                return b"$-1\r\n"
+            value = self.data[args[1]][0]
+            return b"$%d\r\n%s\r\n" % (len(value), value)
+        if command == b"SET":
+            expires = None
+            options = [arg.upper() for arg in args[3:]]
+            for unit, scale in ((b"EX", 1.0), (b"PX", 0.001)):
+                if unit in options:
+                    expires = time.monotonic() + int(args[3 + options.index(unit) + 1]) * scale
+            if b"NX" in options and self._alive(args[1]):
+                return b"$-1\r\n"
+            self.data[args[1]] = (args[2], expires)
+            return b"+OK\r\n"
+        if command == b"DEL":
+            removed = sum(1 for key in args[1:] if self.data.pop(key, None) is not None)
+            return b":%d\r\n" % removed
+        if command == b"EVAL":
+            # Sem Lua: só o script de KeyValueSessionBackend.release_turn (compara e apaga)
+            if args[1].decode() != _RELEASE_TURN_SCRIPT:
+                return b"-ERR script nao suportado\r\n"
+            key, token = args[3], args[4]
+            if not self._alive(key) or self.data[key][0] != token:
+                return b":0\r\n"
+            del self.data[key]
+            return b":1\r\n"
+        return b"-ERR comando desconhecido\r\n"
+
+    def _alive(self, key) -> bool:
+        entry = self.data.get(key)
+        if entry is None or (entry[1] is not None and entry[1] <= time.monotonic()):
+            self.data.pop(key, None)
+            return False
+        return True
+
+
+def start_server(port: int = 0):
+    """
+    Sobe o servidor numa thread daemon e retorna a porta em uso.
+    """
+    ready = threading.Event()
+    holder = {}
+
+    def run():
+        loop = asyncio.new_event_loop()
+        server = loop.run_until_complete(
+            asyncio.start_server(FakeKeyValueServer().handle, "127.0.0.1", port)
+        )
+        holder["port"] = server.sockets[0].getsockname()[1]
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True).start()
+    ready.wait()
+    return holder["port"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=6390)
+    args = parser.parse_args()
+    print(f"Servidor chave-valor fake em redis://127.0.0.1:{start_server(args.port)}/0")
+    threading.Event().wait()
@@ -0,0 +1,184 @@
+"""
+Servidor local que imita o endpoint /v1/chat/completions da OpenAI, para benchmarks.
+
+Uso (a partir de backend/):
+    python -m benchmarks.fake_openai_server --port 8765 --latency 1.0
+
+Depois aponte o cliente para ele com OPENAI_BASE_URL=http://127.0.0.1:8765/v1.
+
+Para testar a camada de resiliência, injete falhas e lentidão:
+    python -m benchmarks.fake_openai_server --error-rate 0.2 --slow-rate 0.05 --slow-latency 10
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_REPLY = (
+    "Olá! (pausa breve) Que bom ter você por aqui. Qual a maior dificuldade no dia a dia da sua equipe?\n"
+    "```json\n"
+    "{\"nome\": null, \"email\": null, \"telefone\": null, \"empresa\": null, "
+    "\"setor\": null, \"interesse\": null, \"mensagem\": null, \"origem\": \"website\"}\n"
+    "```"
+)
+
+
+class FakeCompletionHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = 1.0
+    token_delay = 0.02
+    reply = DEFAULT_REPLY
+    # Injeção de falhas: fração de respostas 500/429 e de respostas muito lentas
+    error_rate = 0.0
+    slow_rate = 0.0
+    slow_latency = 10.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        self.server.track(+1)
+        try:
+            if random.random() < self.error_rate:
+                time.sleep(self.latency / 10)
+                self._send_error()
+                return
+            if random.random() < self.slow_rate:
+                time.sleep(self.slow_latency)
+            if request.get("stream"):
+                self._send_stream()
+            else:
+                time.sleep(self.latency)
+                self._send_completion()
+        finally:
+            self.server.track(-1)
+
+    def _send_stream(self):
+        # Primeiro token depois de um atraso curto; o restante chega token a token
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        time.sleep(self.token_delay * 5)
+        for token in self.reply.split(" "):
+            chunk = {
+                "id": "chatcmpl-stream",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": "gpt-4",
+                "choices": [{"index": 0, "delta": {"content": token + " "}, "finish_reason": None}],
+            }
+            self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode())
+            time.sleep(self.token_delay)
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+    def _send_error(self):
+        status = random.choice((429, 500, 503))
+        body = json.dumps({"error": {"message": "falha injetada", "type": "server_error", "code": None}}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if status == 429:
+            self.send_header("Retry-After", "0")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_completion(self):
+        body = json.dumps({
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": "gpt-4",
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": self.reply},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FakeServer(ThreadingHTTPServer):
+    request_queue_size = 256
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._counter_lock = threading.Lock()
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def handle_error(self, request, client_address):
+        # Cliente que desistiu por timeout/hedge fecha a conexão no meio da resposta
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def track(self, delta: int) -> None:
+        # Contadores de completions recebidas e simultâneas (para os benchmarks)
+        with self._counter_lock:
+            if delta > 0:
+                self.requests += 1
+            self.in_flight += delta
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def reset_counters(self) -> None:
+        with self._counter_lock:
+            self.requests = 0
+            self.max_in_flight = self.in_flight
+
+
+def start_server(
+    port: int = 0,
+    latency: float = 1.0,
+    token_delay: float = 0.02,
+    error_rate: float = 0.0,
+    slow_rate: float = 0.0,
+    slow_latency: float = 10.0,
+) -> FakeServer:
+    """
+    Sobe o servidor em uma thread daemon e o retorna (porta real em `server.server_port`).
+    As taxas de falha podem ser alteradas depois em `server.RequestHandlerClass`.
+    """
+    handler = type("Handler", (FakeCompletionHandler,), {
+        "latency": latency,
+        "token_delay": token_delay,
+        "error_rate": error_rate,
+        "slow_rate": slow_rate,
+        "slow_latency": slow_latency,
+    })
+    server = FakeServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=1.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--slow-rate", type=float, default=0.0)
+    parser.add_argument("--slow-latency", type=float, default=10.0)
+    args = parser.parse_args()
+    server = start_server(
+        args.port, args.latency,
+        error_rate=args.error_rate, slow_rate=args.slow_rate, slow_latency=args.slow_latency
+    )
+    print(f"Servidor fake da OpenAI em http://127.0.0.1:{server.server_port}/v1")
+    threading.Event().wait()
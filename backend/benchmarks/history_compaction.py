@@ -0,0 +1,66 @@
+"""
+Benchmark da compactação do histórico do chat.
+
+Simula uma conversa de 100 turnos e mostra, nos turnos 5, 20 e 100, os tokens do
+prompt enviado (system prompt + histórico + mensagem) com o histórico completo e
+com o `HistoryManager`, além do tempo para montar as mensagens e de quantas vezes
+o resumo precisou ser regenerado. O resumo é gerado por um stub local.
+
+Uso (a partir de backend/):
+    python -m benchmarks.history_compaction
+"""
+import os
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from src.api.services.history_manager import HistoryManager, count_tokens  # noqa: E402
+from src.api.services.openai_service import get_stateful_system_prompt  # noqa: E402
+from src.api.services.session_store import SessionStore, ROLE_USER, ROLE_ASSISTANT  # noqa: E402
+
+USER_TEXT = "Na minha empresa a equipe perde muito tempo conferindo notas fiscais e respondendo e-mails de clientes. "
+BOT_TEXT = (
+    "Entendo perfeitamente... (pausa breve) faz sentido estar preocupado com isso. "
+    "A IA pode assumir boa parte dessa conferência repetitiva e deixar a equipe livre para o que importa. "
+) * 3
+CHECKPOINTS = (5, 20, 100)
+
+
+def prompt_tokens(messages: list) -> int:
+    return sum(count_tokens(message["content"]) + 4 for message in messages)
+
+
+def main():
+    store = SessionStore()
+    manager = HistoryManager()
+    session = store.get_or_create(None)
+    system = {"role": "system", "content": get_stateful_system_prompt(session.state, session.lead_data)}
+
+    for turn in range(1, max(CHECKPOINTS) + 1):
+        user = {"role": "user", "content": USER_TEXT}
+
+        start = time.perf_counter()
+        upto = manager.plan_fold(session)
+        if upto is not None:
+            manager.apply_fold(session, upto, "Visitante relata retrabalho com notas fiscais e e-mails. " * 4)
+        managed = [system] + manager.context(session) + [user]
+        managed_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        full = [system] + session.openai_history() + [user]
+        full_ms = (time.perf_counter() - start) * 1000
+
+        if turn in CHECKPOINTS:
+            print(
+                f"turno {turn:>3}: completo={prompt_tokens(full):>6} tokens ({full_ms:.3f} ms)  "
+                f"compactado={prompt_tokens(managed):>5} tokens ({managed_ms:.3f} ms)  "
+                f"resumos gerados={manager.folds}"
+            )
+
+        store.append_message(session, ROLE_USER, USER_TEXT)
+        store.append_message(session, ROLE_ASSISTANT, BOT_TEXT)
+
+
+if __name__ == "__main__":
+    main()
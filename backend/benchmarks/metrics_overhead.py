@@ -0,0 +1,117 @@
+"""
+Benchmark do custo das métricas (src/api/services/metrics.py).
+
+- Pedidos/s em GET / com a pilha completa de src.main (CORS + Metrics + Log + Auth),
+  com e sem o MetricsMiddleware, chamando a aplicação ASGI direto (mediana de ROUNDS
+  rodadas intercaladas; log de acesso desligado para isolar as métricas).
+- Custo por operação (melhor de 5 repetições): observação num histograma,
+  `external_call` e os eventos do SQLAlchemy numa consulta (SQLite em memória, com e
+  sem os listeners).
+- Tempo para gerar o texto do /metrics com SERIES séries de rota.
+
+Uso (a partir de backend/):
+    python -m benchmarks.metrics_overhead
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+import timeit
+
+os.environ["ACCESS_LOG_ENABLED"] = "0"
+
+from sqlalchemy import create_engine, event, text  # noqa: E402
+from sqlalchemy.engine import Engine  # noqa: E402
+
+from benchmarks.middleware_stack import call, make_app  # noqa: E402
+from src.api.services import metrics as metrics_module  # noqa: E402
+from src.api.services.metrics import MetricsMiddleware, MetricsRegistry  # noqa: E402
+
+REQUESTS = 5000
+ROUNDS = 5
+SERIES = 60
+OPS = 100_000
+
+
+def stack(with_metrics: bool):
+    app = make_app(legacy=False)
+    if not with_metrics:
+        app.user_middleware = [item for item in app.user_middleware if item.cls is not MetricsMiddleware]
+    assert any(item.cls is MetricsMiddleware for item in app.user_middleware) == with_metrics
+    return app
+
+
+async def requests_per_second(asgi) -> float:
+    started = time.perf_counter()
+    for _ in range(REQUESTS):
+        await call(asgi, "/")
+    return REQUESTS / (time.perf_counter() - started)
+
+
+def per_op_us(func, number: int = OPS) -> float:
+    # Melhor de 5 repetições: o mínimo é o menos afetado por ruído da máquina
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+
+def query_us(engine, number: int = 20_000) -> float:
+    with engine.connect() as conn:
+        statement = text("select 1")
+        return per_op_us(lambda: conn.execute(statement).scalar(), number)
+
+
+async def main():
+    apps = {"sem métricas": stack(False), "com métricas": stack(True)}
+    rps = {label: [] for label in apps}
+    sys.stdout = open(os.devnull, "w")
+    for asgi in apps.values():
+        await call(asgi, "/")
+    for _ in range(ROUNDS):
+        for label, asgi in apps.items():
+            rps[label].append(await requests_per_second(asgi))
+    sys.stdout = sys.__stdout__
+
+    print(f"GET / com a pilha completa, {REQUESTS} pedidos, mediana de {ROUNDS} rodadas")
+    base = statistics.median(rps["sem métricas"])
+    for label, values in rps.items():
+        median = statistics.median(values)
+        print(f"  {label:<13} {median:7.0f} pedidos/s ({(1 / median - 1 / base) * 1e6:+5.1f} µs por pedido)")
+
+    registry = MetricsRegistry()
+    labels = ("GET", "/api/chat")
+    print("\ncusto por operação:")
+    print(f"  Histogram.observe              {per_op_us(lambda: registry.http_duration.observe(0.012, labels)):5.2f} µs")
+
+    def external():
+        with registry.external_call("openai", "chat.completions"):
+            pass
+    print(f"  external_call (with vazio)     {per_op_us(external):5.2f} µs")
+
+    engine = create_engine("sqlite://")
+    with_listeners = query_us(engine)
+    for name, listener in (
+        ("before_cursor_execute", metrics_module._query_started),
+        ("after_cursor_execute", metrics_module._query_finished),
+        ("handle_error", metrics_module._query_failed),
+    ):
+        event.remove(Engine, name, listener)
+    without_listeners = query_us(engine)
+    print(
+        f"  consulta SQLite 'select 1'     {without_listeners:5.2f} µs sem eventos, {with_listeners:5.2f} µs com "
+        f"({with_listeners - without_listeners:+.2f} µs)"
+    )
+
+    for index in range(SERIES):
+        route = f"/rota/{index}"
+        for status in ("200", "404", "500"):
+            registry.http_requests.inc(("GET", route, status))
+        registry.http_duration.observe(0.01, ("GET", route))
+        registry.db_duration.observe(0.001, ("select", route))
+    started = time.perf_counter()
+    body = registry.render()
+    render_ms = (time.perf_counter() - started) * 1000
+    print(f"\n/metrics com {SERIES} rotas: {len(body.splitlines())} linhas, {len(body) / 1024:.0f} KB em {render_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,141 @@
+"""
+Benchmark da pilha de middlewares da API (CORS + LogMiddleware + AuthMiddleware).
+
+Monta a mesma pilha de src.main duas vezes: com cópias dos middlewares antigos baseados
+em BaseHTTPMiddleware e com os atuais em ASGI puro. As chamadas vão direto na aplicação
+ASGI (sem rede nem cliente HTTP) para que a diferença seja só o custo dos middlewares:
+- pedidos/s em GET / (rota trivial);
+- pedaços/s numa resposta em streaming de STREAM_CHUNKS pedaços (como o SSE do chat).
+Os prints dos middlewares vão para /dev/null durante as medições.
+
+Uso (a partir de backend/):
+    python -m benchmarks.middleware_stack
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+os.environ["PROVIDERS_WARMUP"] = "0"
+
+from fastapi import FastAPI, HTTPException, Request  # noqa: E402
+from fastapi.responses import JSONResponse, StreamingResponse  # noqa: E402
+from starlette.middleware import Middleware  # noqa: E402
+from starlette.middleware.base import BaseHTTPMiddleware  # noqa: E402
+
+import src.api.middleware as middleware  # noqa: E402
+from src.logger import LogMiddleware  # noqa: E402
+from src.main import app, read_root  # noqa: E402
+
+REQUESTS = 5000
+STREAM_CHUNKS = 2000
+ROUNDS = 5
+
+
+class LegacyAuthMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        request_path = request.url.path
+        print(f"🔍 Verificando autenticação para: {request_path}")
+        if any(request_path.startswith(route) for route in middleware.PUBLIC_ROUTES):
+            return await call_next(request)
+        raise HTTPException(status_code=401, detail="Token de autenticação ausente")
+
+
+class LegacyLogMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        print(f"📥 Request recebido: {request.method} {request.url}")
+        try:
+            response = await call_next(request)
+            print(f"✅ Resposta enviada: {response.status_code}")
+            return response
+        except HTTPException as e:
+            return JSONResponse(status_code=e.status_code, content={"detail": e.detail})
+        except Exception as e:
+            print(f"❌ Erro inesperado: {str(e)}")
+            return JSONResponse(status_code=500, content={"detail": "Unexpected error occurred"})
+
+
+async def stream_chunks():
+    for _ in range(STREAM_CHUNKS):
+        yield b"data: {\"type\": \"delta\", \"text\": \"ok\"}\n\n"
+
+
+def make_app(legacy: bool) -> FastAPI:
+    # Mesma pilha de src.main, trocando só as classes dos middlewares de autenticação e log
+    replacements = {middleware.AuthMiddleware: LegacyAuthMiddleware, LogMiddleware: LegacyLogMiddleware}
+    bench = FastAPI()
+    bench.get("/")(read_root)
+    bench.get("/stream")(lambda: StreamingResponse(stream_chunks(), media_type="text/event-stream"))
+    bench.user_middleware = [
+        Middleware(replacements.get(item.cls, item.cls) if legacy else item.cls, *item.args, **item.kwargs)
+        for item in app.user_middleware
+    ]
+    return bench
+
+
+async def call(asgi, path: str) -> int:
+    """
+    Um pedido GET direto na aplicação ASGI; devolve quantas mensagens de corpo chegaram.
+    """
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+        "headers": [(b"host", b"bench"), (b"origin", b"http://localhost:3000")],
+        "client": ("127.0.0.1", 1234), "server": ("bench", 80),
+    }
+    received = False
+    bodies = 0
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.sleep(3600)
+
+    async def send(message):
+        nonlocal bodies
+        if message["type"] == "http.response.start":
+            assert message["status"] == 200, message
+        elif message["type"] == "http.response.body":
+            bodies += 1
+
+    await asyncio.wait_for(asyncio.ensure_future(asgi(scope, receive, send)), timeout=60)
+    return bodies
+
+
+async def requests_per_second(asgi) -> float:
+    started = time.perf_counter()
+    for _ in range(REQUESTS):
+        await call(asgi, "/")
+    return REQUESTS / (time.perf_counter() - started)
+
+
+async def chunks_per_second(asgi) -> float:
+    started = time.perf_counter()
+    bodies = await call(asgi, "/stream")
+    assert bodies >= STREAM_CHUNKS
+    return STREAM_CHUNKS / (time.perf_counter() - started)
+
+
+async def main():
+    results = {}
+    sys.stdout = open(os.devnull, "w")
+    for label, legacy in (("BaseHTTPMiddleware", True), ("ASGI puro", False)):
+        asgi = make_app(legacy)
+        await call(asgi, "/")
+        rps = [await requests_per_second(asgi) for _ in range(ROUNDS)]
+        cps = [await chunks_per_second(asgi) for _ in range(ROUNDS)]
+        results[label] = (statistics.median(rps), statistics.median(cps))
+    sys.stdout = sys.__stdout__
+
+    print(f"pilha CORS + Log + Auth, mediana de {ROUNDS} rodadas\n")
+    for label, (rps, cps) in results.items():
+        print(f"{label:<19} GET / {rps:7.0f} pedidos/s   streaming {cps:8.0f} pedaços/s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,67 @@
+"""
+Micro-benchmark do pós-processamento das respostas do modelo.
+
+Compara o encadeamento antigo (regex compiladas a cada chamada, replace, segunda
+substituição e json.loads) com `parse_model_response` sobre um corpus de respostas
+gravadas de tamanhos variados (curtas, médias e longas; JSON em bloco, solto e transferência).
+
+Uso (a partir de backend/):
+    python -m benchmarks.response_postprocess
+"""
+import json
+import re
+import timeit
+
+from src.api.services.response_parser import HANDOFF_MESSAGE, parse_model_response
+
+LEAD_JSON = json.dumps({
+    "nome": "Ana", "email": "ana@empresa.pt", "telefone": None, "empresa": "Contas Certas",
+    "setor": "contabilidade", "interesse": "automação", "mensagem": None, "origem": "website",
+}, ensure_ascii=False, indent=2)
+PARAGRAPH = (
+    "Entendo perfeitamente... (pausa breve) faz sentido estar preocupado com isso. "
+    "A IA pode assumir a conferência repetitiva e deixar a equipe livre para o que importa. "
+)
+
+CORPUS = {
+    "curta/bloco": PARAGRAPH + f"\n```json\n{LEAD_JSON}\n```",
+    "média/bloco": PARAGRAPH * 8 + f"\n```json\n{LEAD_JSON}\n```",
+    "longa/bloco": PARAGRAPH * 40 + f"\n```json\n{LEAD_JSON}\n```",
+    "média/solto": PARAGRAPH * 8 + "\n" + LEAD_JSON,
+    "transferência": HANDOFF_MESSAGE + f"\n```json\n{LEAD_JSON}\n```",
+}
+
+
+def legacy(ai_full_response: str):
+    if HANDOFF_MESSAGE in ai_full_response:
+        return HANDOFF_MESSAGE, None
+    extracted_json = None
+    ai_response_without_json = ai_full_response
+    pattern = re.compile(r"```(?:json)?\s*(\{.*?\})\s*```", re.DOTALL | re.IGNORECASE)
+    match = pattern.search(ai_full_response)
+    if match:
+        extracted_json = match.group(1).strip()
+        ai_response_without_json = ai_full_response.replace(match.group(0), "")
+    else:
+        pattern_alt = re.compile(r"\{\s*\"nome\".*?\}", re.DOTALL)
+        match_alt = pattern_alt.search(ai_full_response)
+        if match_alt:
+            extracted_json = match_alt.group(0)
+            ai_response_without_json = ai_full_response.replace(extracted_json, "")
+    ai_response_without_json = re.sub(r"\bjson\b", "", ai_response_without_json, flags=re.IGNORECASE)
+    lead = json.loads(extracted_json) if extracted_json else None
+    return ai_response_without_json.strip(), lead
+
+
+def single_pass(ai_full_response: str):
+    parsed = parse_model_response(ai_full_response)
+    return parsed.reply, None if parsed.handoff else parsed.lead_data
+
+
+if __name__ == "__main__":
+    for name, text in CORPUS.items():
+        assert legacy(text)[0] == single_pass(text)[0], name
+        runs = 20000
+        old = timeit.timeit(lambda: legacy(text), number=runs) / runs * 1e6
+        new = timeit.timeit(lambda: single_pass(text), number=runs) / runs * 1e6
+        print(f"{name:>14} ({len(text):>5} chars): antigo={old:7.2f} µs  passada única={new:7.2f} µs")
@@ -0,0 +1,71 @@
+"""
+Benchmark dos backends de sessão do chat.
+
+Para cada backend (memory, sqlite em WAL, kv contra o servidor fake) mede o custo de
+um turno (get_or_create + 2 mensagens + save) e verifica, com um segundo processo,
+que a sessão gravada é vista pelos outros workers (exceto no backend em memória).
+
+Uso (a partir de backend/):
+    python -m benchmarks.session_backends
+"""
+import multiprocessing
+import os
+import tempfile
+import time
+
+from benchmarks.fake_kv_server import start_server
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from src.api.services.session_backends import (  # noqa: E402
+    MemorySessionBackend, SQLiteSessionBackend, KeyValueSessionBackend
+)
+from src.api.services.session_store import SessionStore, ROLE_USER, ROLE_ASSISTANT  # noqa: E402
+
+TURNS = 2000
+
+
+def run_turns(backend, session_id: str) -> float:
+    start = time.perf_counter()
+    for _ in range(TURNS):
+        session = backend.get_or_create(session_id)
+        # Mantém a sessão com ~10 turnos, como uma conversa típica
+        del session.history[:-18]
+        backend.append_message(session, ROLE_USER, "Quero saber mais sobre automação de processos.")
+        backend.append_message(session, ROLE_ASSISTANT, "Claro! (pausa breve) Conte-me um pouco mais.")
+        backend.save(session)
+    return (time.perf_counter() - start) / TURNS * 1e6
+
+
+def read_in_other_process(factory, session_id, queue):
+    session = factory().get(session_id)
+    queue.put(len(session.history) if session else 0)
+
+
+def make_sqlite(path):
+    return lambda: SQLiteSessionBackend(path)
+
+
+def make_kv(url):
+    return lambda: KeyValueSessionBackend(url)
+
+
+if __name__ == "__main__":
+    sqlite_path = os.path.join(tempfile.mkdtemp(), "sessions.sqlite3")
+    kv_url = f"redis://127.0.0.1:{start_server()}/0"
+    backends = {
+        "memory": lambda: MemorySessionBackend(SessionStore()),
+        "sqlite": make_sqlite(sqlite_path),
+        "kv": make_kv(kv_url),
+    }
+    context = multiprocessing.get_context("fork")
+    for name, factory in backends.items():
+        backend = factory()
+        session_id = f"bench-{name}"
+        per_turn = run_turns(backend, session_id)
+        queue = context.Queue()
+        process = context.Process(target=read_in_other_process, args=(factory, session_id, queue))
+        process.start()
+        process.join()
+        seen = queue.get()
+        print(f"{name:>6}: {per_turn:8.1f} µs/turno  outro processo vê {seen} mensagens")
@@ -0,0 +1,68 @@
+"""
+Benchmark de memória do armazenamento de sessões do chat.
+
+Mede os bytes por sessão (via tracemalloc) com 10k e 100k sessões, cada uma com
+algumas trocas de mensagens, comparando o formato antigo (dicts por turno) com o
+`SessionStore` compacto.
+
+Uso (a partir de backend/):
+    python -m benchmarks.session_store_memory
+"""
+import gc
+import tracemalloc
+import uuid
+
+from src.api.services.session_store import SessionStore, ROLE_USER, ROLE_ASSISTANT
+
+TURNS = 3
+USER_TEXT = "Olá, gostaria de saber mais sobre como a IA pode ajudar a minha empresa."
+BOT_TEXT = "Claro! (pausa breve) Conte-me um pouco mais sobre o dia a dia da sua equipe."
+
+
+def build_legacy(count: int) -> dict:
+    sessions = {}
+    for _ in range(count):
+        history = []
+        for _ in range(TURNS):
+            history.append({"role": "user", "content": USER_TEXT})
+            history.append({"role": "assistant", "content": BOT_TEXT})
+        sessions[str(uuid.uuid4())] = {
+            "history": history,
+            "lead_data": {
+                "nome": None, "email": None, "telefone": None, "empresa": None,
+                "setor": None, "interesse": None, "mensagem": None, "origem": "website",
+            },
+            "state": "INICIANTE",
+        }
+    return sessions
+
+
+def build_store(count: int) -> SessionStore:
+    store = SessionStore(max_sessions=count, ttl_seconds=3600, max_bytes=1 << 40)
+    for _ in range(count):
+        session = store.get_or_create(None)
+        for _ in range(TURNS):
+            store.append_message(session, ROLE_USER, USER_TEXT)
+            store.append_message(session, ROLE_ASSISTANT, BOT_TEXT)
+    return store
+
+
+def measure(builder, count: int) -> float:
+    gc.collect()
+    tracemalloc.start()
+    result = builder(count)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current / count
+
+
+if __name__ == "__main__":
+    for count in (10_000, 100_000):
+        legacy = measure(build_legacy, count)
+        compact = measure(build_store, count)
+        print(
+            f"{count:>7} sessões ({TURNS} turnos): "
+            f"dicts={legacy:,.0f} B/sessão  store={compact:,.0f} B/sessão  "
+            f"({(1 - compact / legacy) * 100:.0f}% menor)"
+        )
@@ -0,0 +1,83 @@
+"""
+Benchmark (e verificação) do tempo de subida da API.
+
+Roda `python -X importtime -c "import src.main"` algumas vezes em processos novos, sem
+credenciais do Google, e mostra:
+- o tempo de import de src.main (mediana) e os módulos mais caros;
+- se algum SDK pesado (OpenAI, Google Cloud, gRPC, tiktoken, numpy) foi carregado na
+  subida — eles devem ser importados só no primeiro uso (src/api/services/providers.py).
+
+Sai com código 1 se o tempo passar de STARTUP_IMPORT_BUDGET_MS ou se algum SDK pesado
+for importado na subida, para poder rodar na CI (tests/test_startup.py verifica o mesmo
+no pytest).
+
+Uso (a partir de backend/):
+    python -m benchmarks.startup_time
+"""
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+RUNS = 5
+STARTUP_IMPORT_BUDGET_MS = float(os.getenv("STARTUP_IMPORT_BUDGET_MS", 2500))
+LAZY_MODULES = (
+    "openai", "google.cloud.speech", "google.cloud.texttospeech", "grpc", "google.oauth2", "tiktoken", "numpy", "torch",
+)
+
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def import_profile() -> dict:
+    """
+    Um processo novo importando src.main: {módulo: (self_us, cumulativo_us, nível)}.
+    """
+    env = dict(os.environ, DATABASE_URL="sqlite://", OPENAI_API_KEY="sk-fake")
+    env.pop("GOOGLE_SPEECH_TO_TEXT", None)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import src.main"],
+        env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"import src.main falhou:\n{result.stderr[-2000:]}")
+    profile = {}
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            profile[match.group(4)] = (int(match.group(1)), int(match.group(2)), len(match.group(3)) // 2)
+    return profile
+
+
+def main() -> int:
+    profiles = [import_profile() for _ in range(RUNS)]
+    totals = [profile["src.main"][1] / 1000 for profile in profiles]
+    median = statistics.median(totals)
+    print(f"import src.main: mediana {median:.0f} ms (min {min(totals):.0f}, máx {max(totals):.0f}) em {RUNS} execuções")
+
+    last = profiles[-1]
+    top_level = sorted(
+        ((name, cumulative) for name, (_, cumulative, level) in last.items() if level == 1),
+        key=lambda item: item[1], reverse=True,
+    )
+    print("\nimports diretos de src.main mais caros:")
+    for name, cumulative in top_level[:10]:
+        print(f"  {cumulative / 1000:7.1f} ms  {name}")
+
+    eager = [name for name in LAZY_MODULES if name in last]
+    print(f"\nSDKs carregados na subida: {', '.join(eager) if eager else 'nenhum'}")
+
+    failures = []
+    if median > STARTUP_IMPORT_BUDGET_MS:
+        failures.append(f"tempo de import {median:.0f} ms acima do limite de {STARTUP_IMPORT_BUDGET_MS:.0f} ms")
+    if eager:
+        failures.append(f"SDKs que deveriam ser carregados sob demanda: {', '.join(eager)}")
+    for failure in failures:
+        print(f"FALHOU: {failure}")
+    if not failures:
+        print(f"OK (limite {STARTUP_IMPORT_BUDGET_MS:.0f} ms)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
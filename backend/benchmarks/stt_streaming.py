@@ -0,0 +1,97 @@
+"""
+Benchmark do reconhecimento de fala em streaming (/api/voice-to-text/stream) com o
+StubRecognizer, contra o fluxo de arquivo inteiro (upload + conversão + reconhecimento).
+
+O áudio (Ogg/Opus, como o MediaRecorder) é enviado em pedaços de 250 ms de gravação,
+SPEEDUP vezes mais rápido que o tempo real. Mede:
+  - tempo até o primeiro texto parcial, a partir do primeiro pedaço enviado;
+  - tempo entre o fim da gravação e a transcrição final (o que o usuário espera).
+
+Precisa do binário `ffmpeg` no PATH.
+
+Uso (a partir de backend/):
+    python -m benchmarks.stt_streaming
+"""
+import asyncio
+import io
+import json
+import os
+import threading
+import time
+
+from fastapi import FastAPI, WebSocket
+from starlette.datastructures import UploadFile
+from starlette.testclient import TestClient
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from benchmarks.audio_transcode import make_clip  # noqa: E402
+from src.api.services.audio_service import transcode_upload_to_flac  # noqa: E402
+from src.api.services.speech_recognition import StubRecognizer, transcribe_websocket  # noqa: E402
+
+DURATIONS = (5, 60)
+CHUNK_SECONDS = 0.25
+SPEEDUP = 10
+
+app = FastAPI()
+recognizer = StubRecognizer()
+
+
+@app.websocket("/api/voice-to-text/stream")
+async def transcribe_audio_stream(websocket: WebSocket, format: str = "auto"):
+    await websocket.accept()
+    await transcribe_websocket(websocket, recognizer, audio_format=format)
+
+
+def streaming(clip: bytes, seconds: int):
+    chunk_size = max(1, int(len(clip) / seconds * CHUNK_SECONDS))
+    received = []
+    with TestClient(app).websocket_connect("/api/voice-to-text/stream") as websocket:
+        # As mensagens do servidor são lidas numa thread, enquanto o áudio é enviado
+        def read():
+            while True:
+                message = websocket.receive_json()
+                received.append((time.perf_counter(), message))
+                if message["type"] in ("done", "error"):
+                    return
+
+        reader = threading.Thread(target=read)
+        started = time.perf_counter()
+        reader.start()
+        for offset in range(0, len(clip), chunk_size):
+            websocket.send_bytes(clip[offset:offset + chunk_size])
+            time.sleep(CHUNK_SECONDS / SPEEDUP)
+        websocket.send_text(json.dumps({"event": "end"}))
+        recording_done = time.perf_counter()
+        reader.join()
+    first_interim = next((at - started for at, message in received if message["type"] == "interim"), None)
+    finished_at, message = received[-1]
+    return first_interim, finished_at - recording_done, message
+
+
+def whole_file(clip: bytes) -> float:
+    started = time.perf_counter()
+
+    async def run():
+        flac = await transcode_upload_to_flac(UploadFile(io.BytesIO(clip), size=len(clip)))
+        # O stub responde na hora; o Google ainda somaria o reconhecimento do arquivo inteiro
+        return [event async for event in recognizer.stream(_single(flac))]
+
+    asyncio.run(run())
+    return time.perf_counter() - started
+
+
+async def _single(data: bytes):
+    yield data
+
+
+if __name__ == "__main__":
+    for seconds in DURATIONS:
+        clip = make_clip(seconds)
+        first_interim, tail, message = streaming(clip, seconds)
+        interim = f"{first_interim * 1000:6.0f} ms" if first_interim is not None else "     - "
+        print(
+            f"{seconds:>3} s: streaming -> 1º parcial {interim} após o início, "
+            f"final {tail * 1000:6.0f} ms após o fim da gravação ({message['type']}) | "
+            f"arquivo inteiro -> nenhum texto até {whole_file(clip) * 1000:6.0f} ms após o fim da gravação (+ upload)"
+        )
@@ -0,0 +1,153 @@
+"""
+Benchmark do cache de text-to-speech.
+
+Repete o padrão de uso do bot: poucas frases fixas (saudação, transferência para o
+consultor, mensagens automáticas) muito repetidas e uma cauda de respostas únicas.
+O Google Text-to-Speech é simulado com SYNTHESIS_SECONDS de espera bloqueante.
+
+Compara: sem cache (toda fala é sintetizada), cache frio/quente no mesmo worker e um
+worker "reiniciado" (memória vazia, disco preservado), além de um pico de pedidos
+simultâneos da mesma frase.
+
+Uso (a partir de backend/):
+    python -m benchmarks.tts_cache
+"""
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from src.api.services.tts_service import (  # noqa: E402
+    TextToSpeechService,
+    TtsCache,
+    default_audio_params,
+    default_voice_params,
+)
+
+REQUESTS = 400
+SYNTHESIS_SECONDS = 0.2
+FIXED_PHRASES = [
+    "Olá! Eu sou o assistente da Leadin. Como posso ajudar?",
+    "Perfeito! Vou transferir a conversa para um dos nossos consultores.",
+    "Poderia me informar o seu nome e telefone?",
+    "Obrigado pelo contato! Até breve.",
+    "Estamos com muitas conversas no momento. Poderia tentar novamente em alguns segundos?",
+]
+UNIQUE_SHARE = 0.3
+
+
+class FakeAudio:
+    def __init__(self, audio_content: bytes):
+        self.audio_content = audio_content
+
+
+class FakeTtsClient:
+    def __init__(self):
+        self.calls = 0
+
+    def synthesize_speech(self, input, voice, audio_config):
+        self.calls += 1
+        time.sleep(SYNTHESIS_SECONDS)
+        # ~16 kB por segundo de fala em MP3; ~15 caracteres por segundo
+        return FakeAudio(os.urandom(max(1, len(input.text)) * 1000))
+
+
+class LegacySynthesis:
+    def __init__(self, client: FakeTtsClient):
+        self.client = client
+        self.service = TextToSpeechService(client)
+
+    async def synthesize(self, text: str):
+        voice, audio = default_voice_params(), default_audio_params()
+        return await asyncio.to_thread(self.service._synthesize_blocking, text, voice, audio)
+
+    def stats(self) -> dict:
+        return {"cache": {}}
+
+
+def workload(seed: int = 7) -> list:
+    rng = random.Random(seed)
+    texts = []
+    for index in range(REQUESTS):
+        if rng.random() < UNIQUE_SHARE:
+            texts.append(f"Resposta única número {index} sobre o produto.")
+        else:
+            texts.append(rng.choice(FIXED_PHRASES))
+    return texts
+
+
+async def run(service: TextToSpeechService, texts: list, concurrency: int = 8) -> list:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(text):
+        async with semaphore:
+            started = time.perf_counter()
+            await service.synthesize(text)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    await asyncio.gather(*(one(text) for text in texts))
+    return latencies
+
+
+def report(label: str, client: FakeTtsClient, service: TextToSpeechService, latencies: list, elapsed: float) -> None:
+    ordered = sorted(latencies)
+    p50 = statistics.median(ordered)
+    p95 = ordered[int(len(ordered) * 0.95) - 1]
+    stats = service.stats()
+    cache = stats["cache"]
+    print(
+        f"{label:<28} synth={client.calls:>4}  p50={p50:7.1f} ms  p95={p95:7.1f} ms  total={elapsed:5.2f} s"
+        + (
+            f"  hit_rate={cache['hit_rate']:.2f} (mem {cache['memory_hits']}, disk {cache['disk_hits']})"
+            f"  from_cache={cache['bytes_from_cache'] / 1024:.0f} KB  saved~{stats['synthesis_ms_saved'] / 1000:.1f} s"
+            if cache else ""
+        )
+    )
+
+
+async def scenario(label: str, service: TextToSpeechService, client: FakeTtsClient, texts: list) -> None:
+    started = time.perf_counter()
+    latencies = await run(service, texts)
+    report(label, client, service, latencies, time.perf_counter() - started)
+
+
+async def main():
+    texts = workload()
+    print(f"{REQUESTS} falas ({int(UNIQUE_SHARE * 100)}% únicas), síntese simulada de {SYNTHESIS_SECONDS * 1000:.0f} ms\n")
+
+    # Antes: cada fala chamava o Google, mesmo repetida
+    client = FakeTtsClient()
+    legacy = LegacySynthesis(client)
+    await scenario("sem cache", legacy, client, texts)
+
+    with tempfile.TemporaryDirectory() as directory:
+        client = FakeTtsClient()
+        service = TextToSpeechService(client, cache=TtsCache(directory=directory))
+        await scenario("cache (frio)", service, client, texts)
+
+        # Novo worker: memória vazia, arquivos do disco reaproveitados
+        client = FakeTtsClient()
+        service = TextToSpeechService(client, cache=TtsCache(directory=directory))
+        await scenario("reinício (só disco)", service, client, workload(seed=8))
+
+        # Pico: 50 pedidos simultâneos de uma frase nova
+        client = FakeTtsClient()
+        service = TextToSpeechService(client, cache=TtsCache(directory=directory))
+        burst = ["Frase nova pedida por todos ao mesmo tempo."] * 50
+        await scenario("pico da mesma frase", service, client, burst)
+
+        # Disco pequeno: despejo por tamanho
+        small = TtsCache(directory=os.path.join(directory, "small"), max_memory_bytes=0, max_disk_bytes=200 * 1024)
+        client = FakeTtsClient()
+        service = TextToSpeechService(client, cache=small)
+        await scenario("disco limitado a 200 KB", service, client, texts)
+        print(f"{'':<28} disk_bytes={small.stats()['disk_bytes'] / 1024:.0f} KB  evictions={small.stats()['disk_evictions']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
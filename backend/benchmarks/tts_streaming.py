@@ -0,0 +1,83 @@
+"""
+Benchmark da síntese em partes para respostas longas.
+
+Compara o tempo até o primeiro áudio e o tempo total de uma resposta longa do bot:
+- texto inteiro num único pedido (como o /api/text-to-speech);
+- dividido em frases com até TTS_STREAM_PARALLELISM sínteses em paralelo
+  (/api/text-to-speech/stream), para alguns níveis de paralelismo.
+
+O Google Text-to-Speech é simulado com latência fixa + custo por caractere, sem cache
+(cada cenário usa frases novas).
+
+Uso (a partir de backend/):
+    python -m benchmarks.tts_streaming
+"""
+import asyncio
+import os
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from src.api.services.tts_service import TextToSpeechService, split_sentences  # noqa: E402
+
+BASE_MS = 150
+MS_PER_CHAR = 4
+ROUNDS = 3
+REPLY = (
+    "Claro! O nosso plano empresarial inclui atendimento automático por chat e voz, com "
+    "integração ao seu CRM. A implantação leva em média duas semanas, e durante esse período "
+    "um consultor acompanha toda a configuração. Também oferecemos relatórios mensais com as "
+    "métricas de conversão de leads. Os valores dependem do número de atendentes e do volume "
+    "de conversas. Posso pedir para um consultor entrar em contato para apresentar uma proposta? "
+    "Se preferir, também envio um resumo por e-mail com todos os detalhes do plano."
+)
+
+
+class FakeAudio:
+    def __init__(self, audio_content: bytes):
+        self.audio_content = audio_content
+
+
+class FakeTtsClient:
+    def synthesize_speech(self, input, voice, audio_config):
+        time.sleep((BASE_MS + MS_PER_CHAR * len(input.text)) / 1000)
+        return FakeAudio(b"\xff" * len(input.text) * 1000)
+
+
+async def whole(service: TextToSpeechService, text: str) -> tuple:
+    started = time.perf_counter()
+    await service.synthesize(text)
+    elapsed = (time.perf_counter() - started) * 1000
+    return elapsed, elapsed
+
+
+async def streamed(service: TextToSpeechService, text: str, parallelism: int) -> tuple:
+    started = time.perf_counter()
+    first = None
+    async for _ in service.stream(text, parallelism=parallelism):
+        if first is None:
+            first = (time.perf_counter() - started) * 1000
+    return first, (time.perf_counter() - started) * 1000
+
+
+async def main():
+    service = TextToSpeechService(FakeTtsClient())
+    service.cache = None
+    chunks = split_sentences(REPLY)
+    print(f"resposta de {len(REPLY)} caracteres, {len(chunks)} pedaços; síntese simulada {BASE_MS} ms + {MS_PER_CHAR} ms/caractere\n")
+
+    cases = [("texto inteiro", lambda text: whole(service, text))]
+    for parallelism in (1, 2, 4, 8):
+        cases.append((f"frases, paralelo={parallelism}", lambda text, p=parallelism: streamed(service, text, p)))
+
+    for label, run in cases:
+        firsts, totals = [], []
+        for round_index in range(ROUNDS):
+            first, total = await run(f"{REPLY} ({label} {round_index})")
+            firsts.append(first)
+            totals.append(total)
+        print(f"{label:<22} primeiro áudio {sum(firsts) / ROUNDS:7.1f} ms   total {sum(totals) / ROUNDS:7.1f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,149 @@
+"""
+Benchmark dos contadores mensais de sistema_metricas (src/api/services/usage_counters.py).
+
+PROCESSES processos (como workers do uvicorn) com THREADS threads cada registram
+TURNS turnos de chat por thread num mesmo banco SQLite em arquivo, de duas formas:
+- "ler-somar-gravar": por turno, SELECT da linha do mês (criando se faltar), soma no
+  objeto e commit, como seria o jeito ingênuo no caminho do pedido;
+- "agregado": `UsageCounters.increment` em memória e flush periódico com
+  UPDATE ... SET x = x + n (FLUSH_MS), com o flush final no stop() de cada processo.
+Mostra turnos/s, o custo por turno no caminho do pedido, os totais gravados contra os
+esperados (commits que falharam e incrementos perdidos em silêncio, quando duas
+leituras da mesma linha gravam por cima uma da outra) e quantas linhas o mês ficou tendo.
+
+Uso (a partir de backend/):
+    python -m benchmarks.usage_counters
+"""
+import multiprocessing
+import os
+import statistics
+import tempfile
+import threading
+import time
+import timeit
+from datetime import datetime
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+
+from sqlalchemy import create_engine, func, select  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from src.api.db.models import SistemaMetricas  # noqa: E402
+from src.api.services.usage_counters import UsageCounters  # noqa: E402
+
+PROCESSES = 4
+THREADS = 4
+TURNS = 250
+FLUSH_MS = 100
+ANO, MES = 2026, 1
+
+
+def make_sessions(path: str):
+    engine = create_engine(f"sqlite:///{path}", connect_args={"timeout": 60})
+    return engine, sessionmaker(bind=engine)
+
+
+def read_modify_write(sessions) -> bool:
+    db = sessions()
+    try:
+        row = db.query(SistemaMetricas).filter_by(ano=ANO, mes=MES).first()
+        if row is None:
+            row = SistemaMetricas(ano=ANO, mes=MES, mensagens_enviadas=0, interacoes_chatbot=0)
+            db.add(row)
+        row.mensagens_enviadas = (row.mensagens_enviadas or 0) + 1
+        row.interacoes_chatbot = (row.interacoes_chatbot or 0) + 1
+        db.commit()
+        return True
+    except Exception:
+        # "database is locked" ao tentar gravar depois de ler: o turno perde o incremento
+        db.rollback()
+        return False
+    finally:
+        db.close()
+
+
+def worker(variant: str, path: str, results) -> None:
+    engine, sessions = make_sessions(path)
+    counters = UsageCounters(session_factory=sessions, flush_interval_ms=FLUSH_MS)
+    when = datetime(ANO, MES, 15)
+    per_turn = []
+    errors = []
+
+    def turns():
+        elapsed = []
+        failed = 0
+        for _ in range(TURNS):
+            started = time.perf_counter()
+            if variant == "agregado":
+                counters.increment(when=when, mensagens_enviadas=1, interacoes_chatbot=1)
+            elif not read_modify_write(sessions):
+                failed += 1
+            elapsed.append(time.perf_counter() - started)
+        per_turn.extend(elapsed)
+        errors.append(failed)
+
+    threads = [threading.Thread(target=turns) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Shutdown do worker: grava o que ficou acumulado
+    counters.stop()
+    engine.dispose()
+    per_turn.sort()
+    results.put((statistics.median(per_turn) * 1e6, per_turn[int(len(per_turn) * 0.99)] * 1e6, sum(errors)))
+
+
+def run(variant: str) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "metricas.db")
+        engine, _ = make_sessions(path)
+        SistemaMetricas.__table__.create(engine)
+
+        results = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=worker, args=(variant, path, results)) for _ in range(PROCESSES)]
+        started = time.perf_counter()
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - started
+        latencies = [results.get() for _ in processes]
+
+        with engine.connect() as conn:
+            rows, total = conn.execute(
+                select(func.count(), func.coalesce(func.sum(SistemaMetricas.interacoes_chatbot), 0))
+                .where(SistemaMetricas.ano == ANO, SistemaMetricas.mes == MES)
+            ).one()
+        engine.dispose()
+    return {
+        "rate": PROCESSES * THREADS * TURNS / elapsed,
+        "p50_us": statistics.median(p50 for p50, _, _ in latencies),
+        "p99_us": max(p99 for _, p99, _ in latencies),
+        "errors": sum(errors for _, _, errors in latencies),
+        "total": total,
+        "rows": rows,
+    }
+
+
+def main():
+    expected = PROCESSES * THREADS * TURNS
+    print(f"{PROCESSES} processos x {THREADS} threads x {TURNS} turnos = {expected} turnos (SQLite em arquivo)\n")
+    for variant in ("ler-somar-gravar", "agregado"):
+        result = run(variant)
+        print(
+            f"{variant:<17} {result['rate']:8.0f} turnos/s | por turno p50 {result['p50_us']:8.1f} µs, "
+            f"p99 {result['p99_us']:9.1f} µs | interacoes_chatbot {result['total']}/{expected} "
+            f"(erros {result['errors']}, perdidos sem erro {expected - result['errors'] - result['total']}) | "
+            f"linhas do mês {result['rows']}"
+        )
+
+    # Flush a cada minuto: mede só a soma em memória
+    counters = UsageCounters(flush_interval_ms=60_000)
+    cost = min(timeit.repeat(lambda: counters.increment(interacoes_chatbot=1, mensagens_enviadas=1), number=100_000, repeat=5))
+    print(f"\nUsageCounters.increment: {cost / 100_000 * 1e6:.2f} µs por chamada (sem banco)")
+
+
+if __name__ == "__main__":
+    main()
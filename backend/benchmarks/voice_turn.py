@@ -0,0 +1,163 @@
+"""
+Benchmark de um turno de conversa por voz, de ponta a ponta, contra a API real (uvicorn).
+
+Compara o fluxo de três chamadas do frontend (/api/voice-to-text, /api/chat e
+/api/text-to-speech) com a chamada única /api/voice-chat (SSE), medindo o tempo até o
+primeiro áudio e até o áudio completo. Serviços externos simulados:
+- Google Speech-to-Text: RECOGNIZE_SECONDS de espera bloqueante;
+- OpenAI: servidor fake com TOKEN_DELAY entre tokens (a resposta sem streaming demora o
+  mesmo que o stream inteiro);
+- Google Text-to-Speech: TTS_BASE_MS + TTS_MS_PER_CHAR por caractere.
+O cache de TTS fica desligado e a gravação de leads (Postgres) é descartada.
+
+Uso (a partir de backend/):
+    python -m benchmarks.voice_turn
+"""
+import asyncio
+import io
+import json
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+import wave
+
+import httpx
+import numpy as np
+
+from benchmarks.fake_openai_server import start_server
+
+TOKEN_DELAY = 0.03
+RECOGNIZE_SECONDS = 0.3
+TTS_BASE_MS = 150
+TTS_MS_PER_CHAR = 4
+ROUNDS = 5
+REPLY = (
+    "Perfeito, entendi a sua necessidade. O nosso plano empresarial inclui atendimento automático "
+    "por chat e voz, com integração ao seu CRM. A implantação leva em média duas semanas. "
+    "Durante esse período um consultor acompanha toda a configuração. "
+    "Posso pedir para um consultor entrar em contato para apresentar uma proposta?\n"
+    "```json\n"
+    "{\"nome\": null, \"email\": null, \"telefone\": null, \"empresa\": null, "
+    "\"setor\": null, \"interesse\": \"plano empresarial\", \"mensagem\": null, \"origem\": \"website\"}\n"
+    "```"
+)
+
+server = start_server(latency=TOKEN_DELAY * (5 + len(REPLY.split(" "))), token_delay=TOKEN_DELAY)
+server.RequestHandlerClass.reply = REPLY
+os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_port}/v1"
+os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ["TTS_CACHE_ENABLED"] = "0"
+os.environ["PROVIDERS_WARMUP"] = "0"
+
+import uvicorn  # noqa: E402
+
+from src.api.services.lead_writer import lead_writer  # noqa: E402
+from src.api.services.providers import providers  # noqa: E402
+from src.main import app  # noqa: E402
+
+
+class FakeSpeechClient:
+    def __init__(self):
+        self.calls = 0
+
+    def recognize(self, config, audio):
+        time.sleep(RECOGNIZE_SECONDS)
+        # Frase diferente a cada turno: nada sai do cache de respostas de abertura
+        self.calls += 1
+        alternative = type("Alternative", (), {"transcript": f"Quero saber mais sobre o plano {self.calls}"})
+        result = type("Result", (), {"alternatives": [alternative]})
+        return type("Response", (), {"results": [result]})()
+
+
+class FakeTtsClient:
+    def synthesize_speech(self, input, voice, audio_config):
+        time.sleep((TTS_BASE_MS + TTS_MS_PER_CHAR * len(input.text)) / 1000)
+        return type("Audio", (), {"audio_content": b"\xff" * len(input.text) * 100})()
+
+
+def make_wav(seconds: float = 3.0) -> bytes:
+    samples = (np.sin(np.arange(int(16000 * seconds)) * 2 * np.pi * 220 / 16000) * 8000).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(16000)
+        wav.writeframes(samples.tobytes())
+    return buffer.getvalue()
+
+
+def start_api() -> str:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    api = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=api.run, daemon=True).start()
+    while not api.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+async def three_calls(client: httpx.AsyncClient, clip: bytes) -> tuple:
+    started = time.perf_counter()
+    response = await client.post("/api/voice-to-text", files={"file": ("audio.wav", clip, "audio/wav")})
+    transcription = response.json()["transcription"]
+    response = await client.post("/api/chat", json={"session_id": None, "message": transcription})
+    reply = response.json()["response"]
+    response = await client.post("/api/text-to-speech", json={"text": reply})
+    assert response.status_code == 200, response.text
+    elapsed = (time.perf_counter() - started) * 1000
+    return elapsed, elapsed
+
+
+async def single_call(client: httpx.AsyncClient, clip: bytes) -> tuple:
+    started = time.perf_counter()
+    first_audio = None
+    async with client.stream("POST", "/api/voice-chat", files={"file": ("audio.wav", clip, "audio/wav")}) as response:
+        assert response.status_code == 200
+        event = None
+        async for line in response.aiter_lines():
+            if line.startswith("event: "):
+                event = line[7:]
+            elif line.startswith("data: ") and event == "audio" and first_audio is None:
+                first_audio = (time.perf_counter() - started) * 1000
+            elif line.startswith("data: ") and event == "end":
+                assert json.loads(line[6:])["audio_chunks"] > 0
+    return first_audio, (time.perf_counter() - started) * 1000
+
+
+async def main():
+    providers.register("speech_client", FakeSpeechClient, optional=True)
+    providers.register("tts_client", FakeTtsClient, optional=True)
+    # Sem Postgres aqui: os leads enfileirados são descartados
+    lead_writer.flush = lambda: 0
+    base_url = start_api()
+    clip = make_wav()
+
+    # Logs de cada pedido da API vão para o stdout; só os resultados aparecem
+    sys.stdout = open(os.devnull, "w")
+    results = {}
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        await three_calls(client, clip)
+        for label, flow in (("3 chamadas", three_calls), ("/api/voice-chat", single_call)):
+            firsts, totals = [], []
+            for _ in range(ROUNDS):
+                first, total = await flow(client, clip)
+                firsts.append(first)
+                totals.append(total)
+            results[label] = (statistics.median(firsts), statistics.median(totals))
+    sys.stdout = sys.__stdout__
+
+    print(
+        f"turno de voz: STT {RECOGNIZE_SECONDS * 1000:.0f} ms, {len(REPLY.split(' '))} tokens a "
+        f"{TOKEN_DELAY * 1000:.0f} ms, TTS {TTS_BASE_MS} ms + {TTS_MS_PER_CHAR} ms/caractere (mediana de {ROUNDS})\n"
+    )
+    for label, (first, total) in results.items():
+        print(f"{label:<16} primeiro áudio {first:7.0f} ms   áudio completo {total:7.0f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
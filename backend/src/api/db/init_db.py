@@ -1,6 +1,34 @@
+from sqlalchemy import text
+
 from src.api.db.database import engine, Base
 from src.api.db.models import Lead, User
 
+# O create_all só cria tabelas que ainda não existem: colunas novas em tabelas antigas
+# entram aqui, com DDL idempotente (PostgreSQL), para o script poder rodar de novo em
+# bancos já criados
+SCHEMA_UPGRADES = [
+    # Lead.session_id: sessão do chat do site ligada ao lead
+    "ALTER TABLE leads ADD COLUMN IF NOT EXISTS session_id VARCHAR(64)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_leads_session_id ON leads (session_id)",
+    # Dados coletados pelo chat (lead_service.LEAD_COLUMNS)
+    "ALTER TABLE leads ADD COLUMN IF NOT EXISTS email VARCHAR(255)",
+    "ALTER TABLE leads ADD COLUMN IF NOT EXISTS empresa VARCHAR(255)",
+    "ALTER TABLE leads ADD COLUMN IF NOT EXISTS setor VARCHAR(255)",
+    "ALTER TABLE leads ADD COLUMN IF NOT EXISTS interesse TEXT",
+    # Uma linha por mês em sistema_metricas: sem ela, dois workers podem criar a mesma
+    # linha no primeiro flush do mês e os UPDATEs seguintes somam nas duas
+    "CREATE UNIQUE INDEX IF NOT EXISTS uq_sistema_metricas_ano_mes ON sistema_metricas (ano, mes)",
+]
+
+
+def upgrade_schema(bind=engine) -> None:
+    with bind.begin() as conn:
+        for statement in SCHEMA_UPGRADES:
+            conn.execute(text(statement))
+
+
 print("Criando tabelas no banco de dados...")
 Base.metadata.create_all(bind=engine)
+print("Atualizando tabelas existentes...")
+upgrade_schema()
 print("Tabelas criadas com sucesso!")
@@ -1,5 +1,5 @@
 from sqlalchemy import (
-    Column, String, DateTime, func, Integer, Boolean, Float, ForeignKey, Text, ARRAY
+    Column, String, DateTime, func, Integer, Boolean, Float, ForeignKey, Text, ARRAY, UniqueConstraint
 )
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
@@ -25,6 +25,10 @@ class Lead(Base):
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     nome = Column(String(255), nullable=True)
+    email = Column(String(255), nullable=True)
+    empresa = Column(String(255), nullable=True)
+    setor = Column(String(255), nullable=True)
+    interesse = Column(Text, nullable=True)
     instagram_id = Column(String(255), nullable=True)
     facebook_id = Column(String(255), nullable=True)
     telefone = Column(String(20), nullable=True)
@@ -35,6 +39,7 @@ class Lead(Base):
     tentou_chamada = Column(Boolean, default=False)
     ativo = Column(Boolean, default=True)
     criado_em = Column(DateTime, default=func.now())
+    session_id = Column(String(64), unique=True, index=True, nullable=True)  # sessão do chat do site
 
     mensagens = relationship("Mensagem", back_populates="lead", cascade="all, delete-orphan")
     chamadas = relationship("Chamada", back_populates="lead", cascade="all, delete-orphan")
@@ -96,6 +101,8 @@ class Produto(Base):
 
 class SistemaMetricas(Base):
     __tablename__ = "sistema_metricas"
+    # Uma linha por mês: os contadores são somados nela por UPDATE atômico (usage_counters)
+    __table_args__ = (UniqueConstraint("ano", "mes", name="uq_sistema_metricas_ano_mes"),)
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     ano = Column(Integer, nullable=False)
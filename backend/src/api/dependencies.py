@@ -1,43 +1,23 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, Request
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
 from sqlalchemy.orm import Session
 from src.api.db.database import get_db
-from src.api.db.models import User
-from src.api.security import SECRET_KEY, ALGORITHM
+from src.api.principal import principals
 
 # Configuração correta do OAuth2PasswordBearer
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def get_current_user(request: Request, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
     """
     Função que verifica o token JWT e retorna o usuário autenticado.
+    Reaproveita o usuário já resolvido pelo AuthMiddleware (request.state.user); senão usa
+    o cache de tokens/usuários (src/api/principal.py), que só consulta o banco (pela
+    sessão do pedido) quando o usuário não está em cache.
     """
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")  # ✅ Agora usa o email, não o username!
+    if getattr(request.state, "token", None) == token:
+        return request.state.user
 
-        if email is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Token inválido",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-
-        user = db.query(User).filter(User.email == email).first()  # ✅ Busca pelo email no banco
-
-        if user is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Usuário não encontrado",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-
-        return user
-
-    except JWTError:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Token inválido ou expirado",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+    user = principals.resolve(token, db)
+    request.state.user = user
+    request.state.token = token
+    return user
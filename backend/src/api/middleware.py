@@ -1,54 +1,62 @@
-from fastapi import Request, HTTPException
+import logging
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
 from fastapi.security import OAuth2PasswordBearer
-from starlette.middleware.base import BaseHTTPMiddleware
-from jose import JWTError, jwt
-from sqlalchemy.orm import Session
-from src.api.security import SECRET_KEY, ALGORITHM
-from src.api.db.database import get_db
-from src.api.db.models import User
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+from src.api.principal import principals
+
+logger = logging.getLogger(__name__)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 # Rotas que não precisam de autenticação
-PUBLIC_ROUTES = {"/", "/docs", "/openapi.json", "/auth/login", "/auth/register", "/register"}
+# Atenção: a comparação é por prefixo e "/" está na lista, então hoje toda rota é pública
+# e a autenticação fica a cargo da dependência get_current_user em cada rota.
+PUBLIC_ROUTES = {"/", "/docs", "/openapi.json", "/auth/login", "/auth/register", "/register", "/metrics"}
+
+class AuthMiddleware:
+    """
+    Middleware de autenticação que protege rotas privadas verificando o token JWT.
+    O usuário resolvido fica em request.state.user (get_current_user reaproveita).
+    ASGI puro: não cria tarefa nem envolve o corpo da resposta, então streaming (SSE,
+    áudio) e background tasks passam direto.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
 
-class AuthMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        """
-        Middleware de autenticação que protege rotas privadas verificando o token JWT.
-        """
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
-        request_path = request.url.path  # Captura a URL sem domínio
-        print(f"🔍 Verificando autenticação para: {request_path}")  # Log de depuração
+        request_path = scope["path"]  # Captura a URL sem domínio
+        logger.debug("Verificando autenticação para: %s", request_path)
 
         # Se a rota for pública, continua normalmente
         if any(request_path.startswith(route) for route in PUBLIC_ROUTES):
-            return await call_next(request)
+            await self.app(scope, receive, send)
+            return
 
-        authorization: str = request.headers.get("Authorization")
+        authorization = Headers(scope=scope).get("Authorization")
 
         if not authorization or not authorization.startswith("Bearer "):
-            raise HTTPException(status_code=401, detail="Token de autenticação ausente")
+            response = JSONResponse(status_code=401, content={"detail": "Token de autenticação ausente"})
+            await response(scope, receive, send)
+            return
 
         token = authorization.split("Bearer ")[1]
 
+        # Token e usuário vêm do cache de principal: sem consulta ao banco em um acerto
         try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-            email: str = payload.get("sub")
-
-            if email is None:
-                raise HTTPException(status_code=401, detail="Token inválido")
-
-            # Obtém uma sessão do banco de dados
-            db: Session = next(get_db())
-            user = db.query(User).filter(User.email == email).first()
-
-            if user is None:
-                raise HTTPException(status_code=401, detail="Usuário não encontrado")
-
-        except JWTError:
-            raise HTTPException(status_code=401, detail="Token inválido ou expirado")
-
-        response = await call_next(request)
-        return response
-
+            user = await principals.aresolve(token)
+        except HTTPException as e:
+            response = JSONResponse(status_code=e.status_code, content={"detail": e.detail}, headers=e.headers)
+            await response(scope, receive, send)
+            return
+
+        state = scope.setdefault("state", {})
+        state["user"] = user
+        state["token"] = token
+        await self.app(scope, receive, send)
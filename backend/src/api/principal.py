@@ -0,0 +1,242 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from dotenv import load_dotenv
+from fastapi import HTTPException, status
+from jose import JWTError, jwt
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
+
+from src.api.db.database import SessionLocal
+from src.api.db.models import User
+from src.api.security import SECRET_KEY, ALGORITHM
+
+
+load_dotenv()
+
+# Tokens já verificados (assinatura + exp) ficam em cache até o próprio `exp`
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", 10000))
+# Usuários ficam em cache por AUTH_USER_CACHE_TTL segundos; alterações feitas por esta
+# instância invalidam na hora, as feitas por outros workers aparecem em até um TTL
+AUTH_USER_CACHE_TTL = float(os.getenv("AUTH_USER_CACHE_TTL", 60))
+AUTH_USER_CACHE_SIZE = int(os.getenv("AUTH_USER_CACHE_SIZE", 5000))
+
+_PENDING_INVALIDATIONS = "principal_invalidate"
+
+
+def _unauthorized(detail: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def _active(user: Optional[User]) -> User:
+    if user is None:
+        raise _unauthorized("Usuário não encontrado")
+    if not user.is_active:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Usuário inativo")
+    return user
+
+
+class PrincipalResolver:
+    """
+    Resolve o usuário autenticado a partir do token JWT, compartilhado entre o
+    AuthMiddleware e a dependência get_current_user.
+    - Tokens verificados ficam em cache (token -> email) até o `exp`: o JWT não é
+      decodificado de novo a cada pedido.
+    - Usuários ficam em cache (email -> User desanexado da sessão) por um TTL e são
+      invalidados quando a linha é alterada ou removida (eventos do SQLAlchemy).
+    Em um acerto nos dois caches não há nenhuma ida ao banco.
+    """
+
+    def __init__(
+        self,
+        token_cache_size: int = AUTH_TOKEN_CACHE_SIZE,
+        user_cache_size: int = AUTH_USER_CACHE_SIZE,
+        user_ttl_seconds: float = AUTH_USER_CACHE_TTL,
+        clock=time.monotonic,
+        wall_clock=time.time,
+    ):
+        self.token_cache_size = token_cache_size
+        self.user_cache_size = user_cache_size
+        self.user_ttl_seconds = user_ttl_seconds
+        self._clock = clock
+        self._wall_clock = wall_clock
+        self._tokens = OrderedDict()
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+        self.token_hits = 0
+        self.token_misses = 0
+        self.user_hits = 0
+        self.user_misses = 0
+        self.invalidations = 0
+
+    def cached_email(self, token: str) -> Optional[str]:
+        """
+        Email de um token já verificado e ainda dentro do `exp`, ou None.
+        """
+        now = self._wall_clock()
+        with self._lock:
+            cached = self._tokens.get(token)
+            if cached is None:
+                return None
+            email, expires_at = cached
+            if expires_at is not None and expires_at <= now:
+                del self._tokens[token]
+                return None
+            self._tokens.move_to_end(token)
+            self.token_hits += 1
+            return email
+
+    def email_for_token(self, token: str) -> str:
+        """
+        Email (claim `sub`) de um token válido. Levanta HTTPException 401 se o token for
+        inválido, estiver expirado ou não tiver `sub`.
+        """
+        email = self.cached_email(token)
+        if email is not None:
+            return email
+        with self._lock:
+            self.token_misses += 1
+
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError:
+            raise _unauthorized("Token inválido ou expirado")
+        email = payload.get("sub")
+        if email is None:
+            raise _unauthorized("Token inválido")
+
+        expires_at = payload.get("exp")
+        with self._lock:
+            self._tokens[token] = (email, float(expires_at) if expires_at is not None else None)
+            self._tokens.move_to_end(token)
+            while len(self._tokens) > self.token_cache_size:
+                self._tokens.popitem(last=False)
+        return email
+
+    def cached_user(self, email: str) -> Optional[User]:
+        with self._lock:
+            cached = self._users.get(email)
+            if cached is None:
+                return None
+            user, expires_at = cached
+            if expires_at <= self._clock():
+                del self._users[email]
+                return None
+            self._users.move_to_end(email)
+            self.user_hits += 1
+            return user
+
+    def user_for_email(self, email: str, db: Optional[Session] = None) -> User:
+        """
+        Usuário ativo com este email, do cache ou do banco. Sem `db`, abre (e fecha) uma
+        sessão própria só se precisar consultar o banco.
+        """
+        user = self.cached_user(email)
+        if user is None:
+            with self._lock:
+                self.user_misses += 1
+            if db is None:
+                with SessionLocal() as own_db:
+                    user = self._load_user(own_db, email)
+            else:
+                user = self._load_user(db, email)
+
+        return _active(user)
+
+    def _load_user(self, db: Session, email: str) -> Optional[User]:
+        user = db.query(User).filter(User.email == email).first()
+        if user is None:
+            return None
+        # Desanexa da sessão: o objeto em cache é compartilhado entre pedidos e não pode
+        # depender de uma sessão já fechada (as colunas já vieram carregadas)
+        db.expunge(user)
+        with self._lock:
+            self._users[email] = (user, self._clock() + self.user_ttl_seconds)
+            self._users.move_to_end(email)
+            while len(self._users) > self.user_cache_size:
+                self._users.popitem(last=False)
+        return user
+
+    def resolve(self, token: str, db: Optional[Session] = None) -> User:
+        return self.user_for_email(self.email_for_token(token), db)
+
+    async def aresolve(self, token: str) -> User:
+        """
+        Versão para o event loop (middleware): acertos no cache respondem na hora, só a
+        verificação do JWT e a consulta ao banco de um usuário novo vão para uma thread.
+        """
+        email = self.cached_email(token)
+        if email is None:
+            return await asyncio.to_thread(self.resolve, token)
+        user = self.cached_user(email)
+        if user is None:
+            return await asyncio.to_thread(self.user_for_email, email)
+        return _active(user)
+
+    def invalidate(self, email: Optional[str] = None) -> None:
+        """
+        Remove um usuário do cache (ou todos, sem `email`). Os tokens continuam em cache:
+        eles só apontam para o email, o estado do usuário é sempre relido.
+        """
+        with self._lock:
+            if email is None:
+                self._users.clear()
+            else:
+                self._users.pop(email, None)
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "tokens": len(self._tokens),
+                "users": len(self._users),
+                "token_hits": self.token_hits,
+                "token_misses": self.token_misses,
+                "user_hits": self.user_hits,
+                "user_misses": self.user_misses,
+                "invalidations": self.invalidations,
+            }
+
+
+principals = PrincipalResolver()
+
+
+def _changed_emails(target: User) -> set:
+    # O email atual e, se ele mudou neste flush, o anterior
+    emails = {target.email}
+    history = inspect(target).attrs.email.history
+    emails.update(email for email in history.deleted or () if email)
+    return {email for email in emails if email}
+
+
+@event.listens_for(User, "after_insert")
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_changed_user(mapper, connection, target):
+    emails = _changed_emails(target)
+    for email in emails:
+        principals.invalidate(email)
+    # Invalida de novo no commit: um pedido concorrente pode ter relido a linha antiga
+    # entre o flush e o commit
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(_PENDING_INVALIDATIONS, set()).update(emails)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    for email in session.info.pop(_PENDING_INVALIDATIONS, ()):
+        principals.invalidate(email)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session):
+    session.info.pop(_PENDING_INVALIDATIONS, None)
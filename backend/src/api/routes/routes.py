@@ -8,6 +8,7 @@ from src.api.db.database import get_db
 from src.api.dependencies import get_current_user
 
 from src.api.db.models import Lead, User
+from src.api.services.lead_service import load_transcript, render_transcript
 from pydantic import BaseModel, EmailStr
 import uuid
 from typing import List, Optional
@@ -79,6 +80,21 @@ def listar_leads(db: Session = Depends(get_db)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/{lead_id}/mensagens")
+def listar_mensagens_lead(lead_id: uuid.UUID, db: Session = Depends(get_db)):
+    """
+    Retorna o histórico de mensagens do lead e a conversa completa montada como texto.
+    """
+    mensagens = load_transcript(db, lead_id)
+    return {
+        "lead_id": lead_id,
+        "mensagens": [
+            {"origem": m.origem, "conteudo": m.conteudo, "data_envio": m.data_envio}
+            for m in mensagens
+        ],
+        "transcricao": render_transcript(mensagens)
+    }
+
 
 # users
 
@@ -93,7 +109,6 @@ def login(user: UserLogin, db: Session = Depends(get_db)):
         raise HTTPException(status_code=403, detail="Usuário inativo. Contate um gestor.")
 
     token = create_access_token({"sub": db_user.email})
-    print("📌 Token gerado:", token)  
 
     return {
         "access_token": token,
@@ -0,0 +1,230 @@
+import asyncio
+import contextvars
+import functools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+from src.api.services.chat_concurrency import FairLimiter
+
+
+load_dotenv()
+
+# Vagas por tipo de trabalho em cada worker: conversões (ffmpeg, uso de CPU) limitadas
+# aos núcleos; reconhecimento (espera de rede numa thread) pode ter mais vagas
+AUDIO_TRANSCODE_WORKERS = int(os.getenv("AUDIO_TRANSCODE_WORKERS", os.cpu_count() or 2))
+AUDIO_RECOGNIZE_WORKERS = int(os.getenv("AUDIO_RECOGNIZE_WORKERS", 16))
+# Síntese de fala (chamada bloqueante ao Google Text-to-Speech)
+AUDIO_SYNTHESIZE_WORKERS = int(os.getenv("AUDIO_SYNTHESIZE_WORKERS", 8))
+# Sessões simultâneas de reconhecimento em streaming (WebSocket): cada uma prende uma
+# thread do pool enquanto a conexão durar; acima disso a conexão é recusada
+AUDIO_STREAM_WORKERS = int(os.getenv("AUDIO_STREAM_WORKERS", 16))
+# Trabalhos aguardando vaga (por tipo); acima disso o endpoint responde 429
+AUDIO_QUEUE_MAX = int(os.getenv("AUDIO_QUEUE_MAX", 32))
+AUDIO_QUEUE_TIMEOUT_SECONDS = float(os.getenv("AUDIO_QUEUE_TIMEOUT_SECONDS", 30))
+AUDIO_JOB_TIMEOUT_SECONDS = float(os.getenv("AUDIO_JOB_TIMEOUT_SECONDS", 60))
+
+
+class AudioBusyError(Exception):
+    """
+    Fila de trabalhos de áudio cheia (o endpoint responde 429 com Retry-After).
+    """
+
+    def __init__(self, message: str = "Muitos áudios em processamento. Tente novamente em instantes.", retry_after: int = 5):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AudioJobTimeout(Exception):
+    """
+    O trabalho de áudio passou de AUDIO_JOB_TIMEOUT_SECONDS (o endpoint responde 504).
+    """
+
+
+class _JobStats:
+    __slots__ = ("jobs", "failures", "timeouts", "wait_total", "wait_max", "run_total", "run_max")
+
+    def __init__(self):
+        self.jobs = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.run_total = 0.0
+        self.run_max = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "jobs": self.jobs,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "avg_queue_wait_ms": round(self.wait_total / self.jobs, 2) if self.jobs else 0.0,
+            "max_queue_wait_ms": round(self.wait_max, 2),
+            "avg_run_ms": round(self.run_total / self.jobs, 2) if self.jobs else 0.0,
+            "max_run_ms": round(self.run_max, 2),
+        }
+
+
+class AudioJobPool:
+    """
+    Pool limitado para os trabalhos pesados de áudio, fora do event loop:
+    - conversões do ffmpeg (já são processos próprios, aqui só ocupam uma vaga);
+    - chamadas bloqueantes (reconhecimento e síntese do Google), numa thread dedicada do pool.
+    Cada tipo de trabalho tem suas vagas (`limits`); os excedentes esperam numa fila
+    FIFO limitada e cada trabalho tem um prazo.
+    """
+
+    def __init__(
+        self,
+        limits: dict = None,
+        max_queue: int = AUDIO_QUEUE_MAX,
+        queue_timeout: float = AUDIO_QUEUE_TIMEOUT_SECONDS,
+        job_timeout: float = AUDIO_JOB_TIMEOUT_SECONDS,
+    ):
+        limits = limits or {
+            "transcode": AUDIO_TRANSCODE_WORKERS,
+            "recognize": AUDIO_RECOGNIZE_WORKERS,
+            "synthesize": AUDIO_SYNTHESIZE_WORKERS,
+            "stream": AUDIO_STREAM_WORKERS,
+        }
+        self.job_timeout = job_timeout
+        self.lanes = {
+            kind: FairLimiter(
+                limit=limit, max_queue=max_queue, queue_timeout=queue_timeout, busy_error=AudioBusyError
+            )
+            for kind, limit in limits.items()
+        }
+        self._threads = sum(lane.limit for lane in self.lanes.values())
+        self._executor = None
+        self._stats = {kind: _JobStats() for kind in self.lanes}
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self._threads, thread_name_prefix="audio-job")
+        return self._executor
+
+    async def run_async(self, kind: str, job):
+        """
+        Executa `job()` (coroutine, ex.: conversão com ffmpeg) ocupando uma vaga do pool.
+        """
+        lane, stats = self.lanes[kind], self._stats[kind]
+        await self._acquire(lane, stats)
+        started = time.perf_counter()
+        try:
+            return await asyncio.wait_for(job(), self.job_timeout)
+        except asyncio.TimeoutError:
+            stats.timeouts += 1
+            raise AudioJobTimeout(f"Processamento de áudio ({kind}) passou de {self.job_timeout:g}s") from None
+        except Exception:
+            stats.failures += 1
+            raise
+        finally:
+            self._finish(stats, started)
+            lane.release()
+
+    async def run_blocking(self, kind: str, func, *args, **kwargs):
+        """
+        Executa a função bloqueante `func` numa thread do pool, ocupando uma vaga.
+        Se o prazo estourar, o chamador recebe AudioJobTimeout e a vaga só é devolvida
+        quando a thread realmente terminar.
+        """
+        lane, stats = self.lanes[kind], self._stats[kind]
+        await self._acquire(lane, stats)
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        # Leva o contexto (contextvars) do pedido para a thread, como o asyncio.to_thread
+        context = contextvars.copy_context()
+        future = loop.run_in_executor(self.executor, functools.partial(context.run, func, *args, **kwargs))
+
+        def done(_):
+            self._finish(stats, started)
+            lane.release()
+
+        future.add_done_callback(done)
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), self.job_timeout)
+        except asyncio.TimeoutError:
+            stats.timeouts += 1
+            raise AudioJobTimeout(f"Processamento de áudio ({kind}) passou de {self.job_timeout:g}s") from None
+        except Exception:
+            stats.failures += 1
+            raise
+
+    async def run_in_slot(self, func, *args, **kwargs):
+        """
+        Executa a função bloqueante `func` numa thread do pool para um trabalho que já
+        ocupa uma vaga (ex.: a conversão do NumPy dentro de `run_async("transcode", ...)`),
+        sem pegar outra: com todas as vagas ocupadas, esperar por uma segunda travaria.
+        """
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self.executor, functools.partial(context.run, func, *args, **kwargs))
+
+    def start_blocking(self, kind: str, func, *args, **kwargs) -> asyncio.Future:
+        """
+        Para trabalhos bloqueantes que duram a conexão inteira (o gRPC do reconhecimento
+        em streaming): pega uma vaga só se houver uma livre agora, sem fila nem prazo
+        (senão AudioBusyError), e roda `func` numa thread do pool. Retorna o future da
+        thread; a vaga volta quando ela terminar.
+        """
+        lane, stats = self.lanes[kind], self._stats[kind]
+        if not lane.try_acquire():
+            lane.rejected += 1
+            raise AudioBusyError("Muitas transcrições em andamento. Tente novamente em instantes.")
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        try:
+            future = loop.run_in_executor(self.executor, functools.partial(context.run, func, *args, **kwargs))
+        except BaseException:
+            lane.release()
+            raise
+
+        def done(finished):
+            if not finished.cancelled() and finished.exception() is not None:
+                stats.failures += 1
+            self._finish(stats, started)
+            lane.release()
+
+        future.add_done_callback(done)
+        return future
+
+    @staticmethod
+    async def _acquire(lane: FairLimiter, stats: _JobStats) -> None:
+        queued = time.perf_counter()
+        await lane.acquire()
+        waited = (time.perf_counter() - queued) * 1000
+        stats.wait_total += waited
+        stats.wait_max = max(stats.wait_max, waited)
+
+    @staticmethod
+    def _finish(stats: _JobStats, started: float) -> None:
+        elapsed = (time.perf_counter() - started) * 1000
+        stats.jobs += 1
+        stats.run_total += elapsed
+        stats.run_max = max(stats.run_max, elapsed)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        result = {}
+        for kind, lane in self.lanes.items():
+            slots = lane.stats()
+            result[kind] = {
+                "workers": slots["limit"],
+                "running": slots["in_flight"],
+                "queue_depth": slots["queue_depth"],
+                "max_queue_depth": slots["max_queue_depth"],
+                "rejected": slots["rejected"] + slots["timeouts"],
+                **self._stats[kind].as_dict(),
+            }
+        return result
+
+
+audio_jobs = AudioJobPool()
@@ -0,0 +1,428 @@
+import asyncio
+import os
+import struct
+
+import ffmpeg
+from dotenv import load_dotenv
+from fastapi import UploadFile
+
+from src.api.services.audio_jobs import audio_jobs
+from src.api.services.metrics import metrics
+
+
+load_dotenv()
+
+# Tamanho máximo aceito para o áudio enviado ao /api/voice-to-text
+AUDIO_MAX_UPLOAD_MB = float(os.getenv("AUDIO_MAX_UPLOAD_MB", 10))
+AUDIO_MAX_UPLOAD_BYTES = int(AUDIO_MAX_UPLOAD_MB * 1024 * 1024)
+# Taxa de amostragem esperada pelo Google Speech-to-Text na configuração FLAC
+STT_SAMPLE_RATE = 16000
+
+# Áudio que o Google já aceita (FLAC mono, WAV PCM) não passa pelo ffmpeg:
+# o cabeçalho é lido e o PCM simples é convertido no próprio processo (NumPy)
+AUDIO_FAST_PATH = os.getenv("AUDIO_FAST_PATH", "1") != "0"
+# Faixa de taxas de amostragem aceitas pelo Google Speech-to-Text
+_GOOGLE_MIN_RATE = 8000
+_GOOGLE_MAX_RATE = 48000
+
+_UPLOAD_CHUNK_BYTES = 64 * 1024
+_STDERR_TAIL_BYTES = 2000
+_RESAMPLE_TAPS = 63
+
+
+class AudioTooLargeError(ValueError):
+    """
+    O áudio enviado passa de AUDIO_MAX_UPLOAD_MB (o endpoint responde 413).
+    """
+
+
+class AudioTranscodeError(RuntimeError):
+    """
+    O ffmpeg não conseguiu converter o áudio (formato inválido, arquivo corrompido...).
+    """
+
+
+class AudioHeader:
+    """
+    O que o cabeçalho diz sobre o áudio enviado (só WAV e FLAC são reconhecidos).
+    """
+
+    __slots__ = ("container", "codec", "sample_rate", "channels", "bits", "data_offset", "data_size")
+
+    def __init__(self, container, codec, sample_rate, channels, bits, data_offset=0, data_size=None):
+        self.container = container
+        self.codec = codec  # "pcm_s16", "pcm_u8", "pcm_s32", "pcm_f32", "flac"...
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.bits = bits
+        self.data_offset = data_offset
+        self.data_size = data_size
+
+
+class PreparedAudio:
+    """
+    Áudio pronto para o RecognitionConfig: conteúdo, codificação ("FLAC" ou "LINEAR16"),
+    taxa de amostragem e o caminho usado ("passthrough", "numpy" ou "ffmpeg").
+    """
+
+    __slots__ = ("content", "encoding", "sample_rate", "path")
+
+    def __init__(self, content: bytes, encoding: str, sample_rate: int, path: str):
+        self.content = content
+        self.encoding = encoding
+        self.sample_rate = sample_rate
+        self.path = path
+
+
+_PCM_CODECS = {(1, 8): "pcm_u8", (1, 16): "pcm_s16", (1, 32): "pcm_s32", (3, 32): "pcm_f32"}
+_WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+_normalization_counts = {"passthrough": 0, "numpy": 0, "ffmpeg": 0}
+
+
+def sniff_audio_header(data: bytes):
+    """
+    Identifica WAV (PCM) e FLAC pelo cabeçalho; None para qualquer outro formato
+    (webm, ogg, mp3...), que segue para o ffmpeg.
+    """
+    if len(data) >= 12 and data[:4] == b"RIFF" and data[8:12] == b"WAVE":
+        return _parse_wav_header(data)
+    if data[:4] == b"fLaC":
+        return _parse_flac_header(data)
+    return None
+
+
+def _parse_wav_header(data: bytes):
+    offset = 12
+    fmt = None
+    while offset + 8 <= len(data):
+        chunk_id = data[offset:offset + 4]
+        (chunk_size,) = struct.unpack_from("<I", data, offset + 4)
+        body = offset + 8
+        if chunk_id == b"fmt " and body + 16 <= len(data):
+            format_tag, channels, sample_rate, _, _, bits = struct.unpack_from("<HHIIHH", data, body)
+            if format_tag == _WAVE_FORMAT_EXTENSIBLE and chunk_size >= 40 and body + 26 <= len(data):
+                # O formato real fica nos 2 primeiros bytes do GUID do subformato
+                (format_tag,) = struct.unpack_from("<H", data, body + 24)
+            fmt = (format_tag, channels, sample_rate, bits)
+        elif chunk_id == b"data":
+            if fmt is None:
+                return None
+            format_tag, channels, sample_rate, bits = fmt
+            codec = _PCM_CODECS.get((format_tag, bits))
+            if codec is None or channels < 1:
+                return AudioHeader("wav", f"wav_{format_tag}_{bits}", sample_rate, channels, bits)
+            # Gravadores em streaming deixam o tamanho zerado (ou no máximo): vale o resto do arquivo
+            size = chunk_size if 0 < chunk_size < 0xFFFFFFFF else None
+            return AudioHeader("wav", codec, sample_rate, channels, bits, body, size)
+        offset = body + chunk_size + (chunk_size & 1)
+    return None
+
+
+def _parse_flac_header(data: bytes):
+    # O primeiro bloco de metadados é sempre o STREAMINFO (34 bytes)
+    if len(data) < 8 + 34 or data[4] & 0x7F != 0:
+        return None
+    (packed,) = struct.unpack_from(">Q", data, 8 + 10)
+    sample_rate = packed >> 44
+    channels = ((packed >> 41) & 0x7) + 1
+    bits = ((packed >> 36) & 0x1F) + 1
+    return AudioHeader("flac", "flac", sample_rate, channels, bits)
+
+
+def normalize_pcm(data: bytes, header: AudioHeader, sample_rate: int = STT_SAMPLE_RATE) -> bytes:
+    """
+    PCM do WAV -> PCM 16-bit mono na taxa `sample_rate`, no próprio processo (NumPy):
+    média dos canais e reamostragem.
+    """
+    import numpy as np
+
+    end = header.data_offset + header.data_size if header.data_size is not None else len(data)
+    raw = data[header.data_offset:end]
+    frame_bytes = header.channels * header.bits // 8
+    raw = raw[:len(raw) - len(raw) % frame_bytes]
+
+    if header.codec == "pcm_s16":
+        samples = np.frombuffer(raw, dtype="<i2").astype(np.float32)
+    elif header.codec == "pcm_u8":
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) * 256.0
+    elif header.codec == "pcm_s32":
+        samples = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 65536.0
+    else:
+        samples = np.frombuffer(raw, dtype="<f4") * 32767.0
+
+    if header.channels > 1:
+        samples = samples.reshape(-1, header.channels).mean(axis=1)
+
+    if header.sample_rate != sample_rate and len(samples) > 1:
+        samples = _resample(samples, header.sample_rate, sample_rate)
+
+    return np.clip(np.rint(samples), -32768, 32767).astype("<i2").tobytes()
+
+
+def _resample(samples, source_rate: int, target_rate: int):
+    """
+    Reamostragem para a taxa do reconhecimento. Ao reduzir a taxa, um filtro passa-baixa
+    (windowed-sinc) corta o que passa da nova Nyquist e é calculado só a cada `step`
+    amostras (a parte inteira da razão, ex.: 48 kHz -> 16 kHz = 3); o resto da razão
+    (44,1 kHz -> 22,05 kHz -> 16 kHz) sai por interpolação linear.
+    """
+    import numpy as np
+    from numpy.lib.stride_tricks import as_strided
+
+    rate = float(source_rate)
+    if target_rate < source_rate:
+        cutoff = target_rate / source_rate / 2
+        taps = np.arange(_RESAMPLE_TAPS) - (_RESAMPLE_TAPS - 1) / 2
+        kernel = 2 * cutoff * np.sinc(2 * cutoff * taps) * np.hamming(_RESAMPLE_TAPS)
+        kernel = (kernel / kernel.sum()).astype(np.float32)
+        step = source_rate // target_rate
+        # Bordas com zeros para o filtro centrado; janelas de `taps` amostras a cada `step`
+        padded = np.concatenate([
+            np.zeros(_RESAMPLE_TAPS // 2, np.float32), samples, np.zeros(_RESAMPLE_TAPS // 2, np.float32)
+        ])
+        count = (len(samples) - 1) // step + 1
+        windows = as_strided(padded, shape=(count, _RESAMPLE_TAPS), strides=(step * padded.strides[0], padded.strides[0]))
+        samples = windows @ kernel
+        rate = source_rate / step
+
+    if rate != target_rate:
+        count = int(len(samples) * target_rate / rate)
+        positions = np.arange(count) * (rate / target_rate)
+        index = np.minimum(positions.astype(np.int64), len(samples) - 2)
+        fraction = (positions - index).astype(np.float32)
+        samples = samples[index] * (1 - fraction) + samples[index + 1] * fraction
+    return samples
+
+
+def _fast_path_plan(header, sample_rate: int = STT_SAMPLE_RATE):
+    """
+    "passthrough", "numpy" ou None (ffmpeg) para o áudio descrito pelo cabeçalho.
+    """
+    if header is None:
+        return None
+    if header.container == "flac":
+        # FLAC mono vai direto para o Google (a taxa do cabeçalho entra no RecognitionConfig)
+        if (
+            header.channels == 1
+            and header.bits in (16, 24)
+            and _GOOGLE_MIN_RATE <= header.sample_rate <= _GOOGLE_MAX_RATE
+        ):
+            return "passthrough"
+        return None
+    if header.codec == "pcm_s16" and header.channels == 1 and header.sample_rate == sample_rate:
+        return "passthrough"
+    if header.codec in ("pcm_s16", "pcm_u8", "pcm_s32", "pcm_f32") and header.sample_rate > 0:
+        return "numpy"
+    return None
+
+
+async def prepare_upload_for_recognition(
+    file: UploadFile,
+    max_bytes: int = AUDIO_MAX_UPLOAD_BYTES,
+    sample_rate: int = STT_SAMPLE_RATE,
+) -> PreparedAudio:
+    """
+    Prepara o áudio enviado para o Google Speech-to-Text pelo caminho mais barato:
+    - FLAC mono aceito pelo Google: enviado como está;
+    - WAV PCM: convertido para PCM 16-bit mono 16 kHz com NumPy (numa thread do audio_jobs);
+    - qualquer outro formato: FLAC via ffmpeg (`transcode_upload_to_flac`).
+    """
+    if file.size is not None and file.size > max_bytes:
+        raise AudioTooLargeError(_too_large_message(max_bytes))
+
+    if AUDIO_FAST_PATH:
+        head = await file.read(_UPLOAD_CHUNK_BYTES)
+        header = sniff_audio_header(head)
+        plan = _fast_path_plan(header, sample_rate)
+        if plan is not None:
+            data = head + await _read_upload(file, max_bytes - len(head), max_bytes)
+            _normalization_counts[plan] += 1
+            if header.container == "flac":
+                return PreparedAudio(data, "FLAC", header.sample_rate, plan)
+            if plan == "passthrough":
+                end = header.data_offset + header.data_size if header.data_size is not None else len(data)
+                pcm = data[header.data_offset:end]
+                return PreparedAudio(pcm[:len(pcm) - len(pcm) % 2], "LINEAR16", sample_rate, plan)
+            # Mesmo pool (e vaga "transcode") da conversão com ffmpeg, e não o executor padrão
+            pcm = await audio_jobs.run_in_slot(normalize_pcm, data, header, sample_rate)
+            return PreparedAudio(pcm, "LINEAR16", sample_rate, plan)
+        await file.seek(0)
+
+    flac = await transcode_upload_to_flac(file, max_bytes, sample_rate)
+    _normalization_counts["ffmpeg"] += 1
+    return PreparedAudio(flac, "FLAC", sample_rate, "ffmpeg")
+
+
+async def _read_upload(file: UploadFile, remaining: int, max_bytes: int) -> bytes:
+    if remaining < 0:
+        raise AudioTooLargeError(_too_large_message(max_bytes))
+    parts = []
+    while True:
+        chunk = await file.read(_UPLOAD_CHUNK_BYTES)
+        if not chunk:
+            break
+        remaining -= len(chunk)
+        if remaining < 0:
+            raise AudioTooLargeError(_too_large_message(max_bytes))
+        parts.append(chunk)
+    return b"".join(parts)
+
+
+def normalization_stats() -> dict:
+    """
+    Quantos uploads seguiram cada caminho (sem conversão, NumPy, ffmpeg).
+    """
+    return dict(_normalization_counts)
+
+
+def flac_command(sample_rate: int = STT_SAMPLE_RATE) -> list:
+    """
+    Linha de comando do ffmpeg que lê qualquer áudio do stdin e escreve FLAC mono no stdout.
+    """
+    return (
+        ffmpeg
+        .input("pipe:0")
+        .output("pipe:1", ar=sample_rate, ac=1, format="flac")
+        .global_args("-hide_banner", "-loglevel", "error", "-nostdin")
+        .compile()
+    )
+
+
+async def transcode_upload_to_flac(
+    file: UploadFile,
+    max_bytes: int = AUDIO_MAX_UPLOAD_BYTES,
+    sample_rate: int = STT_SAMPLE_RATE,
+) -> bytes:
+    """
+    Converte o áudio enviado para FLAC mono (16 kHz) sem passar pelo disco: o upload é
+    repassado em blocos ao stdin do ffmpeg enquanto o FLAC é lido do stdout. O limite de
+    tamanho é verificado durante a leitura e o processo é encerrado se ele estourar.
+    """
+    if file.size is not None and file.size > max_bytes:
+        raise AudioTooLargeError(_too_large_message(max_bytes))
+
+    with metrics.external_call("ffmpeg", "transcode"):
+        process = await asyncio.create_subprocess_exec(
+            *flac_command(sample_rate),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        # stdout e stderr são drenados em paralelo para o ffmpeg nunca travar com o pipe cheio
+        stdout_task = asyncio.ensure_future(process.stdout.read())
+        stderr_task = asyncio.ensure_future(process.stderr.read())
+        try:
+            await _feed_upload(file, process.stdin, max_bytes)
+            flac, stderr = await asyncio.gather(stdout_task, stderr_task)
+            returncode = await process.wait()
+        except BaseException:
+            # Upload grande demais, cliente desconectou...: nada de ffmpeg órfão
+            if process.returncode is None:
+                process.kill()
+            await process.wait()
+            for task in (stdout_task, stderr_task):
+                task.cancel()
+            raise
+
+    if returncode != 0 or not flac:
+        message = stderr[-_STDERR_TAIL_BYTES:].decode(errors="replace").strip()
+        raise AudioTranscodeError(message or f"ffmpeg terminou com código {returncode}")
+    return flac
+
+
+async def _feed_upload(file: UploadFile, stdin: asyncio.StreamWriter, max_bytes: int) -> None:
+    total = 0
+    try:
+        while True:
+            chunk = await file.read(_UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            total += len(chunk)
+            if total > max_bytes:
+                raise AudioTooLargeError(_too_large_message(max_bytes))
+            stdin.write(chunk)
+            await stdin.drain()
+    except (BrokenPipeError, ConnectionResetError):
+        # O ffmpeg desistiu da entrada (áudio inválido): o erro vem pelo stderr
+        pass
+    finally:
+        if not stdin.is_closing():
+            stdin.close()
+
+
+def _too_large_message(max_bytes: int) -> str:
+    return f"Arquivo de áudio maior que o limite de {round(max_bytes / (1024 * 1024), 1):g} MB"
+
+
+def pcm_command(sample_rate: int = STT_SAMPLE_RATE) -> list:
+    """
+    Linha de comando do ffmpeg que converte áudio do stdin em PCM 16-bit mono cru no stdout.
+    """
+    # Sondagem curta da entrada: por padrão o ffmpeg lê até 5 MB antes de decodificar,
+    # o que seguraria o PCM até o fim da gravação
+    return (
+        ffmpeg
+        .input("pipe:0", probesize=32768, analyzeduration=0, fflags="+nobuffer")
+        .output("pipe:1", ar=sample_rate, ac=1, format="s16le", acodec="pcm_s16le", flush_packets=1)
+        .global_args("-hide_banner", "-loglevel", "error", "-nostdin")
+        .compile()
+    )
+
+
+class PcmTranscoder:
+    """
+    Conversão incremental para o reconhecimento em streaming: pedaços do áudio gravado
+    (webm/ogg do MediaRecorder, por exemplo) entram com `feed` conforme chegam e o PCM
+    16 kHz sai por `chunks()` assim que o ffmpeg o produz.
+    """
+
+    def __init__(self, sample_rate: int = STT_SAMPLE_RATE, read_size: int = 8 * 1024):
+        self.sample_rate = sample_rate
+        self.read_size = read_size
+        self._process = None
+        self._stderr_task = None
+
+    async def start(self) -> None:
+        self._process = await asyncio.create_subprocess_exec(
+            *pcm_command(self.sample_rate),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        self._stderr_task = asyncio.ensure_future(self._process.stderr.read())
+
+    async def feed(self, chunk: bytes) -> None:
+        try:
+            self._process.stdin.write(chunk)
+            await self._process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            # O ffmpeg já encerrou; o motivo aparece ao final de `chunks()`
+            pass
+
+    def finish(self) -> None:
+        """
+        Fim do áudio: fecha o stdin para o ffmpeg esvaziar o que falta.
+        """
+        if not self._process.stdin.is_closing():
+            self._process.stdin.close()
+
+    async def chunks(self):
+        while True:
+            data = await self._process.stdout.read(self.read_size)
+            if not data:
+                break
+            yield data
+        returncode = await self._process.wait()
+        if returncode != 0:
+            stderr = await self._stderr_task
+            message = stderr[-_STDERR_TAIL_BYTES:].decode(errors="replace").strip()
+            raise AudioTranscodeError(message or f"ffmpeg terminou com código {returncode}")
+
+    async def close(self) -> None:
+        if self._process is None:
+            return
+        if self._process.returncode is None:
+            self._process.kill()
+        await self._process.wait()
+        self._stderr_task.cancel()
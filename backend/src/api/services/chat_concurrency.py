@@ -0,0 +1,321 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from dotenv import load_dotenv
+
+from src.api.services.session_backends import session_backend
+
+
+load_dotenv()
+
+# Chamadas simultâneas à OpenAI por worker; as demais esperam numa fila FIFO
+OPENAI_MAX_IN_FLIGHT = int(os.getenv("OPENAI_MAX_IN_FLIGHT", 20))
+OPENAI_QUEUE_MAX = int(os.getenv("OPENAI_QUEUE_MAX", 200))
+OPENAI_QUEUE_TIMEOUT_SECONDS = float(os.getenv("OPENAI_QUEUE_TIMEOUT_SECONDS", 30))
+# Quanto um turno espera o turno anterior da mesma sessão e por quanto tempo ele "reserva" a sessão
+CHAT_TURN_WAIT_SECONDS = float(os.getenv("CHAT_TURN_WAIT_SECONDS", 60))
+CHAT_TURN_LEASE_SECONDS = float(os.getenv("CHAT_TURN_LEASE_SECONDS", 120))
+# Respostas guardadas por chave de idempotência (reenvios do mesmo pedido)
+CHAT_IDEMPOTENCY_TTL_SECONDS = float(os.getenv("CHAT_IDEMPOTENCY_TTL_SECONDS", 600))
+CHAT_IDEMPOTENCY_MAX = int(os.getenv("CHAT_IDEMPOTENCY_MAX", 10000))
+
+BUSY_MESSAGE = "Estamos com muitas conversas no momento. Poderia tentar novamente em alguns segundos?"
+
+
+class ChatBusyError(Exception):
+    """
+    A conversa não pôde ser atendida agora (fila da OpenAI cheia ou sessão ocupada).
+    Os endpoints respondem 429 com Retry-After.
+    """
+
+    def __init__(self, message: str = BUSY_MESSAGE, retry_after: int = 5):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class FairLimiter:
+    """
+    Limite de chamadas simultâneas à OpenAI com fila FIFO: quem chegou primeiro é atendido
+    primeiro e o slot liberado passa direto para o próximo da fila. Como cada sessão tem no
+    máximo um turno ativo (SessionTurnLocks), nenhuma sessão monopoliza os slots.
+    """
+
+    def __init__(
+        self,
+        limit: int = OPENAI_MAX_IN_FLIGHT,
+        max_queue: int = OPENAI_QUEUE_MAX,
+        queue_timeout: float = OPENAI_QUEUE_TIMEOUT_SECONDS,
+        busy_error=ChatBusyError,
+    ):
+        self.limit = max(1, limit)
+        # Exceção levantada com a fila cheia ou após esperar `queue_timeout`
+        self.busy_error = busy_error
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._in_flight = 0
+        self._waiters = deque()
+        self.acquired = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.max_queue_depth = 0
+        self._wait_total = 0.0
+        self.max_wait_ms = 0.0
+
+    def try_acquire(self) -> bool:
+        """
+        Pega um slot só se houver um livre agora (sem entrar na fila).
+        """
+        if self._in_flight < self.limit and not self._waiters:
+            self._in_flight += 1
+            self.acquired += 1
+            return True
+        return False
+
+    async def acquire(self) -> None:
+        if self.try_acquire():
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            raise self.busy_error()
+
+        started = time.perf_counter()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.queued += 1
+        self.max_queue_depth = max(self.max_queue_depth, len(self._waiters))
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except BaseException as error:
+            if waiter.done() and not waiter.cancelled():
+                # O slot chegou junto com o cancelamento: devolve para o próximo
+                self.release()
+            else:
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+            if isinstance(error, asyncio.TimeoutError):
+                self.timeouts += 1
+                raise self.busy_error() from None
+            raise
+        waited = (time.perf_counter() - started) * 1000
+        self._wait_total += waited
+        self.max_wait_ms = max(self.max_wait_ms, waited)
+        self.acquired += 1
+
+    def release(self) -> None:
+        # Passa o slot diretamente ao primeiro da fila (sem disputa com quem chega depois)
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._in_flight -= 1
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.release()
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "in_flight": self._in_flight,
+            "queue_depth": len(self._waiters),
+            "max_queue_depth": self.max_queue_depth,
+            "acquired": self.acquired,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "avg_wait_ms": round(self._wait_total / self.queued, 2) if self.queued else 0.0,
+            "max_wait_ms": round(self.max_wait_ms, 2),
+        }
+
+
+class SessionTurnLocks:
+    """
+    Serializa os turnos de uma mesma sessão: um segundo pedido (duplo clique, reenvio)
+    espera o anterior terminar e então vê o histórico já atualizado.
+
+    Dentro do worker usa um asyncio.Lock por sessão; com backends de sessão compartilhados
+    (SQLite, chave-valor) também reserva a sessão no backend, valendo entre workers.
+    """
+
+    def __init__(
+        self,
+        backend=session_backend,
+        wait_seconds: float = CHAT_TURN_WAIT_SECONDS,
+        lease_seconds: float = CHAT_TURN_LEASE_SECONDS,
+    ):
+        self.backend = backend
+        self.wait_seconds = wait_seconds
+        self.lease_seconds = lease_seconds
+        self._locks = {}
+        self.waits = 0
+        self.timeouts = 0
+
+    @asynccontextmanager
+    async def hold(self, session_id: Optional[str]):
+        # Sessão nova: o id ainda vai ser gerado, não há com quem concorrer
+        if not session_id:
+            yield
+            return
+
+        entry = self._locks.get(session_id)
+        if entry is None:
+            entry = self._locks[session_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        deadline = time.monotonic() + self.wait_seconds
+        try:
+            if entry[0].locked():
+                self.waits += 1
+            try:
+                await asyncio.wait_for(entry[0].acquire(), self.wait_seconds)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                raise ChatBusyError() from None
+            try:
+                token = await self._acquire_lease(session_id, max(0.0, deadline - time.monotonic()))
+                try:
+                    yield
+                finally:
+                    await self._release_lease(session_id, token)
+            finally:
+                entry[0].release()
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[session_id]
+
+    async def _acquire_lease(self, session_id: str, timeout: float):
+        if not self.backend.blocking:
+            return None
+        token = await asyncio.to_thread(
+            self.backend.acquire_turn, session_id, self.lease_seconds, timeout
+        )
+        if token is None:
+            self.timeouts += 1
+            raise ChatBusyError()
+        return token
+
+    async def _release_lease(self, session_id: str, token) -> None:
+        if token is not None:
+            await asyncio.to_thread(self.backend.release_turn, session_id, token)
+
+    def stats(self) -> dict:
+        return {"active_sessions": len(self._locks), "waits": self.waits, "timeouts": self.timeouts}
+
+
+class IdempotencyCache:
+    """
+    Resultados recentes por chave de idempotência (LRU + TTL, por worker). Um reenvio
+    com a mesma chave recebe a resposta já calculada; se o original ainda estiver em
+    andamento, espera por ele em vez de gerar outra completion.
+    """
+
+    def __init__(self, ttl_seconds: float = CHAT_IDEMPOTENCY_TTL_SECONDS, max_entries: int = CHAT_IDEMPOTENCY_MAX):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.joined = 0
+
+    @staticmethod
+    def scope(session_id: Optional[str], key: Optional[str]) -> Optional[str]:
+        # Sem sessão (primeira mensagem) não há a quem atrelar a chave: num escopo comum,
+        # dois visitantes com a mesma chave receberiam a resposta e a sessão um do outro
+        if not key or not session_id:
+            return None
+        return f"{session_id}:{key}"
+
+    def claim(self, scope: str) -> Optional[asyncio.Future]:
+        """
+        Retorna None se o chamador passou a ser o dono da chave (deve chamar `complete`
+        ou `fail`); senão, o future com o resultado (pronto ou ainda em andamento).
+        """
+        now = time.monotonic()
+        while self._entries:
+            _, (future, expires_at) = next(iter(self._entries.items()))
+            if expires_at > now or not future.done():
+                break
+            self._entries.popitem(last=False)
+
+        entry = self._entries.get(scope)
+        if entry is not None:
+            future = entry[0]
+            if future.done():
+                self.hits += 1
+            else:
+                self.joined += 1
+            return future
+
+        future = asyncio.get_running_loop().create_future()
+        self._entries[scope] = (future, now + self.ttl_seconds)
+        self._trim()
+        return None
+
+    def _trim(self) -> None:
+        # Só descarta resultados prontos, dos mais antigos: um future pendente tem dono e
+        # talvez reenvios esperando por ele, e `complete`/`fail` precisam encontrá-lo.
+        # Os pendentes são limitados pelos turnos em andamento
+        excess = len(self._entries) - self.max_entries
+        if excess <= 0:
+            return
+        finished = []
+        for key, (future, _) in self._entries.items():
+            if future.done():
+                finished.append(key)
+                if len(finished) == excess:
+                    break
+        for key in finished:
+            del self._entries[key]
+
+    def complete(self, scope: Optional[str], result: dict) -> None:
+        if scope is None:
+            return
+        entry = self._entries.get(scope)
+        if entry is None:
+            return
+        if result.get("error"):
+            # Falhas não ficam guardadas: o próximo reenvio tenta de novo
+            del self._entries[scope]
+        if not entry[0].done():
+            entry[0].set_result(result)
+
+    def fail(self, scope: Optional[str], error: BaseException) -> None:
+        if scope is None:
+            return
+        entry = self._entries.pop(scope, None)
+        if entry is not None and not entry[0].done():
+            entry[0].set_exception(ChatBusyError() if not isinstance(error, Exception) else error)
+            # Evita o aviso de exceção não lida quando ninguém estava esperando
+            entry[0].exception()
+
+    async def run(self, scope: Optional[str], compute) -> dict:
+        if scope is None:
+            return await compute()
+        pending = self.claim(scope)
+        if pending is not None:
+            return await asyncio.shield(pending)
+        try:
+            result = await compute()
+        except BaseException as error:
+            self.fail(scope, error)
+            raise
+        self.complete(scope, result)
+        return result
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "joined": self.joined}
+
+
+llm_limiter = FairLimiter()
+turn_locks = SessionTurnLocks()
+idempotency_cache = IdempotencyCache()
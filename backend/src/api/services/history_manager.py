@@ -0,0 +1,144 @@
+import os
+from typing import Optional
+
+from dotenv import load_dotenv
+
+from src.api.services.session_store import ChatMessage, ChatSession, ROLE_SYSTEM
+
+
+load_dotenv()
+
+# Orçamento de tokens do histórico enviado a cada turno (sem contar o system prompt)
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", 3000))
+# Número máximo de turnos (usuário + assistente) mantidos literalmente
+CHAT_HISTORY_KEEP_TURNS = int(os.getenv("CHAT_HISTORY_KEEP_TURNS", 10))
+# Quantos turnos são resumidos de uma vez quando a janela desliza
+CHAT_HISTORY_FOLD_TURNS = int(os.getenv("CHAT_HISTORY_FOLD_TURNS", 4))
+CHAT_SUMMARY_MODEL = os.getenv("CHAT_SUMMARY_MODEL", "gpt-4o-mini")
+
+_MESSAGE_TOKEN_OVERHEAD = 4
+
+# Codificação do tiktoken, carregada na primeira contagem e não no import (a subida da
+# API não paga o import nem o download do vocabulário)
+_encoding = None
+_encoding_loaded = False
+
+
+def _get_encoding():
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:  # tiktoken é opcional; sem ele usamos uma estimativa por caracteres
+            _encoding = None
+        _encoding_loaded = True
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """
+    Conta os tokens de um texto (tiktoken se disponível, senão ~4 caracteres por token).
+    """
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return len(text) // 4 + 1
+
+
+def message_tokens(message: ChatMessage) -> int:
+    """
+    Tokens de uma mensagem do histórico, contados uma única vez e guardados na própria mensagem.
+    """
+    if message.tokens is None:
+        message.tokens = count_tokens(message.content) + _MESSAGE_TOKEN_OVERHEAD
+    return message.tokens
+
+
+class HistoryManager:
+    """
+    Mantém o histórico enviado à OpenAI dentro de um orçamento de tokens: os últimos
+    turnos vão literalmente e os mais antigos são condensados num resumo cumulativo,
+    que só é regenerado quando a janela desliza.
+    """
+
+    def __init__(
+        self,
+        token_budget: int = CHAT_HISTORY_TOKEN_BUDGET,
+        keep_turns: int = CHAT_HISTORY_KEEP_TURNS,
+        fold_turns: int = CHAT_HISTORY_FOLD_TURNS,
+    ):
+        self.token_budget = token_budget
+        self.keep_turns = keep_turns
+        self.fold_turns = max(1, fold_turns)
+        self.folds = 0
+
+    def window_start(self, session: ChatSession) -> int:
+        """
+        Índice do primeiro item do histórico que cabe na janela (turnos e orçamento de tokens).
+        """
+        history = session.history
+        start = max(session.summarized_upto, len(history) - self.keep_turns * 2)
+        used = sum(message_tokens(message) for message in history[start:])
+        while used > self.token_budget and start < len(history) - 1:
+            used -= message_tokens(history[start])
+            start += 1
+        return start
+
+    def plan_fold(self, session: ChatSession) -> Optional[int]:
+        """
+        Se a janela deslizou além do que já foi resumido, retorna até qual índice o resumo
+        precisa ser refeito (avançando de `fold_turns` em `fold_turns` turnos). Senão, None.
+        """
+        start = self.window_start(session)
+        if start <= session.summarized_upto:
+            return None
+        # Resumir um bloco de turnos de uma vez evita regenerar o resumo a cada mensagem
+        upto = min(session.summarized_upto + self.fold_turns * 2, len(session.history))
+        return max(start, upto)
+
+    def summary_messages(self, session: ChatSession, upto: int) -> list:
+        """
+        Mensagens para o modelo de resumo: resumo anterior + turnos que saem da janela.
+        """
+        transcript = "\n".join(
+            f"{message.role}: {message.content}"
+            for message in session.history[session.summarized_upto:upto]
+        )
+        previous = session.summary or "(nenhum)"
+        return [
+            {
+                "role": "system",
+                "content": (
+                    "Resuma a conversa entre um visitante e o assistente Ricardo Nogueira em poucas frases, "
+                    "em português. Preserve dores, contexto da empresa, dados de contato já informados "
+                    "e compromissos assumidos. Não invente informações."
+                ),
+            },
+            {
+                "role": "user",
+                "content": f"Resumo anterior:\n{previous}\n\nNovos trechos da conversa:\n{transcript}",
+            },
+        ]
+
+    def apply_fold(self, session: ChatSession, upto: int, summary: str) -> None:
+        session.summary = summary.strip()
+        session.summarized_upto = upto
+        self.folds += 1
+
+    def context(self, session: ChatSession) -> list:
+        """
+        Histórico a ser enviado: resumo dos turnos antigos (se houver) + janela literal.
+        """
+        messages = []
+        if session.summary:
+            messages.append({
+                "role": ROLE_SYSTEM,
+                "content": f"Resumo da conversa até aqui: {session.summary}",
+            })
+        start = max(session.summarized_upto, self.window_start(session))
+        messages.extend(message.as_openai() for message in session.history[start:])
+        return messages
+
+
+history_manager = HistoryManager()
@@ -0,0 +1,147 @@
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from src.api.db.models import Lead, Mensagem
+
+
+# Valores da coluna `Mensagem.origem`
+ORIGEM_USUARIO = "usuario"
+ORIGEM_BOT = "bot"
+
+# Campos do lead_data do chat -> colunas da tabela leads
+LEAD_COLUMNS = {
+    "nome": "nome",
+    "email": "email",
+    "telefone": "telefone",
+    "empresa": "empresa",
+    "setor": "setor",
+    "interesse": "interesse",
+    "origem": "canal_origem",
+}
+
+
+def _fit(column, value) -> Optional[str]:
+    """
+    Converte para texto e corta no tamanho da coluna (String(n)); no Postgres um valor
+    maior derrubaria a transação inteira.
+    """
+    if value is None:
+        return None
+    value = str(value)
+    max_length = getattr(column.type, "length", None)
+    return value[:max_length] if max_length else value
+
+
+def _apply_lead_data(lead: Lead, lead_data: dict) -> None:
+    """
+    Copia para o lead apenas os campos preenchidos, respeitando o tamanho das colunas.
+    Com e-mail ou telefone coletados, o lead passa de 'interagido' para 'qualificado'.
+    """
+    for field, column in LEAD_COLUMNS.items():
+        value = lead_data.get(field)
+        if value is None:
+            continue
+        setattr(lead, column, _fit(Lead.__table__.c[column], value))
+
+    if lead.status in (None, "interagido") and (lead.email or lead.telefone):
+        lead.status = "qualificado"
+
+
+def get_or_create_session_lead(db: Session, session_id: str, canal: Optional[str] = None) -> Lead:
+    """
+    Retorna o lead associado à sessão do chat, criando-o na primeira interação.
+    """
+    lead = db.query(Lead).filter(Lead.session_id == session_id).first()
+    if lead is None:
+        lead = Lead(
+            session_id=session_id, canal_origem=_fit(Lead.__table__.c.canal_origem, canal),
+            status="interagido", respondeu=True
+        )
+        db.add(lead)
+        db.flush()
+    return lead
+
+
+def save_or_update_lead(db: Session, session_id: str, lead_data: dict) -> Lead:
+    """
+    Cria ou atualiza o lead da sessão do chat com os dados coletados até agora.
+    Não faz commit.
+    """
+    lead = get_or_create_session_lead(db, session_id, lead_data.get("origem"))
+    _apply_lead_data(lead, lead_data)
+    return lead
+
+
+def upsert_session_leads(db: Session, snapshots: Dict[str, dict]) -> Dict[str, Lead]:
+    """
+    Versão em lote de `save_or_update_lead`: uma consulta para todos os leads existentes,
+    criação dos que faltam e atualização dos campos. Não faz commit.
+    """
+    leads = {
+        lead.session_id: lead
+        for lead in db.query(Lead).filter(Lead.session_id.in_(list(snapshots)))
+    }
+    for session_id, lead_data in snapshots.items():
+        lead = leads.get(session_id)
+        if lead is None:
+            lead = Lead(session_id=session_id, status="interagido", respondeu=True)
+            db.add(lead)
+            leads[session_id] = lead
+        _apply_lead_data(lead, lead_data)
+    db.flush()
+    return leads
+
+
+def transcript_rows(
+    lead_id,
+    turns: List[Tuple[str, str]],
+    canal: Optional[str] = None,
+    sent_at: Optional[datetime] = None
+) -> List[dict]:
+    """
+    Linhas de `mensagens` para `turns`, uma lista de (origem, conteudo) em ordem cronológica.
+    """
+    # `data_envio` definido aqui (e não pelo now() do banco, igual para toda a transação)
+    # para manter a ordem das mensagens de um mesmo turno
+    base = sent_at or datetime.now()
+    canal = _fit(Mensagem.__table__.c.canal, canal)
+    return [
+        {
+            "lead_id": lead_id,
+            "canal": canal,
+            "origem": origem,
+            "conteudo": conteudo,
+            "data_envio": base + timedelta(microseconds=index),
+        }
+        for index, (origem, conteudo) in enumerate(turns)
+    ]
+
+
+def append_transcript(db: Session, lead_id, turns: List[Tuple[str, str]], canal: Optional[str] = None) -> None:
+    """
+    Acrescenta mensagens ao histórico do lead com um único INSERT (várias linhas).
+    """
+    if turns:
+        db.execute(insert(Mensagem), transcript_rows(lead_id, turns, canal))
+
+
+def load_transcript(db: Session, lead_id) -> List[Mensagem]:
+    """
+    Mensagens do lead em ordem cronológica.
+    """
+    return (
+        db.query(Mensagem)
+        .filter(Mensagem.lead_id == lead_id)
+        .order_by(Mensagem.data_envio)
+        .all()
+    )
+
+
+def render_transcript(mensagens: List[Mensagem]) -> str:
+    """
+    Materializa a conversa completa como texto (apenas na leitura).
+    """
+    return "\n".join(f"{mensagem.origem}: {mensagem.conteudo}" for mensagem in mensagens)
@@ -0,0 +1,238 @@
+import os
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from dotenv import load_dotenv
+from sqlalchemy import insert
+
+from src.api.db.database import SessionLocal
+from src.api.db.models import Mensagem
+from src.api.services.lead_service import upsert_session_leads, transcript_rows
+
+
+load_dotenv()
+
+# Intervalo entre gravações em lote e limite de sessões pendentes na fila
+LEAD_WRITER_FLUSH_MS = int(os.getenv("LEAD_WRITER_FLUSH_MS", 250))
+LEAD_WRITER_MAX_PENDING = int(os.getenv("LEAD_WRITER_MAX_PENDING", 10000))
+LEAD_WRITER_BATCH_SIZE = int(os.getenv("LEAD_WRITER_BATCH_SIZE", 500))
+# Tentativas de gravação de uma sessão antes de descartá-la (falhas passageiras do banco
+# voltam para a fila e vão no próximo flush)
+LEAD_WRITER_MAX_ATTEMPTS = int(os.getenv("LEAD_WRITER_MAX_ATTEMPTS", 5))
+
+
+class _PendingLead:
+    __slots__ = ("lead_data", "canal", "groups", "attempts")
+
+    def __init__(self, lead_data: dict, canal: Optional[str]):
+        self.lead_data = lead_data
+        self.canal = canal
+        # Lista de (enviado_em, [(origem, conteudo), ...]) ainda não gravados
+        self.groups = []
+        # Gravações que já falharam para esta sessão
+        self.attempts = 0
+
+
+class LeadWriteBehindQueue:
+    """
+    Fila write-behind para o caminho do chat: cada turno enfileira o estado mais recente
+    do lead e as mensagens do turno; uma thread em segundo plano agrupa as atualizações
+    da mesma sessão e grava tudo em transações em lote a cada `flush_interval_ms`.
+    """
+
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        flush_interval_ms: int = LEAD_WRITER_FLUSH_MS,
+        max_pending: int = LEAD_WRITER_MAX_PENDING,
+        batch_size: int = LEAD_WRITER_BATCH_SIZE,
+        max_attempts: int = LEAD_WRITER_MAX_ATTEMPTS,
+    ):
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.max_attempts = max(1, max_attempts)
+        self._pending = {}
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._stopping = False
+        self.enqueued = 0
+        self.coalesced = 0
+        # Sessões perdidas: fila cheia ou LEAD_WRITER_MAX_ATTEMPTS falhas de gravação
+        self.dropped = 0
+        self.flushed = 0
+        self.failures = 0
+        self.flushes = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    def enqueue(
+        self,
+        session_id: str,
+        lead_data: dict,
+        turns: List[Tuple[str, str]],
+        canal: Optional[str] = None,
+    ) -> bool:
+        """
+        Enfileira o snapshot do lead e as mensagens do turno. Retorna False se a fila
+        estiver cheia e a atualização tiver sido descartada.
+        """
+        sent_at = datetime.now()
+        with self._cond:
+            entry = self._pending.get(session_id)
+            if entry is None:
+                if len(self._pending) >= self.max_pending:
+                    self.dropped += 1
+                    return False
+                entry = _PendingLead(dict(lead_data), canal)
+                self._pending[session_id] = entry
+            else:
+                # Mesma sessão ainda pendente: fica só o snapshot mais recente do lead
+                entry.lead_data = dict(lead_data)
+                entry.canal = canal
+                self.coalesced += 1
+            if turns:
+                entry.groups.append((sent_at, list(turns)))
+            self.enqueued += 1
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify()
+        self._ensure_started()
+        return True
+
+    def flush(self) -> int:
+        """
+        Grava imediatamente tudo o que está pendente. Retorna o número de sessões gravadas.
+        """
+        with self._flush_lock:
+            with self._cond:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return 0
+
+            start = time.perf_counter()
+            items = list(batch.items())
+            written = 0
+            for offset in range(0, len(items), self.batch_size):
+                written += self._write(items[offset:offset + self.batch_size])
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+            with self._cond:
+                self.flushes += 1
+                self.flushed += written
+                self.last_flush_ms = elapsed_ms
+                self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+                self._total_flush_ms += elapsed_ms
+            return written
+
+    def start(self) -> None:
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="lead-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """
+        Para a thread e grava o que ainda estiver pendente (chamado no shutdown). O que
+        falhar volta para a fila e é regravado até esgotar as tentativas.
+        """
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        while True:
+            self.flush()
+            with self._cond:
+                if not self._pending:
+                    return
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "queue_depth": len(self._pending),
+                "enqueued": self.enqueued,
+                "coalesced": self.coalesced,
+                "dropped": self.dropped,
+                "flushed": self.flushed,
+                "failures": self.failures,
+                "flushes": self.flushes,
+                "last_flush_ms": round(self.last_flush_ms, 2),
+                "avg_flush_ms": round(self._total_flush_ms / self.flushes, 2) if self.flushes else 0.0,
+                "max_flush_ms": round(self.max_flush_ms, 2),
+            }
+
+    def _ensure_started(self) -> None:
+        if self._thread is None and not self._stopping:
+            self.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if not self._stopping:
+                    self._cond.wait(self.flush_interval)
+                stopping = self._stopping
+            try:
+                self.flush()
+            except Exception:
+                pass
+            if stopping:
+                return
+
+    def _write(self, items) -> int:
+        try:
+            self._write_batch(items)
+            return len(items)
+        except Exception:
+            if len(items) == 1:
+                self._requeue(*items[0])
+                return 0
+        # Um item com problema não derruba o lote inteiro: regrava um a um
+        return sum(self._write([item]) for item in items)
+
+    def _requeue(self, session_id: str, entry: _PendingLead) -> None:
+        """
+        Devolve à fila uma sessão cuja gravação falhou, até LEAD_WRITER_MAX_ATTEMPTS
+        tentativas; depois disso ela é descartada (e contada em `dropped`).
+        """
+        with self._cond:
+            self.failures += 1
+            entry.attempts += 1
+            if entry.attempts >= self.max_attempts:
+                self.dropped += 1
+                return
+            newer = self._pending.get(session_id)
+            if newer is not None:
+                # Turnos chegaram durante o flush: o snapshot novo do lead vale, e as
+                # mensagens que falharam vêm antes das novas
+                entry.groups.extend(newer.groups)
+                entry.lead_data, entry.canal = newer.lead_data, newer.canal
+            self._pending[session_id] = entry
+
+    def _write_batch(self, items) -> None:
+        db = self.session_factory()
+        try:
+            leads = upsert_session_leads(db, {session_id: entry.lead_data for session_id, entry in items})
+            rows = []
+            for session_id, entry in items:
+                lead_id = leads[session_id].id
+                for sent_at, turns in entry.groups:
+                    rows.extend(transcript_rows(lead_id, turns, entry.canal, sent_at))
+            if rows:
+                db.execute(insert(Mensagem), rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+
+lead_writer = LeadWriteBehindQueue()
@@ -0,0 +1,357 @@
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from typing import Optional
+
+from dotenv import load_dotenv
+
+from src.api.services.chat_concurrency import ChatBusyError, FairLimiter
+
+
+load_dotenv()
+
+# Prazo de cada tentativa (completion inteira, ou até o primeiro token no streaming)
+OPENAI_TIMEOUT_SECONDS = float(os.getenv("OPENAI_TIMEOUT_SECONDS", 30))
+# Intervalo máximo sem receber nada no meio de um stream
+OPENAI_STREAM_IDLE_TIMEOUT_SECONDS = float(os.getenv("OPENAI_STREAM_IDLE_TIMEOUT_SECONDS", 20))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", 2))
+OPENAI_RETRY_BASE_MS = float(os.getenv("OPENAI_RETRY_BASE_MS", 200))
+OPENAI_RETRY_MAX_MS = float(os.getenv("OPENAI_RETRY_MAX_MS", 3000))
+# Requisição "hedge": uma segunda cópia quando a primeira passa do percentil de latência
+OPENAI_HEDGE_ENABLED = os.getenv("OPENAI_HEDGE_ENABLED", "0") == "1"
+OPENAI_HEDGE_PERCENTILE = float(os.getenv("OPENAI_HEDGE_PERCENTILE", 95))
+OPENAI_HEDGE_MIN_MS = float(os.getenv("OPENAI_HEDGE_MIN_MS", 500))
+# Circuit breaker: falhas seguidas até abrir e tempo aberto antes de testar de novo
+OPENAI_BREAKER_FAILURES = int(os.getenv("OPENAI_BREAKER_FAILURES", 5))
+OPENAI_BREAKER_RESET_SECONDS = float(os.getenv("OPENAI_BREAKER_RESET_SECONDS", 30))
+
+_LATENCY_WINDOW = 200
+_HEDGE_MIN_SAMPLES = 20
+
+
+def _openai():
+    # Import tardio: quando chega um erro da OpenAI o SDK já está carregado (custo zero)
+    import openai
+
+    return openai
+
+
+def _retryable_errors() -> tuple:
+    openai = _openai()
+    return (
+        asyncio.TimeoutError,
+        openai.APITimeoutError,
+        openai.APIConnectionError,
+        openai.RateLimitError,
+        openai.InternalServerError,
+    )
+
+
+class CircuitOpenError(Exception):
+    """
+    O provedor está falhando e o circuit breaker está aberto: a chamada nem é feita.
+    """
+
+
+def is_retryable(error: BaseException) -> bool:
+    if isinstance(error, _retryable_errors()):
+        return True
+    return isinstance(error, _openai().APIStatusError) and error.status_code in (408, 409)
+
+
+def _retry_after_seconds(error: BaseException) -> Optional[float]:
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker:
+    """
+    Fechado -> aberto após `failure_threshold` falhas seguidas; aberto por `reset_seconds`,
+    depois meio-aberto: uma única chamada de teste decide se fecha ou volta a abrir.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = OPENAI_BREAKER_FAILURES,
+        reset_seconds: float = OPENAI_BREAKER_RESET_SECONDS,
+        clock=time.monotonic,
+    ):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self._clock = clock
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_started = None
+        self.opens = 0
+        self.short_circuits = 0
+
+    def allow(self) -> bool:
+        now = self._clock()
+        if self.state == "open" and now - self.opened_at >= self.reset_seconds:
+            self.state = "half_open"
+            self._probe_started = None
+        if self.state == "half_open":
+            # Uma chamada de teste por vez (a que sumiu sem resultado é substituída)
+            if self._probe_started is not None and now - self._probe_started < self.reset_seconds:
+                return False
+            self._probe_started = now
+            return True
+        return self.state == "closed"
+
+    def check(self) -> None:
+        if not self.allow():
+            self.short_circuits += 1
+            raise CircuitOpenError("Circuit breaker da OpenAI aberto")
+
+    def record_success(self) -> None:
+        self.state = "closed"
+        self.failures = 0
+        self._probe_started = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == "half_open" or (self.state == "closed" and self.failures >= self.failure_threshold):
+            self.state = "open"
+            self.opened_at = self._clock()
+            self._probe_started = None
+            self.opens += 1
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "opens": self.opens,
+            "short_circuits": self.short_circuits,
+        }
+
+
+class ResilientCompletions:
+    """
+    Camada de resiliência das chamadas de completion: prazo por tentativa, novas tentativas
+    com backoff exponencial e jitter em erros transitórios, requisição hedge opcional após
+    o percentil de latência observado e circuit breaker. Cada tentativa ocupa um slot do
+    limite global de chamadas (FairLimiter), liberado durante o backoff.
+    """
+
+    def __init__(
+        self,
+        async_completions,
+        limiter: FairLimiter,
+        breaker: Optional[CircuitBreaker] = None,
+        timeout: float = OPENAI_TIMEOUT_SECONDS,
+        stream_idle_timeout: float = OPENAI_STREAM_IDLE_TIMEOUT_SECONDS,
+        max_retries: int = OPENAI_MAX_RETRIES,
+        retry_base_ms: float = OPENAI_RETRY_BASE_MS,
+        retry_max_ms: float = OPENAI_RETRY_MAX_MS,
+        hedge_enabled: bool = OPENAI_HEDGE_ENABLED,
+        hedge_percentile: float = OPENAI_HEDGE_PERCENTILE,
+        hedge_min_ms: float = OPENAI_HEDGE_MIN_MS,
+    ):
+        self.async_completions = async_completions
+        self.limiter = limiter
+        self.breaker = breaker or CircuitBreaker()
+        self.timeout = timeout
+        self.stream_idle_timeout = stream_idle_timeout
+        self.max_retries = max(0, max_retries)
+        self.retry_base_ms = retry_base_ms
+        self.retry_max_ms = retry_max_ms
+        self.hedge_enabled = hedge_enabled
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_ms = hedge_min_ms
+        self._latencies = deque(maxlen=_LATENCY_WINDOW)
+        self.calls = 0
+        self.attempts = 0
+        self.successes = 0
+        self.failures = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    # ------------------------------------------------------------------ chamadas
+
+    async def create(self, **kwargs):
+        """
+        Completion (sem streaming) com retries, hedge e circuit breaker.
+        Levanta CircuitOpenError se o breaker estiver aberto.
+        """
+        self.calls += 1
+        attempt = 0
+        while True:
+            self.breaker.check()
+            started = time.perf_counter()
+            try:
+                response = await self._attempt_with_hedge(kwargs)
+            except Exception as error:
+                delay = self._on_failure(error, attempt)
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            self._on_success(started)
+            return response
+
+    async def stream(self, **kwargs):
+        """
+        Completion em streaming. Retenta apenas antes do primeiro pedaço (depois disso o
+        texto já foi repassado ao cliente); o slot do limite fica ocupado até o fim do stream.
+        """
+        self.calls += 1
+        attempt = 0
+        while True:
+            self.breaker.check()
+            delay = None
+            async with self.limiter:
+                started = time.perf_counter()
+                stream = None
+                try:
+                    self.attempts += 1
+                    stream = await asyncio.wait_for(
+                        self.async_completions.create(stream=True, **kwargs), self.timeout
+                    )
+                    iterator = stream.__aiter__()
+                    remaining = max(0.0, self.timeout - (time.perf_counter() - started))
+                    first = await asyncio.wait_for(iterator.__anext__(), remaining)
+                except StopAsyncIteration:
+                    await stream.close()
+                    self._on_success(started)
+                    return
+                except Exception as error:
+                    if stream is not None:
+                        await stream.close()
+                    delay = self._on_failure(error, attempt)
+
+                if delay is None:
+                    try:
+                        yield first
+                        while True:
+                            try:
+                                chunk = await asyncio.wait_for(iterator.__anext__(), self.stream_idle_timeout)
+                            except StopAsyncIteration:
+                                break
+                            yield chunk
+                    except Exception as error:
+                        self._record_failure(error)
+                        raise
+                    finally:
+                        await stream.close()
+                    self._on_success(started)
+                    return
+
+            # Backoff fora do limite: o slot fica livre para outras conversas
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    # ------------------------------------------------------------------ internos
+
+    async def _call(self, kwargs: dict, acquired: bool = False):
+        if not acquired:
+            await self.limiter.acquire()
+        try:
+            self.attempts += 1
+            return await asyncio.wait_for(self.async_completions.create(**kwargs), self.timeout)
+        finally:
+            self.limiter.release()
+
+    async def _attempt_with_hedge(self, kwargs: dict):
+        hedge_delay = self._hedge_delay()
+        if hedge_delay is None:
+            return await self._call(kwargs)
+
+        primary = asyncio.ensure_future(self._call(kwargs))
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+            if done:
+                return primary.result()
+            # A cópia só sai se houver slot livre agora: hedge não entra na fila
+            if not self.limiter.try_acquire():
+                return await primary
+            self.hedges += 1
+            hedge = asyncio.ensure_future(self._call(kwargs, acquired=True))
+            tasks.add(hedge)
+            error = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def _hedge_delay(self) -> Optional[float]:
+        if not self.hedge_enabled or len(self._latencies) < _HEDGE_MIN_SAMPLES:
+            return None
+        return max(self.hedge_min_ms, self._percentile(self.hedge_percentile)) / 1000
+
+    def _on_success(self, started: float) -> None:
+        self.successes += 1
+        self._latencies.append((time.perf_counter() - started) * 1000)
+        self.breaker.record_success()
+
+    def _record_failure(self, error: BaseException) -> None:
+        self.failures += 1
+        if isinstance(error, asyncio.TimeoutError):
+            self.timeouts += 1
+        self.breaker.record_failure()
+
+    def _on_failure(self, error: Exception, attempt: int) -> float:
+        """
+        Contabiliza a falha e retorna o atraso antes da próxima tentativa
+        (ou relança o erro se ele não for transitório ou as tentativas acabaram).
+        """
+        if isinstance(error, ChatBusyError):
+            # Fila cheia é problema nosso, não do provedor
+            raise error
+        if not is_retryable(error):
+            # Erros do próprio pedido (400, 401...) não indicam provedor fora do ar
+            if isinstance(error, _openai().APIStatusError) and error.status_code < 500:
+                self.failures += 1
+            else:
+                self._record_failure(error)
+            raise error
+        self._record_failure(error)
+        if attempt >= self.max_retries:
+            raise error
+        self.retries += 1
+        # Backoff exponencial com "full jitter"; respeita o Retry-After do 429
+        cap = min(self.retry_max_ms, self.retry_base_ms * (2 ** attempt))
+        delay = random.uniform(0, cap) / 1000
+        retry_after = _retry_after_seconds(error)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.retry_max_ms / 1000))
+        return delay
+
+    def _percentile(self, percentile: float) -> float:
+        ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * percentile / 100))
+        return ordered[index]
+
+    def stats(self) -> dict:
+        latency = {}
+        if self._latencies:
+            latency = {f"p{p}_ms": round(self._percentile(p), 1) for p in (50, 95, 99)}
+        return {
+            "calls": self.calls,
+            "attempts": self.attempts,
+            "successes": self.successes,
+            "failures": self.failures,
+            "retries": self.retries,
+            "timeouts": self.timeouts,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "breaker": self.breaker.stats(),
+            **latency,
+        }
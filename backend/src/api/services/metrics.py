@@ -0,0 +1,247 @@
+import asyncio
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+load_dotenv()
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+
+# Limites (segundos) dos histogramas: de consultas ao banco (sub-ms) a completions longas
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Escopo ASGI do pedido em andamento: a rota (template, ex. /leads/{lead_id}/mensagens)
+# só é conhecida depois do roteamento, então guardamos o escopo e lemos a rota na hora
+# de registrar a chamada externa ou a consulta
+_current_scope: ContextVar[Optional[dict]] = ContextVar("metrics_scope", default=None)
+
+_NO_ROUTE = "-"
+_UNMATCHED = "unmatched"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labelnames: tuple = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: tuple = (), amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_number(value)}")
+        return lines
+
+
+class Histogram:
+    """
+    Histograma no formato do Prometheus. Cada série guarda a contagem por faixa (não
+    acumulada: uma busca binária e um incremento por observação); as faixas acumuladas
+    `le` só são montadas ao gerar o texto do /metrics.
+    """
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, labels: tuple = ()) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # [contagens por faixa..., +Inf, soma]
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self._series.items())
+        for labels, series in items:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), series[:-1]):
+                cumulative += count
+                le = _format_labels(self.labelnames, labels, f'le="{_format_number(float(bound))}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_number(series[-1])}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self, enabled: bool = METRICS_ENABLED):
+        self.enabled = enabled
+        self._metrics = []
+        self.http_requests = self.register(Counter(
+            "http_requests_total", "Pedidos HTTP por rota, método e status.", ("method", "route", "status"),
+        ))
+        self.http_duration = self.register(Histogram(
+            "http_request_duration_seconds", "Duração dos pedidos HTTP (até o fim da resposta).", ("method", "route"),
+        ))
+        self.external_duration = self.register(Histogram(
+            "external_call_duration_seconds",
+            "Duração das chamadas a serviços externos (OpenAI, Google STT/TTS, ffmpeg) por rota.",
+            ("dependency", "operation", "outcome", "route"),
+        ))
+        self.db_duration = self.register(Histogram(
+            "db_query_duration_seconds", "Duração das consultas ao banco por tipo de comando e rota.",
+            ("operation", "route"),
+        ))
+        self.db_errors = self.register(Counter(
+            "db_query_errors_total", "Consultas ao banco que falharam.", ("operation", "route"),
+        ))
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float) -> None:
+        self.http_requests.inc((method, route, str(status)))
+        self.http_duration.observe(seconds, (method, route))
+
+    @contextmanager
+    def external_call(self, dependency: str, operation: str):
+        """
+        Mede uma chamada externa: `with metrics.external_call("openai", "chat.completions"):`.
+        O resultado (ok/error/cancelled) e a rota do pedido em andamento viram labels.
+        """
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        outcome = "ok"
+        try:
+            yield
+        except asyncio.CancelledError:
+            # Tentativa abandonada (prazo, hedge já respondido, cliente desconectou)
+            outcome = "cancelled"
+            raise
+        except BaseException:
+            outcome = "error"
+            raise
+        finally:
+            self.external_duration.observe(
+                time.perf_counter() - started, (dependency, operation, outcome, current_route())
+            )
+
+
+metrics = MetricsRegistry()
+
+
+def current_route() -> str:
+    scope = _current_scope.get()
+    if scope is None:
+        return _NO_ROUTE
+    route = scope.get("route")
+    return getattr(route, "path", None) or _UNMATCHED
+
+
+class MetricsMiddleware:
+    """
+    Duração e contagem de pedidos por rota (template da rota, não a URL, para não criar
+    uma série por id). Também deixa o escopo do pedido disponível para as métricas de
+    chamadas externas e de banco feitas durante ele. ASGI puro.
+    """
+
+    def __init__(self, app: ASGIApp, registry: MetricsRegistry = metrics):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not self.registry.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+        token = _current_scope.set(scope)
+
+        async def send_measured(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_measured)
+        finally:
+            route = scope.get("route")
+            self.registry.observe_request(
+                scope["method"], getattr(route, "path", None) or _UNMATCHED, status, time.perf_counter() - started
+            )
+            _current_scope.reset(token)
+
+
+# Consultas SQL de qualquer engine: duração por tipo de comando (select, insert, ...)
+_SQL_OPERATIONS = {"select", "insert", "update", "delete", "with", "begin", "commit", "rollback"}
+
+
+def _sql_operation(statement: str) -> str:
+    head = statement.lstrip()[:8].split(None, 1)
+    operation = head[0].lower() if head else ""
+    return operation if operation in _SQL_OPERATIONS else "other"
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _query_started(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_started = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _query_finished(conn, cursor, statement, parameters, context, executemany):
+    if metrics.enabled:
+        metrics.db_duration.observe(
+            time.perf_counter() - context._metrics_started, (_sql_operation(statement), current_route())
+        )
+
+
+@event.listens_for(Engine, "handle_error")
+def _query_failed(context):
+    if metrics.enabled and context.statement is not None:
+        metrics.db_errors.inc((_sql_operation(context.statement), current_route()))
@@ -1,317 +1,433 @@
-import openai
+import asyncio
+import logging
 import os
-import re
-import json
-import uuid
 from typing import Optional
 
 from dotenv import load_dotenv
 from sqlalchemy.orm import Session
 
 from src.api.db.database import get_db
+from src.api.services.lead_service import (
+    save_or_update_lead, append_transcript, ORIGEM_USUARIO, ORIGEM_BOT
+)
+from src.api.services.lead_writer import lead_writer
+from src.api.services.usage_counters import usage_counters, BYTES_PER_MB
+from src.api.services.metrics import metrics
+from src.api.services.response_parser import parse_model_response, HANDOFF_MESSAGE
+from src.api.services.response_cache import response_cache
+from src.api.services.prompts import get_system_prompt, state_key, sector_key
+from src.api.services.history_manager import history_manager, CHAT_SUMMARY_MODEL
+from src.api.services.stream_filter import LeadBlockStreamFilter
+from src.api.services.session_store import ROLE_USER, ROLE_ASSISTANT
+from src.api.services.session_backends import session_backend
+from src.api.services.chat_concurrency import (
+    ChatBusyError, llm_limiter, turn_locks, idempotency_cache
+)
+from src.api.services.providers import providers
+from src.api.services.llm_resilience import ResilientCompletions, CircuitOpenError
 
 
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+OPENAI_CHAT_MODEL = os.getenv("OPENAI_CHAT_MODEL", "gpt-4")
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", 100))
+# Gravação do lead/mensagens do chat em segundo plano (fila write-behind)
+LEAD_WRITE_BEHIND = os.getenv("LEAD_WRITE_BEHIND", "1") != "0"
+
+# Resposta enviada ao cliente quando a OpenAI falha (os detalhes vão só para o log)
+FALLBACK_MESSAGE = "Desculpe, estou com dificuldade para responder agora. Poderia tentar novamente em instantes?"
+
+logger = logging.getLogger(__name__)
+
+
+def _create_async_client():
+    # Import tardio: o SDK da OpenAI só é carregado na primeira completion (ou no warm-up)
+    import httpx
+    import openai
+
+    # Cliente assíncrono com um único pool de conexões HTTP compartilhado (keep-alive),
+    # para manter dezenas de completions em paralelo no mesmo worker
+    return openai.AsyncOpenAI(
+        api_key=OPENAI_API_KEY,
+        # Novas tentativas, prazos e circuit breaker ficam em `completions` (llm_resilience.py)
+        max_retries=0,
+        http_client=httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=OPENAI_MAX_CONNECTIONS,
+            ),
+            timeout=httpx.Timeout(600.0, connect=5.0),
+        ),
+    )
+
+
+providers.register("openai_async", _create_async_client)
+
+
+class _ProviderCompletions:
+    """
+    `chat.completions` do cliente registrado em `providers`, resolvido a cada chamada
+    (o cliente é criado na primeira). Cada tentativa entra na métrica
+    external_call_duration_seconds; em streaming mede até a abertura do stream.
+    """
+
+    def __init__(self, provider: str):
+        self.provider = provider
+
+    async def create(self, **kwargs):
+        client = providers.get(self.provider)
+        operation = "chat.completions.stream" if kwargs.get("stream") else "chat.completions"
+        with metrics.external_call("openai", operation):
+            return await client.chat.completions.create(**kwargs)
+
 
-# Inicializa o cliente da OpenAI
-client = openai.OpenAI(api_key=OPENAI_API_KEY)
-
-# Estrutura na memória para armazenar o histórico da conversa e dados do lead
-# Formato:
-# {
-#   "session_id": {
-#       "history": [
-#           {"role": "assistant", "content": "..."},
-#           {"role": "user", "content": "..."},
-#       ],
-#       "lead_data": {
-#           "nome": None,
-#           "email": None,
-#           "telefone": None,
-#           "empresa": None,
-#           "setor": None,
-#           "interesse": None,
-#           "mensagem": None,
-#           "origem": "website"
-#       },
-#       "state": "INICIANTE"  # Exemplo de máquina de estados simples
-#   }
-# }
-conversation_sessions = {}
+# Todas as completions passam pela camada de resiliência e pelo limite global de chamadas
+completions = ResilientCompletions(_ProviderCompletions("openai_async"), llm_limiter)
+
+# Sessões do chat (histórico, dados do lead e estado) ficam no `session_backend`
+# configurado em SESSION_BACKEND: em memória (LRU/TTL, um processo), SQLite (workers
+# do mesmo host) ou servidor chave-valor externo.
+# Ver src/api/services/session_store.py e src/api/services/session_backends.py
 
 def get_stateful_system_prompt(current_state: str, lead_data: dict) -> str:
     """
-    Exemplo de função para gerar o system_prompt dinamicamente 
-    de acordo com o 'estado' do usuário e/ou dados do lead.
-    Para manter simples, vamos usar apenas variações leves. 
-    Se quiser algo mais avançado, pode expandir as condições.
+    Retorna o system_prompt de acordo com o 'estado' do usuário e o setor do lead.
+    As variantes são montadas uma única vez no registro de prompts (src/api/services/prompts.py).
+    """
+    return get_system_prompt(state_key(current_state), sector_key(lead_data.get("setor")))
+
+
+async def _load_session(session_id: Optional[str]):
+    """
+    Carrega (ou cria) a sessão sem bloquear o event loop quando o backend faz I/O.
+    """
+    if session_backend.blocking:
+        return await asyncio.to_thread(session_backend.get_or_create, session_id)
+    return session_backend.get_or_create(session_id)
+
+
+def _build_messages(session, user_message: str) -> list:
+    """
+    Monta a lista de mensagens para a OpenAI: system_prompt + resumo/janela do histórico
+    (dentro do orçamento de tokens) + nova mensagem.
+    """
+    # Definir o system_prompt com base no estado e possíveis dados do lead
+    system_prompt = get_stateful_system_prompt(session.state, session.lead_data)
+
+    messages_for_openai = [{"role": "system", "content": system_prompt}] + history_manager.context(session)
+    messages_for_openai.append({"role": "user", "content": user_message})
+    return messages_for_openai
+
+
+async def _fold_history_async(session) -> None:
+    upto = history_manager.plan_fold(session)
+    if upto is None:
+        return
+    try:
+        response = await completions.create(
+            model=CHAT_SUMMARY_MODEL,
+            messages=history_manager.summary_messages(session, upto),
+            temperature=0.3,
+            max_tokens=300
+        )
+        history_manager.apply_fold(session, upto, response.choices[0].message.content)
+    except Exception:
+        # Sem o resumo o turno segue com o histórico completo; tenta de novo no próximo
+        logger.warning("Falha ao resumir o histórico da sessão %s", session.session_id, exc_info=True)
+
+
+def _replayed_turn(session, request_id: Optional[str]) -> Optional[dict]:
+    """
+    Se o pedido é um reenvio do último turno já processado (mesma chave de idempotência,
+    possivelmente vindo de outro worker), devolve a resposta guardada na sessão.
+    """
+    if request_id and session.last_request_id == request_id:
+        return {"response": session.last_reply, "session_id": session.session_id}
+    return None
+
+
+def _finish_turn(
+    session, user_message: str, ai_full_response: str, db: Session, request_id: Optional[str] = None
+) -> dict:
+    """
+    Pós-processa a resposta do modelo: atualiza o histórico, extrai o JSON do lead,
+    salva o lead e retorna a resposta limpa. `request_id` é a chave de idempotência
+    do pedido, guardada na sessão junto com a resposta.
+    """
+    session_id = session.session_id
+    current_lead_data = session.lead_data
+
+    # 1) Guardar a mensagem do usuário no histórico
+    session_backend.append_message(session, ROLE_USER, user_message)
+
+    # 2) Pós-processar a resposta em uma única passada (JSON do lead, transferência, limpeza)
+    parsed = parse_model_response(ai_full_response)
+
+    # Se o usuário quer falar com atendente, registra o turno e retorna imediatamente
+    if parsed.handoff:
+        session_backend.append_message(session, ROLE_ASSISTANT, ai_full_response)
+        _persist_turn(db, session, user_message, HANDOFF_MESSAGE)
+        session.last_request_id, session.last_reply = request_id, HANDOFF_MESSAGE
+        session_backend.save(session)
+        return {
+            "response": HANDOFF_MESSAGE,
+            "session_id": session_id
+        }
+
+    # 3) Não mostrar nada sobre JSON pro usuário: o histórico guarda a resposta limpa
+    session_backend.append_message(session, ROLE_ASSISTANT, parsed.reply)
+
+    # 4) Atualizar somente os campos do lead que não sejam None
+    parsed_lead_data = parsed.lead_data
+    if parsed_lead_data:
+        for field, value in parsed_lead_data.items():
+            if value is not None:
+                current_lead_data[field] = value
+
+    # -------------- Exemplo de mudança de estado (opcional) --------------
+    # Pode analisar a mensagem do usuário para definir transição de estado:
+    # Se o user_message contiver algo como "Já uso IA", podemos avançar o estado:
+    if "já uso IA" in user_message.lower():
+        session.state = "AVANCADO"
+    # Aqui podemos implementar outras lógicas para trocar estados.
+
+    # 5) Salvar ou atualizar o lead e acrescentar o turno ao histórico persistido
+    _persist_turn(db, session, user_message, parsed.reply)
+    session.last_request_id, session.last_reply = request_id, parsed.reply
+    session_backend.save(session)
+
+    # 6) Retornar a resposta limpa (sem JSON e sem backticks)
+    return {
+        "response": parsed.reply,
+        "session_id": session_id
+    }
+
+
+def _persist_turn(db: Session, session, user_message: str, reply: str) -> None:
+    """
+    Salva o snapshot do lead e o turno (mensagem do usuário + resposta) como linhas
+    novas em `mensagens`. Por padrão vai para a fila write-behind e a resposta do chat
+    não espera o banco; com LEAD_WRITE_BEHIND=0 grava na hora, na sessão `db`.
+    O turno também entra nos contadores mensais (usage_counters).
     """
-    # Este é o prompt principal do 'Ricardo Nogueira', personalizado.
-    # Podemos fazer pequenas variações se o estado for, por exemplo, 'INICIANTE', 'AVANCADO', etc.
-
-    base_prompt = (
-        "Você é **Ricardo Nogueira**, um assistente virtual da **People Change AI Consulting**, "
-        "com um **tom natural e conversacional**, que fala com proximidade e empatia, sem parecer um robô.\n\n"
-
-        "Sua missão é:\n"
-        "1. **Entender as dores do cliente** e o contexto da empresa, criando conexão humana e demonstrando real interesse.\n"
-        "2. **Explicar como a IA pode ajudar**, focando nos benefícios e nos ganhos práticos, porém sem revelar todos os detalhes técnicos. "
-        "Manter a conversa no nível de 'café', informal, mas respeitoso e sem parecer amador.\n"
-        "3. **Destacar a filosofia** da People Change AI Consulting — a IA existe para **complementar** e **potencializar** o trabalho humano, e não para substituí-lo. "
-        "É uma tecnologia acessível, humanizada, ética e transparente.\n"
-        "4. **Gerar curiosidade** e desejo de saber mais, sem entregar toda a solução. "
-        "No máximo, sugerir alguns exemplos gerais e cases, mas sempre sem aprofundar em produtos específicos.\n"
-        "5. **Manter o tom humano, acolhedor, com humor leve** quando oportuno, validando as preocupações e reconhecendo que cada negócio é único.\n"
-        "6. **Coletar dados de contato** (nome, e-mail, telefone), mas **discretamente**, convidando o cliente a receber mais informações ou agendar uma conversa. "
-        "Se algum dado já tiver sido coletado, não pedir novamente. Se o cliente recusar, respeitar e continuar a conversa, mas tentar novamente depois.\n"
-        "7. **Retornar, ao final de cada resposta**, um bloco JSON (de forma invisível ao usuário) com a estrutura:\n"
-        "```\n"
-        "{\n"
-        "  \"nome\": <string ou null>,\n"
-        "  \"email\": <string ou null>,\n"
-        "  \"telefone\": <string ou null>,\n"
-        "  \"empresa\": <string ou null>,\n"
-        "  \"setor\": <string ou null>,\n"
-        "  \"interesse\": <string ou null>,\n"
-        "  \"mensagem\": <string ou null>,\n"
-        "  \"origem\": <string ou null>\n"
-        "}\n"
-        "```\n"
-        "   - Caso ainda não tenha algum campo, use `null`.\n"
-        "   - **Não** mostre esse JSON ao usuário e **não** comente que está coletando dados.\n"
-        "   - Se o usuário **explicitamente** pedir para falar com um atendente humano, responda **apenas**:\n"
-        "     `Entendido, um de nossos assistentes irá falar com você o mais breve possível!`\n"
-        "\n"
-        "## Estilo de Comunicação (Ricardo Nogueira)\n"
-        "- **Tom de Voz**: Próximo, envolvente, **natural e conversacional** — como se estivesse realmente presente em um bate-papo.\n"
-        "- **Pausas Naturais**: Use recursos como '(pausa breve)' para humanizar o ritmo e indicar reflexão.\n"
-        "- **Empatia e Calor Humano**: Conecte-se às dúvidas e inseguranças do visitante, validando-as sem soar condescendente. "
-        "Demonstre leveza e humor sutil quando couber.\n"
-        "- **Nunca Parecer Um Script**: Evitar repetições mecânicas e transições bruscas. Variar expressões e reações.\n"
-        "\n"
-        "## Mindset de IA Humanizada — People Change AI Consulting\n"
-        "1. **A IA liberta as pessoas** de tarefas repetitivas, não substitui o talento humano.\n"
-        "2. **Qualquer empresa pode se beneficiar** da IA, sem grandes investimentos iniciais.\n"
-        "3. **A tecnologia deve ser transparente e confiável**, garantindo a ética e a segurança dos dados.\n"
-        "4. **A inovação é um meio**, não um fim — o foco é resolver problemas e melhorar processos, trazendo ganhos tangíveis ao dia a dia.\n"
-        "\n"
-        "## Estratégia de Conversa\n"
-        "1. **Começar pelas dores** do visitante\n"
-        "   - Perguntar: “Qual a maior dificuldade no dia a dia?”, “Em que área a equipe perde mais tempo?”, "
-        "“Qual a principal prioridade do momento?”\n"
-        "   - Validar com empatia: “Entendo perfeitamente... faz sentido estar preocupado com isso.”\n"
-        "\n"
-        "2. **Focar nos Benefícios**\n"
-        "   - Mostrar como a IA **pode resolver problemas**, mas sem entrar em detalhes profundos de como funciona tecnicamente.\n"
-        "   - Ressaltar: a IA **não substitui** pessoas, **otimiza** tarefas manuais.\n"
-        "\n"
-        "3. **Criar Curiosidade**\n"
-        "   - Não entregar uma solução definitiva; sugerir que há diversos caminhos possíveis.\n"
-        "   - Convidar o usuário para avançar em uma conversa mais detalhada.\n"
-        "\n"
-        "4. **Pedir Contato**\n"
-        "   - De forma cordial e discreta: 'Posso enviar algumas ideias por e-mail?', 'Tem algum número para conversarmos quando for mais conveniente?'\n"
-        "   - Se o usuário não fornecer, não forçar — mas tentar novamente em outro momento.\n"
-        "\n"
-        "5. **Humano Até o Fim**\n"
-        "   - Em caso de objeções, responder de forma tranquilizadora e realista, enfatizando a abordagem humanizada.\n"
-        "   - Reforçar que a IA é uma ferramenta para liberar tempo, não para eliminar pessoas.\n"
-        "\n"
-        "## Coleta de Dados e Retorno em JSON\n"
-        "- **A cada resposta**, inclua **internamente** no final um JSON com as chaves:\n"
-        "  - 'nome', 'email', 'telefone', 'empresa', 'setor', 'interesse', 'mensagem', 'origem'.\n"
-        "- Se o chatbot não tiver algumas dessas informações, use `null`.\n"
-        "- **Não** exibir nem mencionar esse JSON ao usuário.\n"
-        "- Se ainda faltarem dados importantes (ex.: e-mail ou telefone), pergunte de forma **natural**.\n"
-        "- Se o usuário disser que **quer falar diretamente com um atendente**, responder **exclusivamente**:\n"
-        "  `Entendido, um de nossos assistentes irá falar com você o mais breve possível!`\n"
-        "\n"
-        "Boa conversa, Ricardo Nogueira!"
+    turns = [(ORIGEM_USUARIO, user_message), (ORIGEM_BOT, reply)]
+    canal = session.lead_data.get("origem")
+    usage_counters.increment(
+        interacoes_chatbot=1,
+        mensagens_enviadas=1,
+        armazenamento_mb=sum(len(conteudo.encode("utf-8")) for _, conteudo in turns) / BYTES_PER_MB
     )
+    if LEAD_WRITE_BEHIND:
+        lead_writer.enqueue(session.session_id, session.lead_data, turns, canal)
+        return
 
-    # Aqui poderíamos condicionar variações, se quiséssemos (ex.: INICIANTE, AVANCADO, etc.)
-    # Exemplo bem simples (pode personalizar):
-    if current_state == "INICIANTE":
-        base_prompt += "\n\nObservação: O usuário parece iniciante, explique de forma ainda mais simples.\n"
-    elif current_state == "AVANCADO":
-        base_prompt += "\n\nObservação: O usuário já conhece um pouco de IA, pode ir mais direto ao ponto.\n"
-    # Se quiser mais estados, basta adicionar.
+    lead = save_or_update_lead(db, session.session_id, session.lead_data)
+    append_transcript(db, lead.id, turns, canal)
+    db.commit()
 
-    # Se quisermos usar o setor da empresa (caso conhecido), poderíamos inserir:
-    setor = lead_data.get("setor")
-    if setor and setor.lower() == "contabilidade":
-        base_prompt += "\n\nObservação adicional: O usuário atua em contabilidade. Cite exemplos de IA nessa área quando pertinente.\n"
 
-    return base_prompt
+def _error_response(session_id: str, error: Exception) -> dict:
+    """
+    Resposta padrão quando a completion falha: o cliente recebe uma mensagem fixa e os
+    detalhes da exceção vão para o log. Com o circuit breaker aberto nem há chamada.
+    """
+    if not isinstance(error, CircuitOpenError):
+        logger.error("Falha no chat da sessão %s: %r", session_id, error)
+    return {
+        "response": FALLBACK_MESSAGE,
+        "session_id": session_id,
+        "error": True
+    }
 
 
-def chat_with_openai(
+async def chat_with_openai_async(
     user_message: str,
     db: Session,
-    session_id: Optional[str] = None
+    session_id: Optional[str] = None,
+    idempotency_key: Optional[str] = None
 ) -> dict:
     """
     Conversa com a OpenAI, mantendo um histórico no backend, indexado por `session_id`.
     Se `session_id` for None, gera um novo. Se já existir, carrega o histórico e continua a conversa.
-    
+    Usa o cliente assíncrono da OpenAI (com pool de conexões compartilhado) e executa o
+    trabalho de banco de dados em uma thread, sem bloquear o event loop.
+
     Retorna um dicionário:
     {
       "response": <string da resposta da IA (sem JSON)>,
       "session_id": <string do id da sessão>
     }
+
+    Turnos da mesma sessão são executados em ordem; um reenvio com a mesma
+    `idempotency_key` recebe a resposta já calculada. Levanta ChatBusyError se a fila
+    de chamadas à OpenAI estiver cheia ou a sessão continuar ocupada.
     """
-    global conversation_sessions
-
-    # 1) Se o caller não fornecer um session_id, criamos um novo
-    if not session_id:
-        session_id = str(uuid.uuid4())  # Cria um UUID para identificar a conversa
-        conversation_sessions[session_id] = {
-            "history": [],
-            "lead_data": {
-                "nome": None,
-                "email": None,
-                "telefone": None,
-                "empresa": None,
-                "setor": None,
-                "interesse": None,
-                "mensagem": None,
-                "origem": "website"
-            },
-            "state": "INICIANTE"  # Estado inicial
-        }
-    else:
-        # Se não existir ainda, inicia vazio com default
-        if session_id not in conversation_sessions:
-            conversation_sessions[session_id] = {
-                "history": [],
-                "lead_data": {
-                    "nome": None,
-                    "email": None,
-                    "telefone": None,
-                    "empresa": None,
-                    "setor": None,
-                    "interesse": None,
-                    "mensagem": None,
-                    "origem": "website"
-                },
-                "state": "INICIANTE"
-            }
-
-    # 2) Obter o histórico e dados atuais
-    conversation_history = conversation_sessions[session_id]["history"]
-    current_lead_data = conversation_sessions[session_id]["lead_data"]
-    current_state = conversation_sessions[session_id]["state"]
-
-    # 3) Definir o system_prompt com base no estado e possíveis dados do lead
-    system_prompt = get_stateful_system_prompt(current_state, current_lead_data)
-
-    # 4) Montar a lista de mensagens para a OpenAI (system_prompt + histórico + nova mensagem)
-    messages_for_openai = [{"role": "system", "content": system_prompt}] + conversation_history
-    messages_for_openai.append({"role": "user", "content": user_message})
+    return await idempotency_cache.run(
+        idempotency_cache.scope(session_id, idempotency_key),
+        lambda: _chat_turn_async(user_message, db, session_id, idempotency_key)
+    )
+
 
+async def _chat_turn_async(
+    user_message: str,
+    db: Session,
+    session_id: Optional[str],
+    idempotency_key: Optional[str]
+) -> dict:
+    async with turn_locks.hold(session_id):
+        session = await _load_session(session_id)
+        replay = _replayed_turn(session, idempotency_key)
+        if replay is not None:
+            return replay
+
+        await _fold_history_async(session)
+        messages_for_openai = _build_messages(session, user_message)
+
+        cache_key = response_cache.key_for(session, user_message)
+
+        try:
+            ai_full_response = response_cache.get(cache_key)
+            if ai_full_response is None:
+                response = await completions.create(
+                    model=OPENAI_CHAT_MODEL,
+                    messages=messages_for_openai,
+                    temperature=0.7,
+                    max_tokens=1000
+                )
+                ai_full_response = response.choices[0].message.content
+                response_cache.put(cache_key, ai_full_response)
+            return await asyncio.to_thread(
+                _finish_turn, session, user_message, ai_full_response, db, idempotency_key
+            )
+
+        except ChatBusyError:
+            raise
+        except Exception as e:
+            return _error_response(session.session_id, e)
+
+
+async def stream_chat_with_openai(
+    user_message: str,
+    db: Session,
+    session_id: Optional[str] = None,
+    idempotency_key: Optional[str] = None
+):
+    """
+    Versão em streaming de `chat_with_openai_async`. Gera eventos (dicts):
+      {"type": "session", "session_id": ...}            -> logo no início
+      {"type": "delta", "text": ...}                    -> pedaços da resposta, sem o JSON do lead
+      {"type": "done", "response": ..., "session_id": ..., "handoff": bool}
+      {"type": "error", "response": ..., "session_id": ..., "busy": bool}
+    A atualização dos dados do lead é aplicada quando o stream termina. Um reenvio com a
+    mesma `idempotency_key` recebe a resposta já calculada de uma vez só.
+    """
+    scope = idempotency_cache.scope(session_id, idempotency_key)
+    if scope is not None:
+        pending = idempotency_cache.claim(scope)
+        if pending is not None:
+            try:
+                result = await asyncio.shield(pending)
+            except ChatBusyError as e:
+                yield {"type": "error", "response": str(e), "session_id": session_id, "busy": True}
+                return
+            async for event in _replay_events(result):
+                yield event
+            return
+
+    result = None
     try:
-        # 5) Chamar GPT
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=messages_for_openai,
-            temperature=0.7,
-            max_tokens=1000  # aumentado para evitar cortes
-        )
-        ai_full_response = response.choices[0].message.content
-
-        # 6) Guardar no histórico: usuário e resposta do assistente
-        conversation_history.append({"role": "user", "content": user_message})
-        conversation_history.append({"role": "assistant", "content": ai_full_response})
-
-        # 7) Se o usuário quer falar com atendente, retorna imediatamente
-        if "Entendido, um de nossos assistentes irá falar com você o mais breve possível!" in ai_full_response:
-            return {
-                "response": "Entendido, um de nossos assistentes irá falar com você o mais breve possível!",
-                "session_id": session_id
-            }
-
-        # 8) Extrair e remover o bloco JSON (com ou sem backticks) e limpar a resposta
-        extracted_json = None
-        ai_response_without_json = ai_full_response
-
-        # Regex para pegar bloco em triple backticks
-        pattern = re.compile(r"```(?:json)?\s*(\{.*?\})\s*```", re.DOTALL | re.IGNORECASE)
-        match = pattern.search(ai_full_response)
-        if match:
-            extracted_json = match.group(1).strip()
-            ai_response_without_json = ai_full_response.replace(match.group(0), "")
-        else:
-            # Padrão alternativo, caso não esteja formatado em bloco
-            pattern_alt = re.compile(r"\{\s*\"nome\".*?\}", re.DOTALL)
-            match_alt = pattern_alt.search(ai_full_response)
-            if match_alt:
-                extracted_json = match_alt.group(0)
-                ai_response_without_json = ai_full_response.replace(extracted_json, "")
-
-        # Remover ocorrências isoladas da palavra "json"
-        ai_response_without_json = re.sub(r"\bjson\b", "", ai_response_without_json, flags=re.IGNORECASE)
-
-        # 9) Armazenar toda a conversa no campo "mensagem" do lead
-        conversation_text = "\n".join([f"{msg['role']}: {msg['content']}" for msg in conversation_history])
-
-        # Tentar parsear o JSON extraído
-        if extracted_json:
-            parsed_lead_data = parse_lead_json(extracted_json)
-            if parsed_lead_data:
-                # Atualizar somente os campos que não sejam None
-                for field, value in parsed_lead_data.items():
-                    if value is not None:
-                        current_lead_data[field] = value
-
-        # Atualizar o campo "mensagem" no lead_data
-        current_lead_data["mensagem"] = conversation_text
-
-        # -------------- Exemplo de mudança de estado (opcional) --------------
-        # Pode analisar a mensagem do usuário para definir transição de estado:
-        # Se o user_message contiver algo como "Já uso IA", podemos avançar o estado:
-        if "já uso IA" in user_message.lower():
-            conversation_sessions[session_id]["state"] = "AVANCADO"
-        # Aqui podemos implementar outras lógicas para trocar estados.
-
-        # 10) Salvar ou atualizar o lead no banco de dados
-        lead, msg = save_or_update_lead(db, current_lead_data)
-
-        # Não mostrar nada sobre JSON pro usuário
-        conversation_history[-1]["content"] = ai_response_without_json.strip()
-
-        # 11) Retornar a resposta limpa (sem JSON e sem backticks)
-        return {
-            "response": ai_response_without_json.strip(),
-            "session_id": session_id
-        }
+        async with turn_locks.hold(session_id):
+            session = await _load_session(session_id)
+            replay = _replayed_turn(session, idempotency_key)
+            if replay is not None:
+                async for event in _replay_events(replay):
+                    yield event
+                idempotency_cache.complete(scope, replay)
+                return
+
+            await _fold_history_async(session)
+            messages_for_openai = _build_messages(session, user_message)
+            yield {"type": "session", "session_id": session.session_id}
+
+            stream_filter = LeadBlockStreamFilter()
+            cache_key = response_cache.key_for(session, user_message)
+            try:
+                cached = response_cache.get(cache_key)
+                if cached is not None:
+                    text = stream_filter.feed(cached)
+                    if text:
+                        yield {"type": "delta", "text": text}
+                else:
+                    async for chunk in completions.stream(
+                        model=OPENAI_CHAT_MODEL,
+                        messages=messages_for_openai,
+                        temperature=0.7,
+                        max_tokens=1000
+                    ):
+                        if not chunk.choices:
+                            continue
+                        text = stream_filter.feed(chunk.choices[0].delta.content or "")
+                        if text:
+                            yield {"type": "delta", "text": text}
+
+                ai_full_response = stream_filter.full_text
+                if cached is None:
+                    response_cache.put(cache_key, ai_full_response)
+                result = await asyncio.to_thread(
+                    _finish_turn, session, user_message, ai_full_response, db, idempotency_key
+                )
+
+                # Envia o texto legítimo que tenha ficado retido por precaução
+                tail = stream_filter.tail(result["response"])
+                if tail:
+                    yield {"type": "delta", "text": tail}
+
+                yield {
+                    "type": "done",
+                    "response": result["response"],
+                    "session_id": result["session_id"],
+                    "handoff": result["response"] == HANDOFF_MESSAGE
+                }
+
+            except ChatBusyError:
+                raise
+            except Exception as e:
+                result = _error_response(session.session_id, e)
+                yield {"type": "error", "response": result["response"], "session_id": result["session_id"], "busy": False}
+
+    except ChatBusyError as e:
+        idempotency_cache.fail(scope, e)
+        yield {"type": "error", "response": str(e), "session_id": session_id, "busy": True}
+    except BaseException as e:
+        # Cliente desconectou no meio do stream: reenvios voltam a tentar
+        idempotency_cache.fail(scope, e)
+        raise
+    else:
+        idempotency_cache.complete(scope, result)
 
-    except Exception as e:
-        # Em caso de exceção, logar ou retornar algo genérico
-        return {
-            "response": f"Desculpe, ocorreu um erro interno. Poderia tentar novamente mais tarde?\nDetalhes: {str(e)}",
-            "session_id": session_id
+
+async def _replay_events(result: dict):
+    """
+    Eventos de stream para uma resposta já calculada (reenvio idempotente).
+    """
+    event_type = "error" if result.get("error") else "done"
+    yield {"type": "session", "session_id": result["session_id"]}
+    if event_type == "done":
+        yield {"type": "delta", "text": result["response"]}
+        yield {
+            "type": "done",
+            "response": result["response"],
+            "session_id": result["session_id"],
+            "handoff": result["response"] == HANDOFF_MESSAGE
         }
+    else:
+        yield {"type": "error", "response": result["response"], "session_id": result["session_id"], "busy": False}
 
 
-def parse_lead_json(json_block: Optional[str]) -> Optional[dict]:
+async def close_async_client() -> None:
     """
-    Converte o bloco JSON para dicionário. Se não houver ou falhar, retorna None.
+    Fecha o pool de conexões HTTP do cliente assíncrono (chamado no shutdown da aplicação).
     """
-    if not json_block:
-        return None
-
-    try:
-        data = json.loads(json_block)
-        return {
-            "nome": data.get("nome"),
-            "email": data.get("email"),
-            "telefone": data.get("telefone"),
-            "empresa": data.get("empresa"),
-            "setor": data.get("setor"),
-            "interesse": data.get("interesse"),
-            "mensagem": data.get("mensagem"),
-            "origem": data.get("origem"),
-        }
-    except json.JSONDecodeError:
-        return None
+    async_client = providers.peek("openai_async")
+    if async_client is not None:
+        await async_client.close()
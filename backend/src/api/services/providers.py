@@ -0,0 +1,162 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+from dotenv import load_dotenv
+
+
+load_dotenv()
+
+# Depois de uma falha ao criar um cliente, quanto tempo esperar antes de tentar de novo
+PROVIDER_RETRY_SECONDS = float(os.getenv("PROVIDER_RETRY_SECONDS", 30))
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderUnavailableError(RuntimeError):
+    """
+    O serviço externo não pôde ser inicializado (sem credenciais, SDK com erro...).
+    Os endpoints que dependem dele respondem 503; o resto da API segue funcionando.
+    """
+
+
+class _Provider:
+    __slots__ = ("name", "factory", "optional", "instance", "error", "failed_at", "init_ms", "lock")
+
+    def __init__(self, name: str, factory, optional: bool):
+        self.name = name
+        self.factory = factory
+        self.optional = optional
+        self.instance = None
+        self.error = None
+        self.failed_at = 0.0
+        self.init_ms = None
+        self.lock = threading.Lock()
+
+
+class ProviderRegistry:
+    """
+    Clientes de serviços externos (OpenAI, Google Speech/Text-to-Speech...) criados sob
+    demanda: o SDK só é importado e o cliente só é construído no primeiro uso, uma vez
+    por processo. A subida da API não depende deles; um provedor opcional que falha
+    (ex.: voz sem credenciais do Google) só desativa os endpoints que o usam.
+    """
+
+    def __init__(self, retry_seconds: float = PROVIDER_RETRY_SECONDS):
+        self.retry_seconds = retry_seconds
+        self._providers = {}
+
+    def register(self, name: str, factory, optional: bool = False) -> None:
+        self._providers[name] = _Provider(name, factory, optional)
+
+    def get(self, name: str):
+        """
+        Retorna o cliente, criando-o na primeira chamada (pode bloquear: importa o SDK).
+        """
+        provider = self._providers[name]
+        if provider.instance is not None:
+            return provider.instance
+        with provider.lock:
+            if provider.instance is not None:
+                return provider.instance
+            if provider.error is not None and time.monotonic() - provider.failed_at < self.retry_seconds:
+                raise ProviderUnavailableError(f"{name} indisponível: {provider.error}")
+            started = time.perf_counter()
+            try:
+                instance = provider.factory()
+            except Exception as error:
+                provider.error = str(error) or type(error).__name__
+                provider.failed_at = time.monotonic()
+                log = logger.warning if provider.optional else logger.error
+                log("Provedor %s indisponível: %s", name, provider.error)
+                raise ProviderUnavailableError(f"{name} indisponível: {provider.error}") from error
+            provider.init_ms = round((time.perf_counter() - started) * 1000, 2)
+            provider.error = None
+            provider.instance = instance
+            return instance
+
+    async def aget(self, name: str):
+        """
+        Igual a `get`, mas a primeira criação (import do SDK, leitura de credenciais)
+        roda numa thread para não travar o event loop.
+        """
+        instance = self._providers[name].instance
+        if instance is not None:
+            return instance
+        return await asyncio.to_thread(self.get, name)
+
+    def peek(self, name: str):
+        """
+        O cliente se já foi criado, senão None (sem criar).
+        """
+        provider = self._providers.get(name)
+        return provider.instance if provider is not None else None
+
+    def warm_up(self, names: Optional[list] = None) -> None:
+        """
+        Cria os clientes antecipadamente (chamado em segundo plano após a subida),
+        para o primeiro pedido não pagar o custo. Falhas ficam registradas em `status`.
+        """
+        for name in names or list(self._providers):
+            try:
+                self.get(name)
+            except ProviderUnavailableError:
+                pass
+
+    def status(self) -> dict:
+        result = {}
+        for name, provider in self._providers.items():
+            if provider.instance is not None:
+                state = "ready"
+            elif provider.error is not None:
+                state = "unavailable"
+            else:
+                state = "not_initialized"
+            result[name] = {
+                "state": state,
+                "optional": provider.optional,
+                "init_ms": provider.init_ms,
+                "error": provider.error,
+            }
+        return result
+
+
+providers = ProviderRegistry()
+
+
+def load_google_credentials():
+    """
+    Credenciais do Google Cloud a partir de GOOGLE_SPEECH_TO_TEXT: o JSON da service
+    account direto na variável ou o caminho do arquivo.
+    """
+    # Import tardio: o SDK do Google só é carregado quando a voz é usada
+    from google.oauth2 import service_account
+
+    google_credentials = os.getenv("GOOGLE_SPEECH_TO_TEXT")
+    if not google_credentials:
+        raise ValueError("A variável GOOGLE_SPEECH_TO_TEXT não foi encontrada no .env")
+    if google_credentials.lstrip().startswith("{"):
+        # JSON na variável: lido em memória, sem gravar a chave num arquivo temporário
+        return service_account.Credentials.from_service_account_info(json.loads(google_credentials))
+    return service_account.Credentials.from_service_account_file(google_credentials)
+
+
+def _create_speech_client():
+    from google.cloud import speech
+
+    return speech.SpeechClient(credentials=providers.get("google_credentials"))
+
+
+def _create_tts_client():
+    from google.cloud import texttospeech
+
+    return texttospeech.TextToSpeechClient(credentials=providers.get("google_credentials"))
+
+
+providers.register("google_credentials", load_google_credentials, optional=True)
+providers.register("speech_client", _create_speech_client, optional=True)
+providers.register("tts_client", _create_tts_client, optional=True)
@@ -0,0 +1,131 @@
+import hashlib
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Optional
+
+from dotenv import load_dotenv
+
+from src.api.services.prompts import state_key, sector_key
+from src.api.services.session_store import ChatSession
+
+
+load_dotenv()
+
+CHAT_RESPONSE_CACHE_ENABLED = os.getenv("CHAT_RESPONSE_CACHE_ENABLED", "1") != "0"
+CHAT_RESPONSE_CACHE_SIZE = int(os.getenv("CHAT_RESPONSE_CACHE_SIZE", 1000))
+CHAT_RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("CHAT_RESPONSE_CACHE_TTL_SECONDS", 3600))
+# Até quantos turnos de conversa o cache é consultado (1 = só a mensagem de abertura)
+CHAT_RESPONSE_CACHE_MAX_TURNS = int(os.getenv("CHAT_RESPONSE_CACHE_MAX_TURNS", 1))
+
+_NON_WORD = re.compile(r"[^\w\s]")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_message(text: str) -> str:
+    """
+    Normaliza a mensagem para a chave do cache: minúsculas, sem acentos, sem pontuação
+    e com espaços colapsados ("Olá!!" e "ola" viram a mesma chave).
+    """
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    text = _NON_WORD.sub(" ", text)
+    return _SPACES.sub(" ", text).strip()
+
+
+class ResponseCache:
+    """
+    Cache das respostas brutas do modelo para mensagens repetidas no início da conversa
+    (ex.: "olá", "bom dia"). A chave combina a mensagem normalizada, a variante do system
+    prompt e uma impressão digital do histórico. Despejo por tamanho (LRU) e por TTL.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = CHAT_RESPONSE_CACHE_SIZE,
+        ttl_seconds: float = CHAT_RESPONSE_CACHE_TTL_SECONDS,
+        max_turns: int = CHAT_RESPONSE_CACHE_MAX_TURNS,
+        enabled: bool = CHAT_RESPONSE_CACHE_ENABLED,
+        clock=time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_turns = max_turns
+        self.enabled = enabled
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evictions = 0
+
+    def key_for(self, session: ChatSession, user_message: str) -> Optional[str]:
+        """
+        Chave do cache para este turno, ou None se o cache não se aplica (desligado ou
+        conversa mais profunda que `max_turns`).
+        """
+        if not self.enabled:
+            return None
+        if len(session.history) // 2 >= self.max_turns:
+            with self._lock:
+                self.bypassed += 1
+            return None
+
+        digest = hashlib.sha256()
+        digest.update(normalize_message(user_message).encode())
+        digest.update(b"\0")
+        digest.update(f"{state_key(session.state)}|{sector_key(session.lead_data.get('setor'))}".encode())
+        for message in session.history:
+            digest.update(b"\0")
+            digest.update(message.role.encode())
+            digest.update(b":")
+            digest.update(message.content.encode())
+        return digest.hexdigest()
+
+    def get(self, key: Optional[str]) -> Optional[str]:
+        if key is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self._clock() - entry[1] >= self.ttl_seconds:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Optional[str], response: str) -> None:
+        if key is None or not response:
+            return
+        with self._lock:
+            self._entries[key] = (response, self._clock())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "bypassed": self.bypassed,
+                "evictions": self.evictions,
+            }
+
+
+response_cache = ResponseCache()
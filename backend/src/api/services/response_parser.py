@@ -0,0 +1,91 @@
+import json
+import re
+from typing import Optional
+
+
+# Frase que o modelo usa quando o usuário pede para falar com um atendente humano
+HANDOFF_MESSAGE = "Entendido, um de nossos assistentes irá falar com você o mais breve possível!"
+
+# Padrões pré-compilados. Só são executados a partir das posições encontradas com
+# str.find (busca em C), então cada trecho da resposta é percorrido uma única vez.
+_FENCED_JSON = re.compile(r"```(?:json)?\s*(\{.*?\})\s*```", re.DOTALL | re.IGNORECASE)
+_BARE_JSON = re.compile(r"\{\s*\"nome\".*?\}", re.DOTALL)
+JSON_WORD_PATTERN = re.compile(r"\bjson\b", re.IGNORECASE)
+
+# Reaproveitado pelo filtro do streaming (src/api/services/stream_filter.py)
+STREAM_CUT_PATTERN = re.compile(r"```|\{|" + re.escape(HANDOFF_MESSAGE))
+
+
+class ParsedResponse:
+    """
+    Resultado do pós-processamento de uma resposta do modelo.
+    """
+    __slots__ = ("reply", "lead_json", "handoff")
+
+    def __init__(self, reply: str, lead_json: Optional[str], handoff: bool):
+        self.reply = reply
+        self.lead_json = lead_json
+        self.handoff = handoff
+
+    @property
+    def lead_data(self) -> Optional[dict]:
+        return parse_lead_json(self.lead_json)
+
+
+def parse_model_response(text: str) -> ParsedResponse:
+    """
+    Pós-processa a resposta do modelo: detecta a frase de transferência, extrai o bloco
+    JSON do lead (com ou sem backticks) e monta a resposta limpa (sem o JSON e sem a
+    palavra "json"). Se houver transferência, a resposta é exatamente HANDOFF_MESSAGE.
+    """
+    if HANDOFF_MESSAGE in text:
+        return ParsedResponse(HANDOFF_MESSAGE, None, True)
+
+    lead_json = None
+    match = None
+    start = text.find("```")
+    if start >= 0:
+        match = _FENCED_JSON.search(text, start)
+    if match is None:
+        start = text.find("{")
+        if start >= 0:
+            match = _BARE_JSON.search(text, start)
+            if match is not None:
+                lead_json = match.group(0)
+    else:
+        lead_json = match.group(1)
+
+    reply = text[:match.start()] + text[match.end():] if match is not None else text
+    if _mentions_json(reply):
+        reply = JSON_WORD_PATTERN.sub("", reply)
+    return ParsedResponse(reply.strip(), lead_json, False)
+
+
+def _mentions_json(text: str) -> bool:
+    # Pré-filtro barato: a substituição com \b e IGNORECASE só roda se "json" aparecer
+    return b"json" in text.encode("utf-8", "surrogatepass").lower()
+
+
+def parse_lead_json(json_block: Optional[str]) -> Optional[dict]:
+    """
+    Converte o bloco JSON para dicionário. Se não houver ou falhar, retorna None.
+    """
+    if not json_block:
+        return None
+
+    try:
+        data = json.loads(json_block)
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    return {
+        "nome": data.get("nome"),
+        "email": data.get("email"),
+        "telefone": data.get("telefone"),
+        "empresa": data.get("empresa"),
+        "setor": data.get("setor"),
+        "interesse": data.get("interesse"),
+        "mensagem": data.get("mensagem"),
+        "origem": data.get("origem"),
+    }
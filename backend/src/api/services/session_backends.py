@@ -0,0 +1,364 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Optional
+from urllib.parse import urlparse
+
+from dotenv import load_dotenv
+
+from src.api.services.session_store import (
+    ChatMessage, ChatSession, SessionStore, CHAT_SESSION_TTL_SECONDS, session_store
+)
+
+
+load_dotenv()
+
+# memory (padrão, um processo) | sqlite (processos no mesmo host) | kv (servidor chave-valor externo)
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")
+SESSION_SQLITE_PATH = os.getenv("SESSION_SQLITE_PATH", "chat_sessions.sqlite3")
+SESSION_KV_URL = os.getenv("SESSION_KV_URL", "redis://127.0.0.1:6379/0")
+SESSION_KV_PREFIX = os.getenv("SESSION_KV_PREFIX", "chat:session:")
+
+
+class SessionBackend:
+    """
+    Interface dos backends de sessão do chat.
+
+    O fluxo de um turno é: `get_or_create` -> alterações na sessão (`append_message`,
+    estado, dados do lead) -> `save`. Backends compartilhados gravam a sessão inteira em
+    `save`; o backend em memória altera o objeto no próprio lugar.
+    """
+
+    name = "base"
+    # True quando get/save fazem I/O (o caminho assíncrono os executa numa thread)
+    blocking = True
+
+    def get(self, session_id: str) -> Optional[ChatSession]:
+        raise NotImplementedError
+
+    def save(self, session: ChatSession) -> None:
+        raise NotImplementedError
+
+    def delete(self, session_id: str) -> None:
+        raise NotImplementedError
+
+    def acquire_turn(self, session_id: str, lease_seconds: float, timeout: float) -> Optional[str]:
+        """
+        Reserva a sessão para um turno (entre workers). Retorna um token para `release_turn`
+        ou None se outra reserva não for liberada dentro de `timeout` segundos.
+        """
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + timeout
+        delay = 0.005
+        while not self._try_acquire_turn(session_id, token, lease_seconds):
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(delay)
+            delay = min(delay * 2, 0.1)
+        return token
+
+    def _try_acquire_turn(self, session_id: str, token: str, lease_seconds: float) -> bool:
+        return True
+
+    def release_turn(self, session_id: str, token: str) -> None:
+        pass
+
+    def get_or_create(self, session_id: Optional[str] = None) -> ChatSession:
+        if session_id:
+            session = self.get(session_id)
+            if session is not None:
+                return session
+        else:
+            session_id = str(uuid.uuid4())
+        return ChatSession(session_id)
+
+    def append_message(self, session: ChatSession, role: str, content: str) -> ChatMessage:
+        message = ChatMessage(role, content)
+        session.history.append(message)
+        session.size += message.approx_size()
+        return message
+
+    def stats(self) -> dict:
+        return {"backend": self.name}
+
+
+class MemorySessionBackend(SessionBackend):
+    """
+    Sessões no próprio processo (SessionStore com LRU/TTL). Não compartilha entre workers.
+    """
+
+    name = "memory"
+    blocking = False
+
+    def __init__(self, store: SessionStore = session_store):
+        self.store = store
+
+    def get(self, session_id: str) -> Optional[ChatSession]:
+        return self.store.get(session_id)
+
+    def get_or_create(self, session_id: Optional[str] = None) -> ChatSession:
+        return self.store.get_or_create(session_id)
+
+    def append_message(self, session: ChatSession, role: str, content: str) -> ChatMessage:
+        return self.store.append_message(session, role, content)
+
+    def save(self, session: ChatSession) -> None:
+        # O objeto já é o que está no store
+        pass
+
+    def delete(self, session_id: str) -> None:
+        self.store.discard(session_id)
+
+    def stats(self) -> dict:
+        return {"backend": self.name, **self.store.stats()}
+
+
+class SQLiteSessionBackend(SessionBackend):
+    """
+    Sessões num arquivo SQLite em modo WAL, compartilhadas entre os workers do mesmo host.
+    Cada thread usa sua própria conexão; sessões inativas expiram por TTL.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str = SESSION_SQLITE_PATH, ttl_seconds: float = CHAT_SESSION_TTL_SECONDS):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._saves = 0
+        self.hits = 0
+        self.misses = 0
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS chat_sessions ("
+            " session_id TEXT PRIMARY KEY,"
+            " data TEXT NOT NULL,"
+            " expires_at REAL NOT NULL)"
+        )
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS chat_session_turns ("
+            " session_id TEXT PRIMARY KEY,"
+            " token TEXT NOT NULL,"
+            " expires_at REAL NOT NULL)"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def get(self, session_id: str) -> Optional[ChatSession]:
+        row = self._connection().execute(
+            "SELECT data FROM chat_sessions WHERE session_id = ? AND expires_at > ?",
+            (session_id, time.time()),
+        ).fetchone()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return ChatSession.from_dict(json.loads(row[0]))
+
+    def save(self, session: ChatSession) -> None:
+        connection = self._connection()
+        now = time.time()
+        connection.execute(
+            "INSERT INTO chat_sessions (session_id, data, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(session_id) DO UPDATE SET data = excluded.data, expires_at = excluded.expires_at",
+            (session.session_id, json.dumps(session.to_dict(), ensure_ascii=False), now + self.ttl_seconds),
+        )
+        with self._lock:
+            self._saves += 1
+            purge = self._saves % 500 == 0
+        if purge:
+            connection.execute("DELETE FROM chat_sessions WHERE expires_at <= ?", (now,))
+
+    def delete(self, session_id: str) -> None:
+        self._connection().execute("DELETE FROM chat_sessions WHERE session_id = ?", (session_id,))
+
+    def _try_acquire_turn(self, session_id: str, token: str, lease_seconds: float) -> bool:
+        connection = self._connection()
+        now = time.time()
+        # Reservas vencidas (worker que morreu no meio do turno) podem ser tomadas
+        cursor = connection.execute(
+            "INSERT INTO chat_session_turns (session_id, token, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(session_id) DO UPDATE SET token = excluded.token, expires_at = excluded.expires_at "
+            "WHERE chat_session_turns.expires_at <= ?",
+            (session_id, token, now + lease_seconds, now),
+        )
+        return cursor.rowcount == 1
+
+    def release_turn(self, session_id: str, token: str) -> None:
+        self._connection().execute(
+            "DELETE FROM chat_session_turns WHERE session_id = ? AND token = ?", (session_id, token)
+        )
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"backend": self.name, "path": self.path, "hits": self.hits, "misses": self.misses}
+
+
+class _RespConnection:
+    """
+    Cliente mínimo do protocolo RESP (Redis e compatíveis: Valkey, KeyDB, Dragonfly...).
+    """
+
+    def __init__(self, host: str, port: int, timeout: float = 5.0):
+        self._socket = socket.create_connection((host, port), timeout=timeout)
+        self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._reader = self._socket.makefile("rb")
+
+    def command(self, *args):
+        payload = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            payload.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        self._socket.sendall(b"".join(payload))
+        return self._read_reply()
+
+    def _read_reply(self):
+        line = self._reader.readline()
+        if not line:
+            raise ConnectionError("Conexão com o servidor chave-valor encerrada")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode()
+        if kind == b"-":
+            raise RuntimeError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            size = int(rest)
+            if size < 0:
+                return None
+            data = self._reader.read(size + 2)
+            return data[:-2]
+        if kind == b"*":
+            size = int(rest)
+            return None if size < 0 else [self._read_reply() for _ in range(size)]
+        raise RuntimeError(f"Resposta RESP inválida: {line!r}")
+
+    def close(self) -> None:
+        try:
+            self._reader.close()
+            self._socket.close()
+        except OSError:
+            pass
+
+
+# Remove a reserva do turno só se ainda for nossa, num único comando: entre um GET e um
+# DEL separados ela pode vencer e ser tomada por outro worker, e o DEL apagaria a dele
+_RELEASE_TURN_SCRIPT = (
+    "if redis.call('GET', KEYS[1]) == ARGV[1] then return redis.call('DEL', KEYS[1]) else return 0 end"
+)
+
+
+class KeyValueSessionBackend(SessionBackend):
+    """
+    Sessões num servidor chave-valor externo que fala RESP (ex.: Redis), compartilhadas
+    entre workers e hosts. O TTL de inatividade fica a cargo do servidor (SET ... EX).
+    """
+
+    name = "kv"
+
+    def __init__(
+        self,
+        url: str = SESSION_KV_URL,
+        prefix: str = SESSION_KV_PREFIX,
+        ttl_seconds: float = CHAT_SESSION_TTL_SECONDS,
+    ):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.prefix = prefix
+        self.ttl_seconds = max(1, int(ttl_seconds))
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.reconnects = 0
+
+    def _connection(self) -> _RespConnection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = _RespConnection(self.host, self.port)
+            if self.password:
+                connection.command("AUTH", self.password)
+            if self.db:
+                connection.command("SELECT", self.db)
+            self._local.connection = connection
+        return connection
+
+    def _command(self, *args):
+        try:
+            return self._connection().command(*args)
+        except (ConnectionError, OSError):
+            # Conexão caiu (ex.: restart do servidor): reconecta uma vez
+            connection = getattr(self._local, "connection", None)
+            if connection is not None:
+                connection.close()
+            self._local.connection = None
+            with self._lock:
+                self.reconnects += 1
+            return self._connection().command(*args)
+
+    def get(self, session_id: str) -> Optional[ChatSession]:
+        data = self._command("GET", self.prefix + session_id)
+        with self._lock:
+            if data is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return ChatSession.from_dict(json.loads(data))
+
+    def save(self, session: ChatSession) -> None:
+        payload = json.dumps(session.to_dict(), ensure_ascii=False).encode()
+        self._command("SET", self.prefix + session.session_id, payload, "EX", self.ttl_seconds)
+
+    def delete(self, session_id: str) -> None:
+        self._command("DEL", self.prefix + session_id)
+
+    def _try_acquire_turn(self, session_id: str, token: str, lease_seconds: float) -> bool:
+        reply = self._command(
+            "SET", f"{self.prefix}{session_id}:turn", token, "NX", "PX", int(lease_seconds * 1000)
+        )
+        return reply == "OK"
+
+    def release_turn(self, session_id: str, token: str) -> None:
+        self._command("EVAL", _RELEASE_TURN_SCRIPT, 1, f"{self.prefix}{session_id}:turn", token)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": self.name,
+                "server": f"{self.host}:{self.port}/{self.db}",
+                "hits": self.hits,
+                "misses": self.misses,
+                "reconnects": self.reconnects,
+            }
+
+
+def create_session_backend(name: str = SESSION_BACKEND) -> SessionBackend:
+    """
+    Instancia o backend de sessão configurado em SESSION_BACKEND.
+    """
+    if name == "memory":
+        return MemorySessionBackend()
+    if name == "sqlite":
+        return SQLiteSessionBackend()
+    if name == "kv":
+        return KeyValueSessionBackend()
+    raise ValueError(f"SESSION_BACKEND inválido: {name!r} (use memory, sqlite ou kv)")
+
+
+session_backend = create_session_backend()
@@ -0,0 +1,233 @@
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional
+
+from dotenv import load_dotenv
+
+
+load_dotenv()
+
+# Limites configuráveis do armazenamento de sessões do chat
+CHAT_SESSION_MAX = int(os.getenv("CHAT_SESSION_MAX", 10000))
+CHAT_SESSION_TTL_SECONDS = float(os.getenv("CHAT_SESSION_TTL_SECONDS", 3600))
+CHAT_SESSION_MAX_MB = float(os.getenv("CHAT_SESSION_MAX_MB", 64))
+
+# Papéis internados: todas as mensagens apontam para a mesma string
+ROLE_USER = sys.intern("user")
+ROLE_ASSISTANT = sys.intern("assistant")
+ROLE_SYSTEM = sys.intern("system")
+
+LEAD_FIELDS = ("nome", "email", "telefone", "empresa", "setor", "interesse", "mensagem", "origem")
+
+# Estimativas de custo fixo (bytes) usadas na contabilidade do limite de memória
+_SESSION_OVERHEAD = 900
+_MESSAGE_OVERHEAD = 120
+
+
+def new_lead_data() -> dict:
+    """
+    Dados de lead padrão de uma sessão nova.
+    """
+    lead_data = dict.fromkeys(LEAD_FIELDS)
+    lead_data["origem"] = "website"
+    return lead_data
+
+
+class ChatMessage:
+    """
+    Mensagem compacta do histórico (substitui o dict {"role", "content"} por turno).
+    """
+    __slots__ = ("role", "content", "tokens")
+
+    def __init__(self, role: str, content: str, tokens: Optional[int] = None):
+        self.role = sys.intern(role)
+        self.content = content
+        self.tokens = tokens  # contagem de tokens, calculada uma única vez (history_manager)
+
+    def as_openai(self) -> dict:
+        return {"role": self.role, "content": self.content}
+
+    def approx_size(self) -> int:
+        return _MESSAGE_OVERHEAD + len(self.content)
+
+
+class ChatSession:
+    """
+    Estado de uma conversa: histórico, dados do lead e estado da máquina de estados.
+    """
+    __slots__ = (
+        "session_id", "history", "lead_data", "state", "last_access", "size",
+        "summary", "summarized_upto", "last_request_id", "last_reply",
+    )
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.history = []
+        self.lead_data = new_lead_data()
+        self.state = "INICIANTE"
+        self.last_access = 0.0
+        self.size = _SESSION_OVERHEAD + len(session_id)
+        # Resumo dos turnos antigos e índice do histórico até onde ele cobre
+        self.summary = None
+        self.summarized_upto = 0
+        # Chave de idempotência e resposta do último turno (reenvio do mesmo pedido)
+        self.last_request_id = None
+        self.last_reply = None
+
+    def openai_history(self) -> list:
+        return [message.as_openai() for message in self.history]
+
+    def to_dict(self) -> dict:
+        """
+        Representação serializável (JSON) usada pelos backends compartilhados de sessão.
+        Cada mensagem vai como [papel, conteúdo, tokens], para a contagem de tokens não ser
+        refeita a cada turno por quem carrega a sessão.
+        """
+        return {
+            "session_id": self.session_id,
+            "history": [[message.role, message.content, message.tokens] for message in self.history],
+            "lead_data": self.lead_data,
+            "state": self.state,
+            "summary": self.summary,
+            "summarized_upto": self.summarized_upto,
+            "last_request_id": self.last_request_id,
+            "last_reply": self.last_reply,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ChatSession":
+        session = cls(data["session_id"])
+        # Sessões gravadas antes da contagem persistida vêm como [papel, conteúdo]
+        session.history = [ChatMessage(*message) for message in data.get("history", [])]
+        session.lead_data.update(data.get("lead_data") or {})
+        session.state = data.get("state") or "INICIANTE"
+        session.summary = data.get("summary")
+        session.summarized_upto = data.get("summarized_upto", 0)
+        session.last_request_id = data.get("last_request_id")
+        session.last_reply = data.get("last_reply")
+        session.size += sum(message.approx_size() for message in session.history)
+        return session
+
+
+class SessionStore:
+    """
+    Armazenamento em memória das sessões do chat com despejo LRU, expiração por
+    inatividade (TTL) e limite aproximado de memória.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = CHAT_SESSION_MAX,
+        ttl_seconds: float = CHAT_SESSION_TTL_SECONDS,
+        max_bytes: int = int(CHAT_SESSION_MAX_MB * 1024 * 1024),
+        clock=time.monotonic,
+    ):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._sessions = OrderedDict()
+        self._lock = threading.RLock()
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.created = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def get(self, session_id: str) -> Optional[ChatSession]:
+        """
+        Retorna a sessão (marcando-a como usada recentemente) ou None se não existir/expirou.
+        """
+        with self._lock:
+            now = self._clock()
+            self._expire(now)
+            session = self._sessions.get(session_id)
+            if session is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            session.last_access = now
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def get_or_create(self, session_id: Optional[str] = None) -> ChatSession:
+        """
+        Carrega a sessão existente ou cria uma nova (gerando um UUID se `session_id` for None).
+        """
+        with self._lock:
+            if session_id:
+                session = self.get(session_id)
+                if session is not None:
+                    return session
+            else:
+                session_id = str(uuid.uuid4())
+
+            session = ChatSession(session_id)
+            session.last_access = self._clock()
+            self._sessions[session_id] = session
+            self._total_bytes += session.size
+            self.created += 1
+            self._evict()
+            return session
+
+    def append_message(self, session: ChatSession, role: str, content: str) -> ChatMessage:
+        """
+        Adiciona uma mensagem ao histórico da sessão mantendo a contabilidade de memória.
+        """
+        message = ChatMessage(role, content)
+        with self._lock:
+            session.history.append(message)
+            size = message.approx_size()
+            session.size += size
+            if self._sessions.get(session.session_id) is session:
+                self._total_bytes += size
+                self._evict()
+        return message
+
+    def discard(self, session_id: str) -> None:
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if session is not None:
+                self._total_bytes -= session.size
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "approx_bytes": self._total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "created": self.created,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def _expire(self, now: float) -> None:
+        # As sessões ficam ordenadas por último acesso, então as expiradas estão no início
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_access < self.ttl_seconds:
+                break
+            self._sessions.popitem(last=False)
+            self._total_bytes -= session.size
+            self.expirations += 1
+
+    def _evict(self) -> None:
+        # Mantém sempre ao menos a sessão mais recente, mesmo que sozinha passe do limite
+        while len(self._sessions) > 1 and (
+            len(self._sessions) > self.max_sessions or self._total_bytes > self.max_bytes
+        ):
+            _, session = self._sessions.popitem(last=False)
+            self._total_bytes -= session.size
+            self.evictions += 1
+
+
+session_store = SessionStore()
@@ -0,0 +1,323 @@
+import asyncio
+import json
+import os
+import queue
+from typing import AsyncIterator, Optional
+
+from dotenv import load_dotenv
+from fastapi import UploadFile, WebSocket, WebSocketDisconnect
+from starlette.websockets import WebSocketState
+
+from src.api.services.audio_jobs import audio_jobs, AudioBusyError
+from src.api.services.audio_service import (
+    PcmTranscoder, AudioTranscodeError, STT_SAMPLE_RATE, prepare_upload_for_recognition
+)
+from src.api.services.metrics import metrics
+from src.api.services.providers import providers
+
+
+load_dotenv()
+
+# google (Speech-to-Text em streaming) | stub (repete resultados gravados, para testes locais)
+STT_RECOGNIZER = os.getenv("STT_RECOGNIZER", "google")
+STT_LANGUAGE = os.getenv("STT_LANGUAGE", "pt-PT")
+# Arquivo JSON com a lista de eventos do stub: [{"text": "...", "is_final": false}, ...]
+STT_STUB_SCRIPT = os.getenv("STT_STUB_SCRIPT")
+# Limite de áudio recebido por conexão do WebSocket
+AUDIO_STREAM_MAX_MB = float(os.getenv("AUDIO_STREAM_MAX_MB", 50))
+# Pedaços de PCM esperando o envio ao Google por conexão; com a fila cheia o recebimento
+# do áudio espera (o buffer não cresce se o Google atrasar)
+STT_STREAM_QUEUE_CHUNKS = int(os.getenv("STT_STREAM_QUEUE_CHUNKS", 64))
+
+# Código de fechamento do WebSocket quando não há vaga para a sessão (Try Again Later)
+WS_CLOSE_BUSY = 1013
+
+_END_OF_AUDIO = None
+
+_DEFAULT_STUB_SCRIPT = [
+    {"text": "olá", "is_final": False},
+    {"text": "olá gostaria", "is_final": False},
+    {"text": "olá gostaria de saber mais", "is_final": False},
+    {"text": "Olá, gostaria de saber mais sobre automação.", "is_final": True},
+]
+
+
+class TranscriptEvent:
+    """
+    Resultado parcial (interim) ou final do reconhecimento em streaming.
+    """
+    __slots__ = ("text", "is_final", "stability")
+
+    def __init__(self, text: str, is_final: bool, stability: float = 0.0):
+        self.text = text
+        self.is_final = is_final
+        self.stability = stability
+
+    def as_message(self) -> dict:
+        return {"type": "final" if self.is_final else "interim", "text": self.text}
+
+
+class SpeechRecognizer:
+    """
+    Interface dos reconhecedores de fala em streaming: recebe PCM 16-bit mono
+    (`sample_rate` Hz) em pedaços e gera TranscriptEvent conforme o texto é reconhecido.
+    """
+
+    name = "base"
+
+    def stream(self, pcm_chunks: AsyncIterator[bytes], sample_rate: int = STT_SAMPLE_RATE):
+        raise NotImplementedError
+
+
+class GoogleStreamingRecognizer(SpeechRecognizer):
+    """
+    Google Speech-to-Text em streaming (gRPC). O cliente do Google é síncrono: a chamada
+    roda numa thread da vaga "stream" do pool de áudio (AudioBusyError sem vaga livre),
+    alimentada por uma fila limitada, e os resultados voltam ao event loop.
+    O Google encerra cada stream após ~5 minutos de áudio.
+    """
+
+    name = "google"
+
+    def __init__(self, client, language_code: str = STT_LANGUAGE):
+        # Import tardio: o SDK do Google só é carregado quando o reconhecedor é criado
+        from google.cloud import speech
+
+        self._speech = speech
+        self.client = client
+        self.language_code = language_code
+
+    def _config(self, sample_rate: int):
+        speech = self._speech
+        return speech.StreamingRecognitionConfig(
+            config=speech.RecognitionConfig(
+                encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
+                sample_rate_hertz=sample_rate,
+                language_code=self.language_code,
+            ),
+            interim_results=True,
+        )
+
+    async def stream(self, pcm_chunks: AsyncIterator[bytes], sample_rate: int = STT_SAMPLE_RATE):
+        loop = asyncio.get_running_loop()
+        # Até STT_STREAM_QUEUE_CHUNKS pedaços (controlados por `free_slots`) e as duas
+        # marcas de fim (do pump e do finally), então o put_nowait nunca encontra a fila cheia
+        audio_queue = queue.Queue(maxsize=STT_STREAM_QUEUE_CHUNKS + 2)
+        free_slots = asyncio.Semaphore(STT_STREAM_QUEUE_CHUNKS)
+        events = asyncio.Queue()
+
+        def requests():
+            while True:
+                chunk = audio_queue.get()
+                if chunk is _END_OF_AUDIO:
+                    return
+                loop.call_soon_threadsafe(free_slots.release)
+                yield self._speech.StreamingRecognizeRequest(audio_content=chunk)
+
+        def recognize():
+            try:
+                with metrics.external_call("google_stt", "streaming_recognize"):
+                    for response in self.client.streaming_recognize(self._config(sample_rate), requests()):
+                        for result in response.results:
+                            if result.alternatives:
+                                event = TranscriptEvent(
+                                    result.alternatives[0].transcript, result.is_final, result.stability
+                                )
+                                loop.call_soon_threadsafe(events.put_nowait, event)
+            except Exception as error:
+                loop.call_soon_threadsafe(events.put_nowait, error)
+            finally:
+                loop.call_soon_threadsafe(events.put_nowait, _END_OF_AUDIO)
+
+        async def pump():
+            try:
+                async for chunk in pcm_chunks:
+                    # Se o Google encerrar o stream antes do fim do áudio, o resto só é consumido
+                    if worker.done():
+                        continue
+                    await free_slots.acquire()
+                    if not worker.done():
+                        audio_queue.put_nowait(chunk)
+            finally:
+                audio_queue.put_nowait(_END_OF_AUDIO)
+
+        # Thread do pool de áudio (não o executor padrão do asyncio, usado pelo
+        # asyncio.to_thread do chat): a sessão pode durar minutos
+        worker = audio_jobs.start_blocking("stream", recognize)
+        # Acorda o pump se a thread terminar com a fila cheia
+        worker.add_done_callback(lambda _: free_slots.release())
+        pump_task = asyncio.ensure_future(pump())
+        try:
+            while True:
+                item = await events.get()
+                if item is _END_OF_AUDIO:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+            await pump_task
+        finally:
+            pump_task.cancel()
+            # Garante que a thread do gRPC termine mesmo se o consumidor desistir
+            audio_queue.put_nowait(_END_OF_AUDIO)
+            await asyncio.shield(worker)
+
+
+class StubRecognizer(SpeechRecognizer):
+    """
+    Reconhecedor local que repete uma lista de eventos gravada, distribuindo-os conforme
+    o áudio chega (um evento a cada `bytes_per_event` bytes de PCM). Os que sobrarem
+    saem no fim do áudio. Não precisa de credenciais do Google.
+    """
+
+    name = "stub"
+
+    # Padrão: um evento a cada meio segundo de PCM 16-bit
+    def __init__(self, script: Optional[list] = None, bytes_per_event: int = STT_SAMPLE_RATE):
+        self.script = script if script is not None else _DEFAULT_STUB_SCRIPT
+        self.bytes_per_event = max(1, bytes_per_event)
+
+    @classmethod
+    def from_file(cls, path: str) -> "StubRecognizer":
+        with open(path, encoding="utf-8") as script_file:
+            return cls(json.load(script_file))
+
+    async def stream(self, pcm_chunks: AsyncIterator[bytes], sample_rate: int = STT_SAMPLE_RATE):
+        events = iter(self.script)
+        received = 0
+        emitted = 0
+        async for chunk in pcm_chunks:
+            received += len(chunk)
+            while received >= (emitted + 1) * self.bytes_per_event:
+                item = next(events, None)
+                if item is None:
+                    break
+                emitted += 1
+                yield TranscriptEvent(item["text"], item.get("is_final", False))
+            await asyncio.sleep(0)
+        for item in events:
+            yield TranscriptEvent(item["text"], item.get("is_final", False))
+
+
+def create_recognizer(name: str = STT_RECOGNIZER, client=None) -> SpeechRecognizer:
+    """
+    Instancia o reconhecedor configurado em STT_RECOGNIZER.
+    """
+    if name == "stub":
+        return StubRecognizer.from_file(STT_STUB_SCRIPT) if STT_STUB_SCRIPT else StubRecognizer()
+    if name == "google":
+        return GoogleStreamingRecognizer(client or providers.get("speech_client"))
+    raise ValueError(f"STT_RECOGNIZER inválido: {name!r} (use google ou stub)")
+
+
+# Reconhecedor do WebSocket, criado no primeiro uso (com o stub, nem precisa do Google)
+providers.register("speech_recognizer", create_recognizer, optional=True)
+
+
+async def transcribe_websocket(
+    websocket: WebSocket,
+    recognizer: SpeechRecognizer,
+    audio_format: str = "auto",
+    max_bytes: int = int(AUDIO_STREAM_MAX_MB * 1024 * 1024),
+) -> None:
+    """
+    Protocolo do /api/voice-to-text/stream (o WebSocket já deve ter sido aceito):
+      cliente -> frames binários com o áudio conforme é gravado; texto {"event": "end"} ao terminar
+      servidor -> {"type": "interim"|"final", "text": ...} conforme o reconhecimento avança,
+                  {"type": "done", "transcription": ...} no fim ou {"type": "error", "error": ...}
+    Com `audio_format="pcm16"` o cliente já envia PCM 16-bit mono 16 kHz e o ffmpeg é dispensado.
+    A conexão é fechada ao final; sem vaga para o reconhecimento, com o código 1013.
+    """
+    transcoder = None
+    raw_audio = asyncio.Queue()
+    if audio_format != "pcm16":
+        transcoder = PcmTranscoder()
+        await transcoder.start()
+
+    async def receive_audio():
+        total = 0
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    raise WebSocketDisconnect(message.get("code", 1000))
+                chunk = message.get("bytes")
+                if chunk:
+                    total += len(chunk)
+                    if total > max_bytes:
+                        raise ValueError("Áudio maior que o limite permitido para o streaming")
+                    if transcoder is not None:
+                        await transcoder.feed(chunk)
+                    else:
+                        raw_audio.put_nowait(chunk)
+                elif message.get("text") and json.loads(message["text"]).get("event") == "end":
+                    break
+        finally:
+            if transcoder is not None:
+                transcoder.finish()
+            else:
+                raw_audio.put_nowait(_END_OF_AUDIO)
+
+    async def raw_chunks():
+        while True:
+            chunk = await raw_audio.get()
+            if chunk is _END_OF_AUDIO:
+                return
+            yield chunk
+
+    receiver = asyncio.ensure_future(receive_audio())
+    pcm_chunks = transcoder.chunks() if transcoder is not None else raw_chunks()
+    finals = []
+    close_code = 1000
+    try:
+        async for event in recognizer.stream(pcm_chunks):
+            if event.is_final:
+                finals.append(event.text.strip())
+            await websocket.send_json(event.as_message())
+        # O reconhecimento só termina depois do fim do áudio; erros do recebimento aparecem aqui
+        await receiver
+        await websocket.send_json({"type": "done", "transcription": " ".join(text for text in finals if text)})
+    except WebSocketDisconnect:
+        pass
+    except AudioBusyError as error:
+        close_code = WS_CLOSE_BUSY
+        await websocket.send_json({"type": "error", "error": str(error), "busy": True})
+    except (AudioTranscodeError, ValueError) as error:
+        await websocket.send_json({"type": "error", "error": str(error)})
+    except Exception as error:
+        # Falha do reconhecedor (credenciais, limite de duração do Google...)
+        await websocket.send_json({"type": "error", "error": str(error)})
+    finally:
+        receiver.cancel()
+        if transcoder is not None:
+            await transcoder.close()
+        if websocket.client_state == WebSocketState.CONNECTED:
+            await websocket.close(code=close_code)
+
+
+async def transcribe_upload(file: UploadFile, client, language_code: str = STT_LANGUAGE) -> tuple:
+    """
+    Reconhecimento de um áudio enviado inteiro (/api/voice-to-text e /api/voice-chat):
+    normaliza o áudio e chama o Google, as duas etapas em vagas do pool de trabalhos de
+    áudio. Retorna (transcrição ou None se nada foi reconhecido, áudio preparado).
+    Levanta AudioTooLargeError, AudioTranscodeError, AudioBusyError ou AudioJobTimeout.
+    """
+    from google.cloud import speech
+
+    prepared = await audio_jobs.run_async("transcode", lambda: prepare_upload_for_recognition(file))
+    config = speech.RecognitionConfig(
+        encoding=speech.RecognitionConfig.AudioEncoding[prepared.encoding],
+        sample_rate_hertz=prepared.sample_rate,
+        language_code=language_code,
+    )
+    audio = speech.RecognitionAudio(content=prepared.content)
+    # Chamada bloqueante: vai para uma thread do pool, fora do event loop
+    response = await audio_jobs.run_blocking("recognize", _recognize_blocking, client, config, audio)
+    if not response.results:
+        return None, prepared
+    return response.results[0].alternatives[0].transcript, prepared
+
+
+def _recognize_blocking(client, config, audio):
+    with metrics.external_call("google_stt", "recognize"):
+        return client.recognize(config=config, audio=audio)
@@ -0,0 +1,92 @@
+import re
+
+from src.api.services.response_parser import HANDOFF_MESSAGE, JSON_WORD_PATTERN, STREAM_CUT_PATTERN
+
+
+_TRAILING_WORD = re.compile(r"\w+$")
+
+
+class LeadBlockStreamFilter:
+    """
+    Filtro incremental para respostas em streaming do modelo.
+
+    Repassa o texto conforme os tokens chegam, mas segura tudo a partir do início do
+    bloco JSON do lead (fenced ```json ou um objeto `{ ... }` solto) e qualquer trecho
+    que possa ser a frase de transferência para um atendente, para que nunca cheguem
+    ao cliente. A limpeza final continua sendo feita sobre a resposta completa
+    (`parse_model_response`, em src/api/services/response_parser.py).
+    """
+
+    def __init__(self, handoff_message: str = HANDOFF_MESSAGE):
+        self.handoff_message = handoff_message
+        self._cut_pattern = (
+            STREAM_CUT_PATTERN if handoff_message == HANDOFF_MESSAGE
+            else re.compile(r"```|\{|" + re.escape(handoff_message))
+        )
+        self.emitted = ""
+        self.blocked = False
+        self._pending = ""
+        self._full = []
+
+    @property
+    def full_text(self) -> str:
+        return "".join(self._full)
+
+    def feed(self, delta: str) -> str:
+        """
+        Recebe um pedaço da resposta e retorna o texto que já pode ser enviado ao cliente.
+        """
+        if not delta:
+            return ""
+        self._full.append(delta)
+        if self.blocked:
+            return ""
+
+        pending = self._pending + delta
+
+        # A partir do bloco JSON (ou da frase de transferência) nada mais é repassado
+        cut = self._cut_pattern.search(pending)
+        if cut is not None:
+            self.blocked = True
+            self._pending = ""
+            return self._emit(pending[:cut.start()])
+
+        # Segura o final que ainda pode virar "```", a frase de transferência ou a palavra "json"
+        hold = max(
+            _partial_suffix(pending, "```"),
+            _partial_suffix(pending, self.handoff_message),
+            _trailing_word(pending),
+        )
+        self._pending = pending[len(pending) - hold:] if hold else ""
+        return self._emit(pending[:len(pending) - hold])
+
+    def tail(self, final_response: str) -> str:
+        """
+        Após o término do stream, retorna o que falta enviar para que o cliente tenha
+        exatamente `final_response` (ex.: texto legítimo retido por precaução).
+        """
+        if final_response.startswith(self.emitted):
+            return final_response[len(self.emitted):]
+        return ""
+
+    def _emit(self, text: str) -> str:
+        text = JSON_WORD_PATTERN.sub("", text)
+        if not self.emitted:
+            text = text.lstrip()
+        self.emitted += text
+        return text
+
+
+def _partial_suffix(text: str, needle: str) -> int:
+    """
+    Tamanho do maior sufixo de `text` que é prefixo (incompleto) de `needle`.
+    """
+    for size in range(min(len(text), len(needle) - 1), 0, -1):
+        if needle.startswith(text[-size:]):
+            return size
+    return 0
+
+
+def _trailing_word(text: str) -> int:
+    match = _TRAILING_WORD.search(text)
+    return len(match.group(0)) if match else 0
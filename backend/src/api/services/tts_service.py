@@ -0,0 +1,410 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Optional
+
+from dotenv import load_dotenv
+
+from src.api.services.audio_jobs import audio_jobs
+from src.api.services.metrics import metrics
+from src.api.services.providers import providers
+
+
+load_dotenv()
+
+# Voz e configuração de áudio padrão do bot (voz masculina natural do Google)
+TTS_LANGUAGE = os.getenv("TTS_LANGUAGE", "pt-PT")
+TTS_VOICE = os.getenv("TTS_VOICE", "pt-PT-Wavenet-B")
+TTS_SPEAKING_RATE = float(os.getenv("TTS_SPEAKING_RATE", 1.0))
+
+# Cache do áudio sintetizado: LRU em memória + arquivos em disco, ambos limitados por tamanho
+TTS_CACHE_ENABLED = os.getenv("TTS_CACHE_ENABLED", "1") != "0"
+TTS_CACHE_MEMORY_MB = float(os.getenv("TTS_CACHE_MEMORY_MB", 32))
+TTS_CACHE_DISK_MB = float(os.getenv("TTS_CACHE_DISK_MB", 256))
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", os.path.join(tempfile.gettempdir(), "leadin-tts-cache"))
+# Cache-Control enviado ao navegador (o conteúdo de uma chave nunca muda)
+TTS_CACHE_MAX_AGE = int(os.getenv("TTS_CACHE_MAX_AGE", 7 * 24 * 3600))
+
+# Respostas longas: divididas em frases, sintetizadas em paralelo e enviadas em ordem
+TTS_STREAM_PARALLELISM = int(os.getenv("TTS_STREAM_PARALLELISM", 4))
+# O Google aceita até 5000 bytes por pedido; pedaços curtos demais são juntados ao seguinte
+TTS_CHUNK_MAX_CHARS = int(os.getenv("TTS_CHUNK_MAX_CHARS", 1500))
+TTS_CHUNK_MIN_CHARS = int(os.getenv("TTS_CHUNK_MIN_CHARS", 40))
+
+_AUDIO_SUFFIX = ".mp3"
+_SENTENCE_END = re.compile(r"(?<=[.!?…])\s+|\n+")
+_CLAUSE_END = re.compile(r"(?<=[,;:])\s+")
+
+
+def default_voice_params() -> dict:
+    return {
+        "language_code": TTS_LANGUAGE,
+        "name": TTS_VOICE,
+        "ssml_gender": "MALE",
+    }
+
+
+def default_audio_params() -> dict:
+    return {
+        "audio_encoding": "MP3",
+        "speaking_rate": TTS_SPEAKING_RATE,  # Velocidade normal da fala
+        "pitch": 0.0,  # Tom neutro
+        "volume_gain_db": 0.0,  # Sem alteração de volume
+    }
+
+
+def tts_cache_key(text: str, voice: dict, audio: dict) -> str:
+    """
+    Chave do áudio: hash do texto + voz + configuração de áudio (mesma entrada, mesmo MP3).
+    """
+    canonical = json.dumps([text, voice, audio], sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def split_sentences(
+    text: str,
+    max_chars: int = TTS_CHUNK_MAX_CHARS,
+    min_chars: int = TTS_CHUNK_MIN_CHARS,
+) -> list:
+    """
+    Divide o texto em pedaços para síntese: um por frase, juntando frases curtas seguidas
+    ("Olá! Tudo bem?") e quebrando as longas demais em vírgulas (ou, em último caso, em espaços).
+    """
+    pieces = []
+    for sentence in _SENTENCE_END.split(text):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        if len(sentence) <= max_chars:
+            pieces.append(sentence)
+            continue
+        for part in _pack(_CLAUSE_END.split(sentence), max_chars):
+            pieces.extend(_pack(part.split(), max_chars) if len(part) > max_chars else [part])
+
+    chunks = []
+    for piece in pieces:
+        if chunks and len(chunks[-1]) < min_chars and len(piece) < min_chars:
+            chunks[-1] = f"{chunks[-1]} {piece}"
+        else:
+            chunks.append(piece)
+    return chunks
+
+
+class SentenceBuffer:
+    """
+    Acumula o texto que chega em pedaços (deltas do chat) e devolve as frases já
+    completas, prontas para a síntese; `flush` devolve o que sobrou no fim.
+    """
+
+    def __init__(self):
+        self._pending = ""
+
+    def feed(self, text: str) -> list:
+        self._pending += text
+        last = None
+        for last in _SENTENCE_END.finditer(self._pending):
+            pass
+        if last is None:
+            return []
+        complete, self._pending = self._pending[:last.start()], self._pending[last.end():]
+        return split_sentences(complete)
+
+    def flush(self) -> list:
+        rest, self._pending = self._pending, ""
+        return split_sentences(rest)
+
+
+def _pack(words: list, max_chars: int) -> list:
+    packed = []
+    for word in words:
+        if packed and len(packed[-1]) + 1 + len(word) <= max_chars:
+            packed[-1] = f"{packed[-1]} {word}"
+        else:
+            packed.append(word[:max_chars] if len(word) > max_chars else word)
+    return packed
+
+
+class TtsCache:
+    """
+    Cache endereçado por conteúdo do áudio sintetizado, em dois níveis:
+    - memória: LRU limitado por bytes;
+    - disco: um arquivo por chave em `directory`, com despejo do menos usado recentemente
+      quando o total passa de `max_disk_bytes` (a ordem sobrevive a reinícios pelo mtime).
+    """
+
+    def __init__(
+        self,
+        directory: str = TTS_CACHE_DIR,
+        max_memory_bytes: int = int(TTS_CACHE_MEMORY_MB * 1024 * 1024),
+        max_disk_bytes: int = int(TTS_CACHE_DISK_MB * 1024 * 1024),
+    ):
+        self.directory = directory
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._disk = None  # chave -> tamanho, do menos para o mais recente (carregado sob demanda)
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bytes_from_cache = 0
+        self.disk_evictions = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        Procura na memória e depois no disco (faz I/O: no event loop, chamar numa thread).
+        """
+        with self._lock:
+            audio = self._memory.get(key)
+            if audio is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                self.bytes_from_cache += len(audio)
+                return audio
+            self._load_disk_index()
+            on_disk = key in self._disk
+
+        audio = self._read_file(key) if on_disk else None
+        with self._lock:
+            if audio is None:
+                self.misses += 1
+                if on_disk:
+                    # Arquivo apagado por fora: esquece a entrada
+                    self._disk_bytes -= self._disk.pop(key, 0)
+                return None
+            self.disk_hits += 1
+            self.bytes_from_cache += len(audio)
+            if key in self._disk:
+                self._disk.move_to_end(key)
+            self._remember(key, audio)
+        return audio
+
+    def put(self, key: str, audio: bytes) -> None:
+        with self._lock:
+            self._remember(key, audio)
+            self._load_disk_index()
+            if key in self._disk:
+                return
+        self._write_file(key, audio)
+        with self._lock:
+            self._disk[key] = len(audio)
+            self._disk_bytes += len(audio)
+            evicted = []
+            while self._disk_bytes > self.max_disk_bytes and len(self._disk) > 1:
+                old_key, size = self._disk.popitem(last=False)
+                self._disk_bytes -= size
+                self.disk_evictions += 1
+                evicted.append(old_key)
+        for old_key in evicted:
+            try:
+                os.remove(self._path(old_key))
+            except OSError:
+                pass
+
+    def _remember(self, key: str, audio: bytes) -> None:
+        if len(audio) > self.max_memory_bytes:
+            return
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= len(previous)
+        self._memory[key] = audio
+        self._memory_bytes += len(audio)
+        while self._memory_bytes > self.max_memory_bytes:
+            _, old = self._memory.popitem(last=False)
+            self._memory_bytes -= len(old)
+
+    def _load_disk_index(self) -> None:
+        if self._disk is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        entries = []
+        with os.scandir(self.directory) as iterator:
+            for entry in iterator:
+                if entry.name.endswith(_AUDIO_SUFFIX):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, entry.name[:-len(_AUDIO_SUFFIX)], stat.st_size))
+        self._disk = OrderedDict((key, size) for _, key, size in sorted(entries))
+        self._disk_bytes = sum(self._disk.values())
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + _AUDIO_SUFFIX)
+
+    def _read_file(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as audio_file:
+                audio = audio_file.read()
+            # Marca o uso para a ordem de despejo após reinícios
+            os.utime(path)
+            return audio
+        except OSError:
+            return None
+
+    def _write_file(self, key: str, audio: bytes) -> None:
+        # Escrita atômica: outro worker nunca lê um MP3 pela metade
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as temp_file:
+                temp_file.write(audio)
+            os.replace(temp_path, self._path(key))
+        except OSError:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_entries": len(self._disk) if self._disk is not None else None,
+                "disk_bytes": self._disk_bytes,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "bytes_from_cache": self.bytes_from_cache,
+                "disk_evictions": self.disk_evictions,
+            }
+
+
+class TextToSpeechService:
+    """
+    Síntese de fala com cache: textos repetidos (frase de transferência, saudações,
+    mensagens automáticas) saem do cache; sínteses simultâneas do mesmo texto são
+    feitas uma única vez. A chamada ao Google vai para o pool de trabalhos de áudio.
+    """
+
+    def __init__(self, client, cache: Optional[TtsCache] = None):
+        self.client = client
+        self.cache = cache if cache is not None else (TtsCache() if TTS_CACHE_ENABLED else None)
+        self._inflight = {}
+        self.syntheses = 0
+        self.coalesced = 0
+        self.streams = 0
+        self.stream_chunks = 0
+        self._synthesis_ms_total = 0.0
+
+    @staticmethod
+    def key_for(text: str, voice: Optional[dict] = None, audio: Optional[dict] = None) -> str:
+        return tts_cache_key(text, voice or default_voice_params(), audio or default_audio_params())
+
+    async def synthesize(self, text: str, voice: Optional[dict] = None, audio: Optional[dict] = None) -> tuple:
+        """
+        Retorna (mp3, chave). A chave serve de ETag.
+        """
+        voice = voice or default_voice_params()
+        audio = audio or default_audio_params()
+        key = tts_cache_key(text, voice, audio)
+
+        if self.cache is not None:
+            cached = await asyncio.to_thread(self.cache.get, key)
+            if cached is not None:
+                return cached, key
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            return await asyncio.shield(pending), key
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            started = time.perf_counter()
+            content = await audio_jobs.run_blocking("synthesize", self._synthesize_blocking, text, voice, audio)
+            self.syntheses += 1
+            self._synthesis_ms_total += (time.perf_counter() - started) * 1000
+            if self.cache is not None:
+                await asyncio.to_thread(self.cache.put, key, content)
+            future.set_result(content)
+            return content, key
+        except BaseException as error:
+            # Cancelamento do dono não cancela quem esperava: recebe um erro comum
+            future.set_exception(error if isinstance(error, Exception) else RuntimeError("Síntese interrompida"))
+            # Evita o aviso de exceção não lida quando ninguém estava esperando
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def stream(
+        self,
+        text: str,
+        voice: Optional[dict] = None,
+        audio: Optional[dict] = None,
+        parallelism: int = TTS_STREAM_PARALLELISM,
+    ):
+        """
+        Gera o MP3 de um texto longo frase a frase, na ordem do texto: até `parallelism`
+        frases são sintetizadas ao mesmo tempo, e a primeira já pode tocar enquanto as
+        outras são geradas. Cada frase passa pelo cache (frases repetidas não custam nada).
+        """
+        chunks = split_sentences(text)
+        self.streams += 1
+        self.stream_chunks += len(chunks)
+        pending = deque()
+        next_index = 0
+        try:
+            while next_index < len(chunks) or pending:
+                # Janela deslizante: mantém `parallelism` sínteses adiante da que está sendo enviada
+                while next_index < len(chunks) and len(pending) < max(1, parallelism):
+                    pending.append(asyncio.ensure_future(self.synthesize(chunks[next_index], voice, audio)))
+                    next_index += 1
+                content, _ = await pending.popleft()
+                yield content
+        finally:
+            # Cliente desconectou ou uma frase falhou: as sínteses adiantadas são canceladas
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    def _synthesize_blocking(self, text: str, voice: dict, audio: dict) -> bytes:
+        from google.cloud import texttospeech
+
+        with metrics.external_call("google_tts", "synthesize"):
+            response = self.client.synthesize_speech(
+                input=texttospeech.SynthesisInput(text=text),
+                voice=texttospeech.VoiceSelectionParams(
+                    language_code=voice["language_code"],
+                    name=voice["name"],
+                    ssml_gender=getattr(texttospeech.SsmlVoiceGender, voice["ssml_gender"]),
+                ),
+                audio_config=texttospeech.AudioConfig(
+                    audio_encoding=getattr(texttospeech.AudioEncoding, audio["audio_encoding"]),
+                    speaking_rate=audio["speaking_rate"],
+                    pitch=audio["pitch"],
+                    volume_gain_db=audio["volume_gain_db"],
+                ),
+            )
+        return response.audio_content
+
+    def stats(self) -> dict:
+        average = self._synthesis_ms_total / self.syntheses if self.syntheses else 0.0
+        cache_stats = self.cache.stats() if self.cache is not None else {}
+        hits = cache_stats.get("memory_hits", 0) + cache_stats.get("disk_hits", 0)
+        return {
+            "syntheses": self.syntheses,
+            "coalesced": self.coalesced,
+            "streams": self.streams,
+            "stream_chunks": self.stream_chunks,
+            "avg_synthesis_ms": round(average, 2),
+            # Estimativa: cada acerto evitou uma síntese de duração média
+            "synthesis_ms_saved": round((hits + self.coalesced) * average, 2),
+            "cache": cache_stats,
+        }
+
+
+# Síntese de fala com cache (memória + disco), criada no primeiro uso da voz
+providers.register("tts", lambda: TextToSpeechService(providers.get("tts_client")), optional=True)
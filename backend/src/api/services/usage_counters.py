@@ -0,0 +1,218 @@
+import os
+import threading
+import time
+from datetime import datetime
+
+from dotenv import load_dotenv
+from sqlalchemy import event, func, inspect, insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, object_session
+
+from src.api.db.database import SessionLocal
+from src.api.db.models import Lead, SistemaMetricas
+
+
+load_dotenv()
+
+# Intervalo entre as gravações dos contadores acumulados em memória
+USAGE_COUNTERS_FLUSH_MS = int(os.getenv("USAGE_COUNTERS_FLUSH_MS", 1000))
+
+# Colunas de `sistema_metricas` mantidas pelo agregador
+COUNTER_FIELDS = (
+    "mensagens_enviadas",
+    "interacoes_chatbot",
+    "chamadas_realizadas",
+    "leads_qualificados",
+    "armazenamento_mb",
+)
+
+BYTES_PER_MB = 1024 * 1024
+
+# Chave em `Session.info` com os leads qualificados na transação, contados só no commit
+_PENDING_QUALIFIED = "usage_leads_qualificados"
+
+
+class UsageCounters:
+    """
+    Agregador dos contadores mensais de `sistema_metricas`. Os caminhos do chat, das
+    chamadas e dos leads só somam num dicionário em memória (por ano/mês); uma thread em
+    segundo plano grava os totais a cada `flush_interval_ms` com um
+    `UPDATE ... SET campo = campo + n` por mês, sem ler a linha antes. Como cada worker
+    soma só o que acumulou, vários processos podem gravar na mesma linha sem perder
+    incrementos.
+    """
+
+    def __init__(self, session_factory=SessionLocal, flush_interval_ms: int = USAGE_COUNTERS_FLUSH_MS):
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval_ms / 1000
+        # (ano, mes) -> {campo: valor acumulado desde o último flush}
+        self._pending = {}
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._stopping = False
+        self.increments = 0
+        self.flushed = 0
+        self.failures = 0
+        self.flushes = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    def increment(self, when: datetime = None, **counts) -> None:
+        """
+        Soma aos contadores do mês corrente (ou do mês de `when`), ex.:
+        `usage_counters.increment(interacoes_chatbot=1, mensagens_enviadas=1)`.
+        """
+        unknown = set(counts) - set(COUNTER_FIELDS)
+        if unknown:
+            raise ValueError(f"Contadores desconhecidos: {', '.join(sorted(unknown))}")
+        now = when or datetime.now()
+        key = (now.year, now.month)
+        with self._cond:
+            pending = self._pending.get(key)
+            if pending is None:
+                pending = self._pending[key] = {}
+            for field, amount in counts.items():
+                pending[field] = pending.get(field, 0) + amount
+            self.increments += 1
+        self._ensure_started()
+
+    def flush(self) -> int:
+        """
+        Grava imediatamente os contadores acumulados. Retorna o número de meses gravados.
+        Se o banco falhar, os valores voltam para o acumulado e vão no próximo flush.
+        """
+        with self._flush_lock:
+            with self._cond:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return 0
+
+            start = time.perf_counter()
+            try:
+                self._write(batch)
+            except Exception:
+                with self._cond:
+                    for key, counts in batch.items():
+                        pending = self._pending.setdefault(key, {})
+                        for field, amount in counts.items():
+                            pending[field] = pending.get(field, 0) + amount
+                    self.failures += 1
+                raise
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+            with self._cond:
+                self.flushes += 1
+                self.flushed += len(batch)
+                self.last_flush_ms = elapsed_ms
+                self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+                self._total_flush_ms += elapsed_ms
+            return len(batch)
+
+    def start(self) -> None:
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="usage-counters", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """
+        Para a thread e grava o que ainda estiver acumulado (chamado no shutdown).
+        """
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        self.flush()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "pending": {f"{ano}-{mes:02d}": dict(counts) for (ano, mes), counts in self._pending.items()},
+                "increments": self.increments,
+                "flushed": self.flushed,
+                "failures": self.failures,
+                "flushes": self.flushes,
+                "last_flush_ms": round(self.last_flush_ms, 2),
+                "avg_flush_ms": round(self._total_flush_ms / self.flushes, 2) if self.flushes else 0.0,
+                "max_flush_ms": round(self.max_flush_ms, 2),
+            }
+
+    def _ensure_started(self) -> None:
+        if self._thread is None and not self._stopping:
+            self.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if not self._stopping:
+                    self._cond.wait(self.flush_interval)
+                stopping = self._stopping
+            try:
+                self.flush()
+            except Exception:
+                pass
+            if stopping:
+                return
+
+    def _write(self, batch: dict) -> None:
+        db = self.session_factory()
+        try:
+            # Ordem fixa dos meses: dois workers gravando a virada do mês travam as linhas
+            # na mesma ordem
+            for (ano, mes), counts in sorted(batch.items()):
+                _add_to_month(db, ano, mes, counts)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+
+def _add_to_month(db: Session, ano: int, mes: int, counts: dict) -> None:
+    table = SistemaMetricas.__table__
+    increments = {field: func.coalesce(table.c[field], 0) + amount for field, amount in counts.items()}
+    statement = update(table).where(table.c.ano == ano, table.c.mes == mes).values(**increments)
+    if db.execute(statement).rowcount:
+        return
+    # Primeiro flush do mês: cria a linha. Se outro worker criou ao mesmo tempo, a
+    # restrição única (ano, mes) barra a segunda linha e a soma vai pelo UPDATE
+    try:
+        with db.begin_nested():
+            db.execute(insert(table).values(ano=ano, mes=mes, **counts))
+    except IntegrityError:
+        db.execute(statement)
+
+
+usage_counters = UsageCounters()
+
+
+# Leads qualificados: contados quando o status passa a 'qualificado' (em qualquer caminho
+# de gravação) e somados só depois do commit, para um lote desfeito não contar
+@event.listens_for(Lead, "after_insert")
+@event.listens_for(Lead, "after_update")
+def _track_qualified_lead(mapper, connection, target):
+    history = inspect(target).attrs.status.history
+    if target.status != "qualificado" or not history.added or "qualificado" in (history.deleted or ()):
+        return
+    session = object_session(target)
+    if session is not None:
+        session.info[_PENDING_QUALIFIED] = session.info.get(_PENDING_QUALIFIED, 0) + 1
+
+
+@event.listens_for(Session, "after_commit")
+def _count_qualified_after_commit(session):
+    qualified = session.info.pop(_PENDING_QUALIFIED, 0)
+    if qualified:
+        usage_counters.increment(leads_qualificados=qualified)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_qualified(session):
+    session.info.pop(_PENDING_QUALIFIED, None)
@@ -0,0 +1,107 @@
+import asyncio
+import base64
+import logging
+
+from src.api.services.tts_service import (
+    SentenceBuffer, TextToSpeechService, split_sentences, TTS_STREAM_PARALLELISM
+)
+
+
+logger = logging.getLogger(__name__)
+
+_END = object()
+
+
+async def voice_turn_events(
+    transcript: str,
+    chat_events,
+    tts: TextToSpeechService,
+    parallelism: int = TTS_STREAM_PARALLELISM,
+):
+    """
+    Turno de conversa por voz depois do reconhecimento: repassa os eventos do chat em
+    streaming (`chat_events`, ex.: `stream_chat_with_openai`) e, assim que cada frase da
+    resposta fica completa, começa a sintetizá-la (até `parallelism` ao mesmo tempo).
+    O áudio sai na ordem das frases, intercalado com o texto. Eventos gerados:
+      {"type": "transcription", "text": ...}
+      os eventos do chat (`session`, `delta`, `done` ou `error`)
+      {"type": "audio", "index": n, "text": frase, "audio": mp3 em base64}
+      {"type": "audio_error", "index": n, "text": frase, "error": ...}
+      {"type": "end", "audio_chunks": n}                 -> sempre por último
+    Se o chat falhar, a mensagem de erro enviada ao cliente também é falada.
+    """
+    out = asyncio.Queue()
+    # Sínteses na ordem das frases: (frase, task); _END quando o chat terminar
+    scheduled = asyncio.Queue()
+    semaphore = asyncio.Semaphore(max(1, parallelism))
+    synth_tasks = []
+
+    async def synthesize(text: str) -> bytes:
+        async with semaphore:
+            content, _ = await tts.synthesize(text)
+            return content
+
+    def schedule(sentences: list) -> None:
+        for sentence in sentences:
+            task = asyncio.ensure_future(synthesize(sentence))
+            synth_tasks.append(task)
+            scheduled.put_nowait((sentence, task))
+
+    async def run_chat():
+        sentences = SentenceBuffer()
+        try:
+            async for event in chat_events:
+                out.put_nowait(event)
+                if event["type"] == "delta":
+                    schedule(sentences.feed(event["text"]))
+                elif event["type"] == "error":
+                    # Descarta a frase pela metade e fala a mensagem de erro
+                    sentences = SentenceBuffer()
+                    schedule(split_sentences(event["response"]))
+            schedule(sentences.flush())
+        finally:
+            scheduled.put_nowait(_END)
+
+    async def run_audio():
+        index = 0
+        while True:
+            item = await scheduled.get()
+            if item is _END:
+                break
+            sentence, task = item
+            try:
+                content = await task
+            except Exception as e:
+                logger.error("Falha ao sintetizar frase da resposta por voz: %s", e)
+                out.put_nowait({"type": "audio_error", "index": index, "text": sentence, "error": str(e)})
+            else:
+                out.put_nowait({
+                    "type": "audio",
+                    "index": index,
+                    "text": sentence,
+                    "audio": base64.b64encode(content).decode("ascii"),
+                })
+            index += 1
+        out.put_nowait({"type": "end", "audio_chunks": index})
+
+    async def run():
+        try:
+            await asyncio.gather(run_chat(), run_audio())
+        finally:
+            out.put_nowait(_END)
+
+    yield {"type": "transcription", "text": transcript}
+    pipeline = asyncio.ensure_future(run())
+    try:
+        while True:
+            event = await out.get()
+            if event is _END:
+                break
+            yield event
+        # Propaga uma falha inesperada do pipeline (o `end` não terá sido enviado)
+        await pipeline
+    finally:
+        # Cliente desconectou: encerra o chat e as sínteses ainda em andamento
+        for task in (pipeline, *synth_tasks):
+            task.cancel()
+        await asyncio.gather(pipeline, *synth_tasks, return_exceptions=True)
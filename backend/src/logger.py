@@ -1,20 +1,328 @@
+import json
 import logging
-from fastapi import Request
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import traceback
+import uuid
+from contextvars import ContextVar
+from logging.handlers import QueueHandler
+from typing import Optional
+
+from dotenv import load_dotenv
 from fastapi import HTTPException
+from starlette.datastructures import Headers
 from starlette.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 logging.basicConfig(filename="errors.log", level=logging.ERROR)
 
-class LogMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        print(f"📥 Request recebido: {request.method} {request.url}")  # LOG 1
+load_dotenv()
+
+ACCESS_LOG_ENABLED = os.getenv("ACCESS_LOG_ENABLED", "1") != "0"
+# Fração dos pedidos bem-sucedidos (< 400) e rápidos que vai para o log; erros (>= 400) e
+# pedidos lentos (>= ACCESS_LOG_SLOW_MS) são sempre registrados
+ACCESS_LOG_SAMPLE_RATE = float(os.getenv("ACCESS_LOG_SAMPLE_RATE", 1.0))
+ACCESS_LOG_SLOW_MS = float(os.getenv("ACCESS_LOG_SLOW_MS", 1000))
+# Registros esperando a thread de escrita; com a fila cheia o registro é descartado (e
+# contado) em vez de segurar o pedido
+ACCESS_LOG_QUEUE_SIZE = int(os.getenv("ACCESS_LOG_QUEUE_SIZE", 10000))
+# A thread de escrita acorda a cada ACCESS_LOG_FLUSH_MS e escreve tudo o que estiver na
+# fila de uma vez (uma escrita por lote, não por pedido)
+ACCESS_LOG_FLUSH_MS = int(os.getenv("ACCESS_LOG_FLUSH_MS", 100))
+
+REQUEST_ID_HEADER = "X-Request-ID"
+_REQUEST_ID_MAX_LENGTH = 128
+
+# Id do pedido em andamento: entra em qualquer registro de log feito durante o pedido
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+_JSON = json.JSONEncoder(ensure_ascii=False, default=str)
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Uma linha JSON por registro: horário, nível, logger, mensagem, request_id e os campos
+    passados em `extra` (ou já reunidos em `record.fields`). Roda na thread de escrita,
+    fora do caminho do pedido.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + ".%03dZ" % (record.created % 1 * 1000),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields is not None:
+            entry.update(fields)
+        else:
+            for key, value in vars(record).items():
+                if key not in _RECORD_ATTRS and not key.startswith("_"):
+                    entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return _JSON.encode(entry)
+
+
+class _RequestIdFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "request_id"):
+            request_id = request_id_var.get()
+            if request_id is not None:
+                record.request_id = request_id
+        return True
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+    """
+    Só enfileira o registro; formatar e escrever fica com a thread de escrita do AccessLog.
+    """
+
+    def __init__(self, access_log: "AccessLog"):
+        super().__init__(access_log._queue)
+        self.access_log = access_log
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # O QueueHandler padrão formata aqui (na thread do pedido); só o traceback é
+        # convertido em texto, para não manter os frames vivos até a escrita
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        self.access_log.put(record)
+
+
+def _to_record(item) -> logging.LogRecord:
+    # Registros de acesso chegam como tupla e só viram LogRecord na thread de escrita:
+    # criar o LogRecord (e achar quem chamou) é a parte cara do logging
+    if isinstance(item, logging.LogRecord):
+        return item
+    created, level, fields, error = item
+    record = logging.LogRecord("access", level, __file__, 0, "request", None, None)
+    record.created = created
+    record.fields = fields
+    if error is not None:
+        record.exc_text = "".join(traceback.format_exception(error)).rstrip()
+    return record
+
+
+class AccessLog:
+    """
+    Log de acesso estruturado: um registro JSON por pedido (método, rota, status, duração,
+    request id) entregue a uma fila; uma thread em segundo plano formata e escreve no
+    stdout em lotes. O pedido nunca espera por I/O de log.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = ACCESS_LOG_ENABLED,
+        sample_rate: float = ACCESS_LOG_SAMPLE_RATE,
+        slow_ms: float = ACCESS_LOG_SLOW_MS,
+        queue_size: int = ACCESS_LOG_QUEUE_SIZE,
+        flush_ms: int = ACCESS_LOG_FLUSH_MS,
+        stream=None,
+    ):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.queue_size = queue_size
+        self.flush_seconds = flush_ms / 1000
+        self.logged = 0
+        self.sampled_out = 0
+        self.dropped = 0
+        self._queue = queue.SimpleQueue()
+        self._stream = stream
+        self._formatter = JsonFormatter()
+        self._thread = None
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._stopping = False
+
+        self.handler = _NonBlockingQueueHandler(self)
+        self.handler.addFilter(_RequestIdFilter())
+        self.logger = logging.getLogger("access")
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        self.logger.addHandler(self.handler)
+
+    def ensure_started(self) -> None:
+        if self._thread is None and not self._stopping:
+            self.start()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stopping = False
+            self._wake.clear()
+            self._thread = threading.Thread(target=self._run, name="access-log", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """
+        Escreve o que ainda estiver na fila e para a thread (chamado no shutdown).
+        """
+        with self._lock:
+            self._stopping = True
+            thread, self._thread = self._thread, None
+        self._wake.set()
+        if thread is not None:
+            thread.join(timeout)
+
+    def flush(self) -> int:
+        """
+        Formata e escreve de uma vez tudo o que está na fila; devolve quantos registros.
+        """
+        lines = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                lines.append(self._formatter.format(_to_record(item)))
+            except Exception:
+                self.dropped += 1
+        if lines:
+            stream = self._stream or sys.stdout
+            try:
+                stream.write("\n".join(lines) + "\n")
+                stream.flush()
+            except Exception:
+                # Sem onde escrever (stdout fechado etc.): não derruba a thread
+                self.dropped += len(lines)
+        return len(lines)
+
+    def _run(self) -> None:
+        while not self._stopping:
+            self._wake.wait(self.flush_seconds)
+            self.flush()
+        self.flush()
+
+    def put(self, item) -> None:
+        # Fila cheia (escrita atrasada): descarta em vez de segurar o pedido
+        if self._queue.qsize() >= self.queue_size:
+            self.dropped += 1
+            return
+        self.ensure_started()
+        self._queue.put(item)
+
+    def should_log(self, status: int, duration_ms: float, failed: bool = False) -> bool:
+        if not self.enabled:
+            return False
+        if failed or status >= 400 or duration_ms >= self.slow_ms:
+            return True
+        if self.sample_rate >= 1 or random.random() < self.sample_rate:
+            return True
+        self.sampled_out += 1
+        return False
+
+    def request(
+        self, method: str, path: str, status: int, duration_ms: float, request_id: str,
+        client: Optional[str] = None, error: Optional[BaseException] = None,
+    ) -> None:
+        if not self.should_log(status, duration_ms, failed=error is not None):
+            return
+        self.logged += 1
+        if error is not None or status >= 500:
+            level = logging.ERROR
+        else:
+            level = logging.WARNING if status >= 400 else logging.INFO
+        self.put((time.time(), level, {
+            "method": method,
+            "path": path,
+            "status": status,
+            "duration_ms": round(duration_ms, 2),
+            "request_id": request_id,
+            "client": client,
+            "slow": duration_ms >= self.slow_ms,
+        }, error))
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "logged": self.logged,
+            "sampled_out": self.sampled_out,
+            "dropped": self.dropped,
+            "pending": self._queue.qsize(),
+        }
+
+
+access_log = AccessLog()
+
+
+def _request_id(header: Optional[str]) -> str:
+    # Reaproveita o id do cliente/proxy se for razoável; senão gera um novo
+    if header and len(header) <= _REQUEST_ID_MAX_LENGTH and header.isprintable():
+        return header
+    return uuid.uuid4().hex
+
+
+class LogMiddleware:
+    """
+    Registra cada pedido no log de acesso (src.logger.access_log) ao fim da resposta e
+    transforma exceções que escaparam da aplicação em respostas JSON (HTTPException com o
+    próprio status, o resto em 500). Cada pedido recebe um id (o header X-Request-ID do
+    cliente, se vier) devolvido na resposta e presente em request.state.request_id.
+    ASGI puro: a resposta é repassada mensagem a mensagem, sem tarefa extra.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        request_id = _request_id(Headers(scope=scope).get(REQUEST_ID_HEADER))
+        scope.setdefault("state", {})["request_id"] = request_id
+        token = request_id_var.set(request_id)
+        status = 500
+        response_started = False
+
+        async def send_logged(message: Message):
+            nonlocal status, response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+                status = message["status"]
+                message.setdefault("headers", [])
+                message["headers"] = [*message["headers"], (b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        error = None
         try:
-            response = await call_next(request)
-            print(f"✅ Resposta enviada: {response.status_code}")  # LOG 2
-            return response
+            await self.app(scope, receive, send_logged)
         except HTTPException as e:
-            return JSONResponse(status_code=e.status_code, content={"detail": e.detail})  
+            # Com a resposta já começada (streaming) não dá para trocar o status
+            if response_started:
+                error = e
+                raise
+            response = JSONResponse(status_code=e.status_code, content={"detail": e.detail})
+            await response(scope, receive, send_logged)
         except Exception as e:
-            print(f"❌ Erro inesperado: {str(e)}")  
-            return JSONResponse(status_code=500, content={"detail": "Unexpected error occurred"})
+            error = e
+            if response_started:
+                raise
+            status = 500
+            response = JSONResponse(status_code=500, content={"detail": "Unexpected error occurred"})
+            await response(scope, receive, send_logged)
+        finally:
+            client = scope.get("client")
+            access_log.request(
+                scope["method"], scope["path"], status, (time.perf_counter() - started) * 1000, request_id,
+                client=client[0] if client else None, error=error,
+            )
+            request_id_var.reset(token)
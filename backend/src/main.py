@@ -1,16 +1,16 @@
-from fastapi import FastAPI, HTTPException, File, UploadFile, Depends
+from fastapi import FastAPI, HTTPException, File, Form, UploadFile, Depends, Header, WebSocket
 from fastapi.openapi.utils import get_openapi
 from fastapi.security import OAuth2PasswordBearer
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from dotenv import load_dotenv
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 from typing import Optional
 import os
-import ffmpeg
-import tempfile
-from google.oauth2 import service_account
+import asyncio
+import json
 # Importando rotas
 from src.api.routes.auth import router as auth_router
 from src.api.routes.routes import router as routes_router
@@ -18,12 +18,25 @@ from src.api.routes.products import router as products_router
 from src.api.routes.autoMessages import router as auto_messages_router
 
 from src.api.middleware import AuthMiddleware
-from src.logger import LogMiddleware
-from src.api.db.database import get_db
-from src.api.services.openai_service import chat_with_openai
-
-# Google Cloud APIs
-from google.cloud import speech, texttospeech
+from src.logger import LogMiddleware, access_log
+from src.api.services.metrics import MetricsMiddleware, metrics
+from src.api.db.database import get_db, SessionLocal
+from src.api.services.openai_service import (
+    chat_with_openai_async, stream_chat_with_openai, close_async_client, completions
+)
+from src.api.services.session_backends import session_backend
+from src.api.services.lead_writer import lead_writer
+from src.api.services.usage_counters import usage_counters
+from src.api.services.response_cache import response_cache
+from src.api.services.audio_service import (
+    normalization_stats, AudioTooLargeError, AudioTranscodeError
+)
+from src.api.services.audio_jobs import audio_jobs, AudioBusyError, AudioJobTimeout
+from src.api.services.tts_service import TextToSpeechService, TTS_CACHE_MAX_AGE
+from src.api.services.speech_recognition import transcribe_websocket, transcribe_upload
+from src.api.services.voice_pipeline import voice_turn_events
+from src.api.services.providers import providers, ProviderUnavailableError
+from src.api.services.chat_concurrency import ChatBusyError, llm_limiter, turn_locks, idempotency_cache
 
 
 #google- API
@@ -34,53 +47,17 @@ class TextToSpeechRequest(BaseModel):
 class ChatRequest(BaseModel):
     session_id: Optional[str]
     message: str
+    # Chave de idempotência (também aceita no header Idempotency-Key): reenvios recebem a mesma resposta
+    idempotency_key: Optional[str] = None
 
 
 load_dotenv()
 
-#Configurar credenciais do Google Cloud
-google_credentials = os.getenv("GOOGLE_SPEECH_TO_TEXT")
-"""
-if not google_credentials:
-    raise ValueError("Erro: A variável GOOGLE_SPEECH_TO_TEXT não foi encontrada no .env!")
-
-os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = google_credentials
-
-#Inicializar clientes do Google Cloud (depois do carregamento das credenciais)
-speech_client = speech.SpeechClient()
-tts_client = texttospeech.TextToSpeechClient()
-
-"""
-
-try:
-    #Verificar se a variável contém um JSON ou um caminho
-    if google_credentials.startswith("{"):
-        print("🔍 JSON detectado na variável de ambiente. Criando arquivo temporário...")
-
-        #Criar um arquivo temporário
-        temp_cred_path = "/tmp/google_credentials.json"
-        with open(temp_cred_path, "w") as f:
-            f.write(google_credentials)
-
-        #Atualizar variável para apontar para o arquivo temporário
-        os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = temp_cred_path
-
-    else:
-        #Se for um caminho, usá-lo diretamente
-        print("🔍 Caminho detectado, usando diretamente.")
-        os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = google_credentials
-
-    #Inicializar credenciais do Google Cloud
-    credentials = service_account.Credentials.from_service_account_file(os.getenv("GOOGLE_APPLICATION_CREDENTIALS"))
-
-    #Inicializar clientes do Google Cloud
-    speech_client = speech.SpeechClient(credentials=credentials)
-    tts_client = texttospeech.TextToSpeechClient(credentials=credentials)
-
-    print("✅ Google Cloud Clients Inicializados com sucesso!")
-
-except Exception as e:
-    raise ValueError(f"❌ ERRO ao configurar as credenciais do Google Cloud: {e}")
+#Clientes do Google Cloud (voz) e da OpenAI são criados sob demanda no registro de provedores
+#(src/api/services/providers.py): a API sobe mesmo sem GOOGLE_SPEECH_TO_TEXT e os endpoints
+#de voz respondem 503 enquanto as credenciais não estiverem disponíveis.
+#Com PROVIDERS_WARMUP=1 (padrão) os clientes são criados em segundo plano logo após a subida.
+PROVIDERS_WARMUP = os.getenv("PROVIDERS_WARMUP", "1") != "0"
 
 
 app = FastAPI()
@@ -91,6 +68,8 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 #Middlewares
 app.add_middleware(AuthMiddleware)
 app.add_middleware(LogMiddleware)
+#Latência e contagem por rota (GET /metrics); fica por fora do log para ver o status final
+app.add_middleware(MetricsMiddleware)
 
 #Configuração do CORS
 app.add_middleware(
@@ -107,12 +86,57 @@ app.include_router(routes_router, prefix="/leads", tags=["leads"])
 app.include_router(products_router, prefix="/products", tags=["products"])
 app.include_router(auto_messages_router, prefix="/autoMessages", tags=["autoMessages"])
 
+@app.on_event("startup")
+def start_background_writers():
+    lead_writer.start()
+    usage_counters.start()
+
+@app.on_event("startup")
+async def warm_up_providers():
+    #Não bloqueia a subida: falhas (ex.: voz sem credenciais) ficam em /api/health
+    if PROVIDERS_WARMUP:
+        asyncio.get_running_loop().run_in_executor(None, providers.warm_up)
+
+@app.on_event("shutdown")
+async def shutdown_clients():
+    await close_async_client()
+    # Grava o que ainda estiver na fila antes de encerrar
+    await run_in_threadpool(lead_writer.stop)
+    #Depois do lead_writer: o último lote ainda pode qualificar leads
+    await run_in_threadpool(usage_counters.stop)
+    audio_jobs.shutdown()
+    # Escreve os registros de acesso que ainda estiverem na fila
+    access_log.stop()
+
 @app.get("/")
 def read_root():
     return {"message": "leading prospect API funcionando!"}
 
+@app.get("/api/health")
+def health():
+    """
+    Estado dos provedores externos (OpenAI, Google): pronto, ainda não criado ou indisponível.
+    """
+    return {"status": "ok", "providers": providers.status()}
+
+@app.get("/metrics", include_in_schema=False)
+def metrics_endpoint():
+    """
+    Métricas no formato texto do Prometheus: latência por rota, por chamada externa
+    (OpenAI, Google STT/TTS, ffmpeg) e por tipo de consulta ao banco.
+    """
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+def _provider_unavailable(error: ProviderUnavailableError) -> JSONResponse:
+    print(f"❌ {str(error)}")
+    return JSONResponse(content={"error": "Serviço de voz indisponível no momento"}, status_code=503)
+
 @app.post("/api/chat")
-async def chat_endpoint(request: ChatRequest, db: Session = Depends(get_db)):
+async def chat_endpoint(
+    request: ChatRequest,
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
     """
     Recebe a mensagem do usuário e um session_id (opcional).
     Retorna a resposta da IA e o session_id usado/gerado.
@@ -120,98 +144,283 @@ async def chat_endpoint(request: ChatRequest, db: Session = Depends(get_db)):
     if not request.message.strip():
         raise HTTPException(status_code=400, detail="Mensagem não pode estar vazia")
 
-    # Chama a função da IA, que recebe user_message, db, e session_id
-    result = chat_with_openai(
-        user_message=request.message,
-        db=db,
-        session_id=request.session_id  # pode ser None
-    )
+    # Chama a função da IA (versão assíncrona, não bloqueia o event loop)
+    try:
+        result = await chat_with_openai_async(
+            user_message=request.message,
+            db=db,
+            session_id=request.session_id,  # pode ser None
+            idempotency_key=idempotency_key or request.idempotency_key
+        )
+    except ChatBusyError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
 
-    # A função 'chat_with_openai' retornará algo como {"response": "...", "session_id": "..."}
+    # A função 'chat_with_openai_async' retornará algo como {"response": "...", "session_id": "..."}
     return {
         "response": result["response"],
         "session_id": result["session_id"]
     }
 
+@app.post("/api/chat/stream")
+async def chat_stream_endpoint(
+    request: ChatRequest,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
+    """
+    Igual ao /api/chat, mas envia a resposta como Server-Sent Events conforme os tokens chegam.
+    Eventos: `session`, `delta` (texto), `done` (resposta final limpa) ou `error`.
+    """
+    if not request.message.strip():
+        raise HTTPException(status_code=400, detail="Mensagem não pode estar vazia")
+
+    async def event_stream():
+        # A sessão do banco vive enquanto o stream durar (o Depends já teria fechado)
+        db = SessionLocal()
+        try:
+            async for event in stream_chat_with_openai(
+                user_message=request.message,
+                db=db,
+                session_id=request.session_id,
+                idempotency_key=idempotency_key or request.idempotency_key
+            ):
+                event_type = event.pop("type")
+                yield f"event: {event_type}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+        finally:
+            db.close()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/api/chat/stats")
+def chat_stats():
+    """
+    Contadores do armazenamento de sessões do chat (acertos, despejos, expirações)
+    e da fila write-behind de leads (profundidade, agrupados, descartados, latência do flush),
+    além da taxa de acerto do cache de respostas de abertura, da fila de chamadas à OpenAI
+    e da camada de resiliência (retries, timeouts, hedges, circuit breaker, latência).
+    Contadores mensais ainda não gravados em sistema_metricas.
+    """
+    return {
+        "sessions": session_backend.stats(),
+        "lead_writer": lead_writer.stats(),
+        "usage_counters": usage_counters.stats(),
+        "response_cache": response_cache.stats(),
+        "openai": completions.stats(),
+        "openai_queue": llm_limiter.stats(),
+        "turns": turn_locks.stats(),
+        "idempotency": idempotency_cache.stats()
+    }
+
+@app.get("/api/audio/stats")
+def audio_stats():
+    """
+    Pool de trabalhos de áudio: vagas em uso, fila, rejeições e, por tipo de trabalho
+    (conversão, reconhecimento, síntese, sessões de streaming), espera na fila e tempo de execução.
+    Uploads por caminho de normalização (sem conversão, NumPy, ffmpeg).
+    Cache do text-to-speech: acertos, bytes servidos do cache e tempo de síntese economizado.
+    """
+    tts_service = providers.peek("tts")
+    return {
+        "jobs": audio_jobs.stats(),
+        "normalization": normalization_stats(),
+        "tts": tts_service.stats() if tts_service is not None else None
+    }
+
 @app.post("/api/voice-to-text")
 async def transcribe_audio(file: UploadFile = File(...)):
-    """ Recebe um arquivo de áudio, converte para FLAC e envia para o Google Speech-to-Text """
+    """
+    Recebe um arquivo de áudio, normaliza para um formato aceito pelo Google Speech-to-Text e o envia.
+    FLAC mono e WAV PCM não passam pelo ffmpeg (enviado como está ou convertido com NumPy);
+    os demais formatos viram FLAC em memória (pipes do ffmpeg).
+    """
     try:
-        #Criar arquivos temporários para armazenar o áudio original e convertido
-        with tempfile.NamedTemporaryFile(delete=False, suffix=f".ogg") as temp_audio:
-            temp_audio.write(await file.read())
-            temp_audio_path = temp_audio.name  # Caminho do arquivo original
+        speech_client = await providers.aget("speech_client")
+    except ProviderUnavailableError as e:
+        return _provider_unavailable(e)
 
-        temp_flac_path = temp_audio_path.replace(".ogg", ".flac")  # Caminho do arquivo convertido
-
-        #Converter para FLAC usando FFmpeg
+    try:
+        #Normalizar sem arquivos temporários (o limite de tamanho é checado durante a leitura)
+        #e reconhecer, as duas etapas em vagas do pool de trabalhos de áudio
         try:
-            ffmpeg.input(temp_audio_path).output(temp_flac_path, ar=16000, ac=1, format="flac").run(overwrite_output=True)
-            print(f"✅ Conversão para FLAC concluída: {temp_flac_path}")
-        except Exception as e:
+            print("📢 Enviando áudio para o Google Speech-to-Text...")
+            transcript, prepared = await transcribe_upload(file, speech_client)
+            print(f"✅ Áudio preparado ({prepared.path}): {len(prepared.content)} bytes {prepared.encoding}")
+        except AudioTooLargeError as e:
+            return JSONResponse(content={"error": str(e)}, status_code=413)
+        except AudioTranscodeError as e:
             print(f"❌ Erro ao converter áudio para FLAC: {str(e)}")
             raise HTTPException(status_code=500, detail="Erro ao converter áudio para FLAC")
 
-        #Ler o áudio convertido para enviar ao Google
-        with open(temp_flac_path, "rb") as flac_audio:
-            audio_content = flac_audio.read()
-
-        #Criar objeto Audio para a API do Google
-        audio = speech.RecognitionAudio(content=audio_content)
-
-        #Configuração correta para FLAC (16000 Hz)
-        config = speech.RecognitionConfig(
-            encoding=speech.RecognitionConfig.AudioEncoding.FLAC,
-            sample_rate_hertz=16000,  # 🎤 Frequência de amostragem correta
-            language_code="pt-PT"
-        )
-
-        print("📢 Enviando áudio para o Google Speech-to-Text...")
-        response = speech_client.recognize(config=config, audio=audio)
-
-        if response.results:
-            transcript = response.results[0].alternatives[0].transcript
+        if transcript is not None:
             print(f"✅ Transcrição bem-sucedida: {transcript}")
         else:
             transcript = "Não foi possível reconhecer a fala."
             print("❌ Nenhuma fala reconhecida pelo Google.")
 
-        #Remover arquivos temporários
-        os.remove(temp_audio_path)
-        os.remove(temp_flac_path)
-
         return {"transcription": transcript}
 
+    except AudioBusyError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=429, headers={"Retry-After": str(e.retry_after)})
+    except AudioJobTimeout as e:
+        print(f"❌ {str(e)}")
+        return JSONResponse(content={"error": str(e)}, status_code=504)
+    except Exception as e:
+        print(f"❌ Erro ao processar o áudio: {str(e)}")
+        return JSONResponse(content={"error": str(e)}, status_code=500)
+
+@app.post("/api/voice-chat")
+async def voice_chat(
+    file: UploadFile = File(...),
+    session_id: Optional[str] = Form(None),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
+    """
+    Turno de conversa por voz numa única chamada (em vez de voice-to-text, chat e
+    text-to-speech separados): reconhece o áudio, gera a resposta em streaming e sintetiza
+    cada frase assim que ela fica completa. A resposta é um stream SSE com os eventos
+    `transcription`, os do /api/chat/stream (`session`, `delta`, `done`/`error`),
+    `audio` (MP3 de cada frase em base64, na ordem) e `end`.
+    """
+    try:
+        speech_client = await providers.aget("speech_client")
+        tts_service = await providers.aget("tts")
+    except ProviderUnavailableError as e:
+        return _provider_unavailable(e)
+
+    #Reconhecimento antes do stream: erros ainda viram o status HTTP correto
+    try:
+        transcript, _ = await transcribe_upload(file, speech_client)
+    except AudioTooLargeError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=413)
+    except AudioBusyError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=429, headers={"Retry-After": str(e.retry_after)})
+    except AudioJobTimeout as e:
+        print(f"❌ {str(e)}")
+        return JSONResponse(content={"error": str(e)}, status_code=504)
     except Exception as e:
         print(f"❌ Erro ao processar o áudio: {str(e)}")
         return JSONResponse(content={"error": str(e)}, status_code=500)
 
+    if not transcript or not transcript.strip():
+        return JSONResponse(content={"error": "Não foi possível reconhecer a fala."}, status_code=422)
+
+    #Sem session_id é o começo de uma conversa por voz: conta como chamada realizada
+    if not session_id:
+        usage_counters.increment(chamadas_realizadas=1)
+
+    async def event_stream():
+        # A sessão do banco vive enquanto o stream durar (o Depends já teria fechado)
+        db = SessionLocal()
+        try:
+            chat_events = stream_chat_with_openai(
+                user_message=transcript,
+                db=db,
+                session_id=session_id,
+                idempotency_key=idempotency_key
+            )
+            async for event in voice_turn_events(transcript, chat_events, tts_service):
+                event_type = event.pop("type")
+                yield f"event: {event_type}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+        finally:
+            db.close()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.websocket("/api/voice-to-text/stream")
+async def transcribe_audio_stream(websocket: WebSocket, format: str = "auto"):
+    """
+    Reconhecimento de fala em streaming: o cliente envia o áudio em pedaços (frames binários)
+    enquanto grava e recebe as transcrições parciais e finais. Ao terminar, envia {"event": "end"}.
+    `?format=pcm16` para PCM 16-bit mono 16 kHz cru (sem ffmpeg); senão qualquer formato do ffmpeg.
+    """
+    await websocket.accept()
+    try:
+        speech_recognizer = await providers.aget("speech_recognizer")
+    except ProviderUnavailableError as e:
+        print(f"❌ {str(e)}")
+        await websocket.send_json({"type": "error", "error": "Serviço de voz indisponível no momento"})
+        await websocket.close(code=1011)
+        return
+    await transcribe_websocket(websocket, speech_recognizer, audio_format=format)
+
 @app.post("/api/text-to-speech")
-async def synthesize_speech(request: TextToSpeechRequest):
+async def synthesize_speech(request: TextToSpeechRequest, if_none_match: Optional[str] = Header(None)):
     """ Converte texto em áudio usando Google Text-to-Speech (voz masculina natural) """
+    return await _text_to_speech_response(request.text, if_none_match)
+
+@app.get("/api/text-to-speech")
+async def synthesize_speech_get(text: str, if_none_match: Optional[str] = Header(None)):
+    """
+    Mesma síntese via GET (ex.: <audio src="/api/text-to-speech?text=...">), para o navegador
+    reaproveitar o áudio do próprio cache HTTP.
+    """
+    return await _text_to_speech_response(text, if_none_match)
+
+@app.post("/api/text-to-speech/stream")
+async def synthesize_speech_stream(request: TextToSpeechRequest):
+    """
+    Para respostas longas: o texto é dividido em frases, sintetizadas em paralelo, e o MP3 é
+    enviado em partes (chunked) na ordem do texto. A primeira frase já toca enquanto as
+    demais ainda estão sendo geradas.
+    """
     try:
-        synthesis_input = texttospeech.SynthesisInput(text=request.text)
+        tts_service = await providers.aget("tts")
+    except ProviderUnavailableError as e:
+        return _provider_unavailable(e)
 
-        #Escolher voz masculina mais natural do Google
-        voice = texttospeech.VoiceSelectionParams(
-            language_code="pt-PT",  # Português do Brasil
-            name="pt-PT-Wavenet-B",  
-            ssml_gender=texttospeech.SsmlVoiceGender.MALE
-        )
+    audio_stream = tts_service.stream(request.text)
+    try:
+        #A primeira frase é gerada antes da resposta: erros ainda viram o status HTTP correto
+        first_chunk = await anext(audio_stream, b"")
+    except AudioBusyError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=429, headers={"Retry-After": str(e.retry_after)})
+    except AudioJobTimeout as e:
+        print(f"❌ {str(e)}")
+        return JSONResponse(content={"error": str(e)}, status_code=504)
+    except Exception as e:
+        return JSONResponse(content={"error": str(e)}, status_code=500)
 
-        audio_config = texttospeech.AudioConfig(
-            audio_encoding=texttospeech.AudioEncoding.MP3,
-            speaking_rate=1.0,  # Velocidade normal da fala
-            pitch=0.0,  # Tom neutro
-            volume_gain_db=0.0  # Sem alteração de volume
-        )
+    async def audio_chunks():
+        try:
+            yield first_chunk
+            async for chunk in audio_stream:
+                yield chunk
+        except Exception as e:
+            #Status já enviado: o áudio termina na última frase gerada
+            print(f"❌ Erro na síntese em partes: {str(e)}")
+        finally:
+            await audio_stream.aclose()
 
-        response = tts_client.synthesize_speech(
-            input=synthesis_input, voice=voice, audio_config=audio_config
-        )
+    return StreamingResponse(audio_chunks(), media_type="audio/mpeg", headers={"X-Accel-Buffering": "no"})
 
-        return Response(content=response.audio_content, media_type="audio/mpeg")
+async def _text_to_speech_response(text: str, if_none_match: Optional[str]):
+    #O áudio de uma chave (texto + voz + configuração) nunca muda: ETag = chave do cache
+    etag = f'"{TextToSpeechService.key_for(text)}"'
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={TTS_CACHE_MAX_AGE}"}
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
 
+    try:
+        tts_service = await providers.aget("tts")
+    except ProviderUnavailableError as e:
+        return _provider_unavailable(e)
+
+    try:
+        audio_content, _ = await tts_service.synthesize(text)
+        return Response(content=audio_content, media_type="audio/mpeg", headers=headers)
+
+    except AudioBusyError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=429, headers={"Retry-After": str(e.retry_after)})
+    except AudioJobTimeout as e:
+        print(f"❌ {str(e)}")
+        return JSONResponse(content={"error": str(e)}, status_code=504)
     except Exception as e:
         return JSONResponse(content={"error": str(e)}, status_code=500)
 
@@ -235,9 +444,11 @@ def custom_openapi():
     app.openapi_schema = openapi_schema
     return app.openapi_schema
 
-print("rotas: ")
-for route in app.routes:
-    print(f"{route.path} -> {route.name}")
+#Lista das rotas só quando pedida (PRINT_ROUTES=1), fora do caminho normal de subida
+if os.getenv("PRINT_ROUTES") == "1":
+    print("rotas: ")
+    for route in app.routes:
+        print(f"{route.path} -> {route.name}")
 
 #Define a nova configuração OpenAPI
 app.openapi = custom_openapi
\ No newline at end of file
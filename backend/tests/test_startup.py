@@ -0,0 +1,54 @@
+"""
+Tempo de subida da API: `import src.main` num processo novo não pode carregar os SDKs
+pesados (importados só no primeiro uso) nem passar do limite de tempo de import.
+
+Uso (a partir de backend/):
+    python -m pytest tests
+"""
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+STARTUP_IMPORT_BUDGET_MS = float(os.getenv("STARTUP_IMPORT_BUDGET_MS", 2500))
+LAZY_MODULES = (
+    "openai",
+    "google.cloud.speech",
+    "google.cloud.texttospeech",
+    "grpc",
+    "google.oauth2",
+    "tiktoken",
+    "numpy",
+    "torch",
+)
+
+_LINE = re.compile(r"import time:\s+\d+ \|\s+(\d+) \|\s*src\.main$")
+
+
+def _import_main() -> subprocess.CompletedProcess:
+    env = dict(os.environ, DATABASE_URL="sqlite://", OPENAI_API_KEY="sk-fake", PROVIDERS_WARMUP="0")
+    env.pop("GOOGLE_SPEECH_TO_TEXT", None)
+    code = "import sys, src.main; print('\\n'.join(sorted(sys.modules)))"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True,
+    )
+    assert result.returncode == 0, f"import src.main falhou:\n{result.stderr[-2000:]}"
+    return result
+
+
+def test_startup_does_not_import_heavy_sdks():
+    loaded = set(_import_main().stdout.split())
+    eager = [name for name in LAZY_MODULES if name in loaded]
+    assert not eager, f"SDKs que deveriam ser carregados sob demanda: {', '.join(eager)}"
+
+
+def test_startup_import_time_within_budget():
+    result = _import_main()
+    totals = [int(match.group(1)) / 1000 for match in map(_LINE.match, result.stderr.splitlines()) if match]
+    assert totals, "saída do -X importtime sem a linha de src.main"
+    assert totals[-1] <= STARTUP_IMPORT_BUDGET_MS, (
+        f"import src.main levou {totals[-1]:.0f} ms (limite {STARTUP_IMPORT_BUDGET_MS:.0f} ms)"
+    )